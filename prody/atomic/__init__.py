@@ -116,6 +116,15 @@ Following functions can be used for permanent data storage:
   * :func:`.loadAtoms`
   * :func:`.saveAtoms`
 
+Following function can be used to cache atom groups parsed from structure
+files on the disk:
+
+  * :func:`.pathAtomsCache`
+
+Following function can be used to combine many atom groups into one:
+
+  * :func:`.joinAtoms`
+
 Following function can be used to identify fragments in a group
 (:class:`.AtomGroup`) or subset (:class:`.Selection`) of atoms:
 
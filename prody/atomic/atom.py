@@ -167,7 +167,8 @@ class Atom(AtomPointer):
             getattr(self, 'set' + ATOMIC_FIELDS[label].meth)(data)
         else:
             try:
-                self._ag._data[label][self._index] = data
+                self._ag._setValues(label, self._index, data)
+                self._ag._setDataTimeStamp()
             except KeyError:
                 raise AttributeError('data with label {0} must be set for'
                                        ' AtomGroup first'.format(repr(label)))
@@ -175,7 +176,7 @@ class Atom(AtomPointer):
     def getFlag(self, label):
         """Returns atom flag."""
 
-        return self._ag._getFlags(label)[self._index]
+        return self._ag._getFlag(label, self._index)
 
     def setFlag(self, label, value):
         """Update flag associated with *label*.
@@ -185,11 +186,11 @@ class Atom(AtomPointer):
         if label in flags.PLANTERS:
             raise AttributeError('flag {0} cannot be changed by user'
                                     .format(repr(label)))
-        flags = self._ag._getFlags(label)
-        if flags is None:
+        if self._ag._getPackedFlags(label) is None:
             raise AttributeError('flags with label {0} must be set for '
                                     'AtomGroup first'.format(repr(label)))
-        flags[self._index] = value
+        self._ag._setFlag(label, self._index, value)
+        self._ag._setDataTimeStamp()
 
     def getSelstr(self):
         """Returns selection string that will select this atom."""
@@ -264,13 +265,11 @@ for fname, field in ATOMIC_FIELDS.items():
         continue
 
     # Define public method for setting values in data array
-    def setData(self, value, var=fname, none=field.none):
-        array = self._ag._data[var]
-        if array is None:
-            raise AttributeError('attribute of the AtomGroup is '
-                                 'not set')
-        array[self._index] = value
+    def setData(self, value, var=fname, none=field.none, flags=field.flags):
+        self._ag._setValues(var, self._index, value)
         if none: self._ag._none(none)
+        if flags: self._ag._resetFlags(var)
+        self._ag._setDataTimeStamp()
     setData = wrapSetMethod(setData)
     setData.__name__ = setMeth
     setData.__doc__ = field.getDocstr('set', False)
@@ -2,7 +2,6 @@
 """This module defines :class:`AtomGroup` class that stores atomic data and
 multiple coordinate sets in :class:`numpy.ndarray` instances."""
 
-from time import time
 from numbers import Integral
 
 import numpy as np
@@ -18,7 +17,9 @@ from .flags import PLANTERS as FLAG_PLANTERS
 from .flags import ALIASES as FLAG_ALIASES
 from .flags import FIELDS as FLAG_FIELDS
 from .atom import Atom
-from .bond import Bond, evalBonds
+from .bond import Bond, evalBonds, evalBondGraph, evalFragments
+from .bond import RESIDUE_LINKS, evalCovalentBonds, getCovalentRadii
+from .bond import guessElements
 from .selection import Selection
 
 from . import flags
@@ -57,6 +58,17 @@ def checkLabel(label):
     return label
 
 
+def _getCodeType(n_values):
+    """Returns the smallest unsigned integer type for codes of *n_values*
+    categories."""
+
+    if n_values <= 256:
+        return np.dtype(np.uint8)
+    elif n_values <= 65536:
+        return np.dtype(np.uint16)
+    return np.dtype(np.uint32)
+
+
 class AtomGroup(Atomic):
 
     """A class for storing and accessing atomic data.  The number of atoms of
@@ -123,7 +135,8 @@ class AtomGroup(Atomic):
                  '_timestamps', '_kdtrees', '_bmap', '_bonds', '_cslabels',
                  '_acsi', '_n_csets', '_data', '_fragments',
                  '_flags', '_flagsts', '_subsets', '_msa', 
-                 '_sequenceMap']
+                 '_sequenceMap', '_datats', '_selcache', '_categories',
+                 '_bgraph', '_coordsts']
 
     def __init__(self, title='Unnamed'):
 
@@ -149,6 +162,11 @@ class AtomGroup(Atomic):
         self._subsets = None
         self._msa = None
         self._sequenceMap = None
+        self._datats = 0
+        self._coordsts = 0
+        self._selcache = None
+        self._categories = None
+        self._bgraph = None
 
     def __repr__(self):
 
@@ -229,11 +247,11 @@ class AtomGroup(Atomic):
             LOGGER.warn('No coordinate sets are copied to {0}'
                         .format(new.getTitle()))
 
-        for key in set(list(self._data) + list(other._data)):
+        for key in set(self.getDataLabels() + other.getDataLabels()):
             if key in ATOMIC_FIELDS and ATOMIC_FIELDS[key].readonly:
                 continue
-            this = self._data.get(key)
-            that = other._data.get(key)
+            this = self._getData(key)
+            that = other._getData(key)
             if this is not None or that is not None:
                 if this is None:
                     shape = list(that.shape)
@@ -244,6 +262,8 @@ class AtomGroup(Atomic):
                     shape[0] = len(other)
                     that = np.zeros(shape, this.dtype)
                 new._data[key] = np.concatenate((this, that))
+                if self.isCategorical(key) or other.isCategorical(key):
+                    new.setCategorical(key)
 
         if self._bonds is not None and other._bonds is not None:
             new.setBonds(np.concatenate([self._bonds,
@@ -273,11 +293,11 @@ class AtomGroup(Atomic):
 
         return (isinstance(other, AtomGroup) and
                 (self._n_atoms and self._n_atoms == other._n_atoms) and
-                set(self._data) == set(other._data) and
+                self.getDataLabels() == other.getDataLabels() and
                 (self._n_csets and self._n_csets == other._n_csets and
                  np.all(self._coords == other._coords)) and
-                all(np.all(self._data[key] == other._data[key])
-                    for key in self._data))
+                all(np.all(self._getData(key) == other._getData(key))
+                    for key in self.getDataLabels()))
 
 
     def __iter__(self):
@@ -298,7 +318,7 @@ class AtomGroup(Atomic):
     def _getTimeStamp(self, index):
         """Returns time stamp showing when coordinates were last changed."""
 
-        if self._n_cset:
+        if self._n_csets:
             if index is None:
                 return self._timestamps[self._acsi]
             else:
@@ -311,14 +331,21 @@ class AtomGroup(Atomic):
         atom group or atom pointer instances are called.
         """
 
+        self._coordsts += 1
         if index is None:
-            self._timestamps = np.zeros(self._n_csets)
-            self._timestamps.fill(time())
+            self._timestamps = np.zeros(self._n_csets, int)
+            self._timestamps.fill(self._coordsts)
             self._kdtrees = [None] * self._n_csets
         else:
-            self._timestamps[index] = time()
+            self._timestamps[index] = self._coordsts
             self._kdtrees[index] = None
 
+    def _setDataTimeStamp(self):
+        """Increment the data time stamp when atomic data, flags, or bonds
+        are changed, so that cached selection results are recalculated."""
+
+        self._datats += 1
+
     def _getKDTree(self, index=None):
         """Returns KDTree for coordinate set at given index."""
 
@@ -494,9 +521,10 @@ class AtomGroup(Atomic):
         self._coords = np.concatenate((self._coords, coords), axis=0)
         self._n_csets = self._coords.shape[0]
         timestamps = self._timestamps
-        self._timestamps = np.zeros(self._n_csets)
+        self._coordsts += 1
+        self._timestamps = np.zeros(self._n_csets, int)
         self._timestamps[:len(timestamps)] = timestamps
-        self._timestamps[len(timestamps):] = time()
+        self._timestamps[len(timestamps):] = self._coordsts
         self._kdtrees.extend([None] * diff)
         if label is None or isinstance(label, str):
             self._cslabels.extend([label] * diff)
@@ -532,6 +560,10 @@ class AtomGroup(Atomic):
             self._cslabels = [self._cslabels[i] for i in which]
             self._kdtrees = [self._kdtrees[i] for i in which]
         self._timestamps = self._timestamps[which]
+        # coordinate sets are shifted, so stamp them anew for cached results
+        if self._n_csets:
+            self._coordsts += 1
+            self._timestamps[:] = self._coordsts
 
     def getCoordsets(self, indices=None):
         """Returns a copy of coordinate set(s) at given *indices*.  *indices*
@@ -580,6 +612,9 @@ class AtomGroup(Atomic):
             arrays[id(self._coords)] = self._coords
         arrays.update(getboth(val)
                       for key, val in self._data.items() if val is not None)
+        if self._categories:
+            for codes, vocab in self._categories.values():
+                arrays.update((getboth(codes), getboth(vocab)))
         if self._bonds is not None:
             arrays[id(self._bonds)] = self._bonds
         if self._flags:
@@ -714,13 +749,25 @@ class AtomGroup(Atomic):
             if len(data) != self._n_atoms:
                 raise ValueError('len(data) must match number of atoms')
 
+            if self.isCategorical(label):
+                if ndim == 1 and dtype.char in 'SU':
+                    self._setCategories(label, data)
+                    self._setDataTimeStamp()
+                    return
+                self._categories.pop(label)
             self._data[label] = data
+            self._setDataTimeStamp()
 
     def delData(self, label):
         """Returns data associated with *label* and remove from the instance.
         If data associated with *label* is not found, return **None**."""
 
-        return self._data.pop(label, None)
+        self._setDataTimeStamp()
+        data = self._data.pop(label, None)
+        if data is None and self.isCategorical(label):
+            codes, vocab = self._categories.pop(label)
+            data = vocab[codes]
+        return data
 
     def getData(self, label):
         """Returns a copy of the data array associated with *label*, or **None**
@@ -732,7 +779,8 @@ class AtomGroup(Atomic):
 
     def _getData(self, label):
         """Returns data array associated with *label*, or **None** if such data
-        is not present."""
+        is not present.  A decoded copy is returned for data stored in
+        categorical form."""
 
         try:
             return self._data[label]
@@ -740,6 +788,9 @@ class AtomGroup(Atomic):
             try:
                 field = ATOMIC_FIELDS[label]
             except KeyError:
+                if self.isCategorical(label):
+                    codes, vocab = self._categories[label]
+                    return vocab[codes]
                 return None
             else:
                 return getattr(self, '_get' + field.meth_pl)()
@@ -759,11 +810,9 @@ class AtomGroup(Atomic):
         """Returns data labels.  For ``which='user'``, return only labels of
         user provided data."""
 
+        labels = list(self._data or []) + list(self._categories or [])
         if str(which).startswith('u'):  # user
-            labels = [key for key in (self._data or {})
-                      if not key in ATOMIC_FIELDS]
-        else:
-            labels = list(self._data or [])
+            labels = [key for key in labels if not key in ATOMIC_FIELDS]
         labels.sort()
         return labels
 
@@ -774,8 +823,91 @@ class AtomGroup(Atomic):
         try:
             return self._data[label].dtype
         except KeyError:
+            if self.isCategorical(label):
+                return self._categories[label][1].dtype
             return None
 
+    def setCategorical(self, label, categorical=True):
+        """Store string data associated with *label* in categorical form, i.e.
+        as small integer codes and a vocabulary of unique values.  For data
+        with few distinct values, such as atom and residue names, this reduces
+        memory usage considerably and selections evaluate string comparisons
+        only over the vocabulary.  Data is decoded transparently by ``get``
+        methods, e.g. :meth:`getNames`, and modifications using ``set``
+        methods keep the categorical form.  Use ``categorical=False`` to
+        store data as a regular array again.
+
+        Note that private ``_get`` methods, e.g. :meth:`_getNames`, return a
+        decoded copy of categorical data, so changes made to that array in
+        place are not stored."""
+
+        if self.isCategorical(label):
+            if not categorical:
+                codes, vocab = self._categories.pop(label)
+                self._data[label] = vocab[codes]
+            return
+
+        data = self._data.get(label)
+        if data is None:
+            raise ValueError('data associated with {0} is not set'
+                             .format(repr(label)))
+        if data.ndim != 1 or data.dtype.char not in 'SU':
+            raise ValueError('only 1-dimensional string data can be stored '
+                             'in categorical form')
+        if categorical:
+            self._setCategories(label, self._data.pop(label))
+
+    def isCategorical(self, label):
+        """Returns **True** if data associated with *label* is stored in
+        categorical form."""
+
+        return label in (self._categories or {})
+
+    def _setCategories(self, label, data):
+        """Encode and store string *data* in categorical form."""
+
+        vocab, codes = np.unique(data, return_inverse=True)
+        codes = codes.astype(_getCodeType(len(vocab)))
+        if self._categories is None:
+            self._categories = {}
+        self._categories[label] = codes, vocab
+
+    def _getCategories(self, label):
+        """Returns codes and vocabulary of data associated with *label*, or
+        **None** if data is not stored in categorical form."""
+
+        if self._categories is not None:
+            return self._categories.get(label)
+
+    def _setValues(self, label, index, values):
+        """Set *values* of data associated with *label* at *index*."""
+
+        if self.isCategorical(label):
+            codes, vocab = self._categories[label]
+            values = np.asarray(values, dtype=vocab.dtype)
+            missing = np.setdiff1d(values, vocab)
+            if len(missing):
+                n_values = len(vocab)
+                vocab = np.concatenate([vocab, missing])
+                # drop unused values when the vocabulary size passes a power
+                # of two and less than half of the values are in use
+                if len(vocab).bit_length() > n_values.bit_length():
+                    used = np.bincount(codes, minlength=n_values)
+                    if 2 * (used > 0).sum() < len(vocab):
+                        data = vocab[codes]
+                        data[index] = values
+                        self._setCategories(label, data)
+                        return
+                dtype = _getCodeType(len(vocab))
+                if dtype != codes.dtype:
+                    codes = codes.astype(dtype)
+                self._categories[label] = codes, vocab
+            # vocabulary is not sorted after new values are appended
+            order = vocab.argsort(kind='mergesort')
+            codes[index] = order[np.searchsorted(vocab, values, sorter=order)]
+        else:
+            self._data[label][index] = values
+
     def isFlagLabel(self, label):
         """Returns **True** if flags associated with *label* are present."""
 
@@ -793,20 +925,65 @@ class AtomGroup(Atomic):
         """Returns atom flag values for given *label*, or **None** when
         flags for *label* is not set."""
 
-        if self._flags is None:
-            self._flags = {}
-            self._subsets = {}
-        elif flags.TIMESTAMP != self._flagsts:
-            self._resetFlags()
-        self._flagsts = flags.TIMESTAMP
-
+        self._checkFlags()
         try:
-            return self._flags[label]
+            packed = self._flags[label]
         except KeyError:
             try:
                 return FLAG_PLANTERS[label](self, label)
             except KeyError:
                 pass
+        else:
+            return np.unpackbits(packed)[:self._n_atoms].view(bool)
+
+    def _getPackedFlags(self, label):
+        """Returns atom flags for given *label* packed into bits of an unsigned
+        byte array, or **None** when flags for *label* is not set."""
+
+        self._checkFlags()
+        try:
+            return self._flags[label]
+        except KeyError:
+            if self._getFlags(label) is not None:
+                return self._flags.get(label)
+
+    def _getFlag(self, label, index):
+        """Returns flag value of atom at *index* for given *label*."""
+
+        packed = self._getPackedFlags(label)
+        if packed is not None:
+            return bool(packed[index >> 3] & (128 >> (index & 7)))
+
+    def _setFlag(self, label, index, value):
+        """Set flag value of atom at *index* for given *label* by changing a
+        single bit of packed flags, which are shared by flag aliases."""
+
+        packed = self._getPackedFlags(label)
+        bit = 128 >> (index & 7)
+        if value:
+            packed[index >> 3] |= bit
+        else:
+            packed[index >> 3] &= 255 ^ bit
+        if self._subsets:
+            for label in FLAG_ALIASES.get(label, [label]):
+                self._subsets.pop(label, None)
+
+    def _checkFlags(self):
+        """Initialize flag store, or reset flags whose definitions have
+        changed since they were calculated."""
+
+        if self._flags is None:
+            self._flags = {}
+            self._subsets = {}
+        elif flags.TIMESTAMP != self._flagsts:
+            labels = flags.getChangedFlags(self._flagsts)
+            if labels is None:
+                self._resetFlags()
+            else:
+                for label in labels:
+                    self._flags.pop(label, None)
+                    self._subsets.pop(label, None)
+        self._flagsts = flags.TIMESTAMP
 
     def setFlags(self, label, flags):
         """Set atom *flags* for *label*."""
@@ -824,21 +1001,28 @@ class AtomGroup(Atomic):
         if len(flags) != self._n_atoms:
             raise ValueError('len(flags) must be equal to number of atoms')
         self._setFlags(label, flags)
+        self._setDataTimeStamp()
 
     def _setFlags(self, label, flags):
-        """Set atom flags."""
+        """Set atom flags.  Flags are stored packed into bits."""
 
         if self._flags is None:
             self._flags = {}
             self._subsets = {}
+        packed = np.packbits(flags)
         for label in FLAG_ALIASES.get(label, [label]):
-            self._flags[label] = flags
+            self._flags[label] = packed
+            if self._subsets:
+                self._subsets.pop(label, None)
 
     def delFlags(self, label):
         """Returns flags associated with *label* and remove from the instance.
         If flags associated with *label* is not found, return **None**."""
 
-        return self._flags.pop(label, None)
+        self._setDataTimeStamp()
+        packed = (self._flags or {}).pop(label, None)
+        if packed is not None:
+            return np.unpackbits(packed)[:self._n_atoms].view(bool)
 
     def _setSubset(self, label, indices):
         """Set indices of a subset of atoms."""
@@ -849,12 +1033,7 @@ class AtomGroup(Atomic):
     def _getSubset(self, label):
         """Returns indices of atoms."""
 
-        if self._flags is None:
-            self._flags = {}
-            self._subsets = {}
-        elif flags.TIMESTAMP != self._flagsts:
-            self._resetFlags()
-        self._flagsts = flags.TIMESTAMP
+        self._checkFlags()
 
         try:
             return self._subsets[label]
@@ -993,10 +1172,10 @@ class AtomGroup(Atomic):
             raise ValueError('bonds.ndim must be 2')
         if bonds.shape[1] != 2:
             raise ValueError('bonds.shape must be (n_bonds, 2)')
-        if bonds.min() < 0:
+        if len(bonds) and bonds.min() < 0:
             raise ValueError('negative atom indices are not valid')
         n_atoms = self._n_atoms
-        if bonds.max() >= n_atoms:
+        if len(bonds) and bonds.max() >= n_atoms:
             raise ValueError('atom indices are out of range')
         bonds.sort(1)
         bonds = bonds[bonds[:, 1].argsort(), ]
@@ -1004,7 +1183,57 @@ class AtomGroup(Atomic):
 
         self._bmap, self._data['numbonds'] = evalBonds(bonds, n_atoms)
         self._bonds = bonds
+        self._bgraph = None
         self._fragments = None
+        self._data.pop('fragindex', None)
+        self._setDataTimeStamp()
+
+    def inferBonds(self, tolerance=0.45, residues=False):
+        """Set covalent bonds between atoms that are closer than the sum of
+        their covalent radii plus *tolerance*, using coordinates from the
+        active coordinate set.  Radii are determined from element symbols,
+        or from atom names when elements are not set.  Bonds are set using
+        :meth:`setBonds` and their number is returned.
+
+        :arg tolerance: distance (Å) added to sum of covalent radii, default
+            is 0.45
+        :type tolerance: float
+
+        :arg residues: when **True**, bonds are restricted to atoms of the
+            same residue and to peptide, phosphodiester, and disulfide links
+            between residues of the same chain, default is **False**
+        :type residues: bool"""
+
+        coords = self._getCoords()
+        if coords is None:
+            raise ValueError('coordinates of {0} are not set'
+                             .format(str(self)))
+        elements = self._getElements()
+        if elements is None or not (elements != '').any():
+            names = self._getNames()
+            if names is None:
+                raise ValueError('elements or names of {0} must be set'
+                                 .format(str(self)))
+            elements = guessElements(names, self._getResnames())
+        bonds = evalCovalentBonds(coords, getCovalentRadii(elements),
+                                  tolerance)
+
+        if residues and len(bonds):
+            resindices = self._getResindices()
+            one, two = bonds.T
+            which = resindices[one] == resindices[two]
+            names = self._getNames()
+            if names is not None:
+                chids = self._getChindices()
+                link = np.zeros(len(bonds), bool)
+                for a, b in RESIDUE_LINKS:
+                    link |= ((names[one] == a) & (names[two] == b) |
+                             (names[one] == b) & (names[two] == a))
+                which |= link & (chids[one] == chids[two])
+            bonds = bonds[which]
+
+        self.setBonds(bonds)
+        return len(bonds)
 
     def numBonds(self):
         """Returns number of bonds.  Use :meth:`setBonds` for setting bonds."""
@@ -1054,6 +1283,16 @@ class AtomGroup(Atomic):
                 yield frag
 
 
+    def _getBondGraph(self):
+        """Returns bond graph in compressed sparse row form, i.e. *indptr* and
+        *indices* arrays, see :func:`.evalBondGraph`."""
+
+        if self._bonds is None:
+            return None
+        if self._bgraph is None:
+            self._bgraph = evalBondGraph(self._bonds, self._n_atoms)
+        return self._bgraph
+
     def _fragment(self):
         """Set unique fragment indices to connected atom subsets using bond
         information."""
@@ -1062,51 +1301,11 @@ class AtomGroup(Atomic):
             raise ValueError('bonds must be set for fragment determination, '
                              'use `setBonds`')
 
-        fids = np.zeros(self._n_atoms, int)
-        fdict = {}
-        c = 0
-        for a, b in self._bonds:
-            af = fids[a]
-            bf = fids[b]
-            if af and bf:
-                if af != bf:
-                    frag = fdict[af]
-                    temp = fdict[bf]
-                    fids[temp] = af
-                    frag.extend(temp)
-                    fdict.pop(bf)
-            elif af:
-                fdict[af].append(b)
-                fids[b] = af
-            elif bf:
-                fdict[bf].append(a)
-                fids[a] = bf
-            else:
-                c += 1
-                fdict[c] = [a, b]
-                fids[a] = fids[b] = c
-        fragindices = np.zeros(self._n_atoms, int)
-        fragments = []
-        append = fragments.append
-        fidset = set()
-        c = 0
-        for i, fid in enumerate(fids):
-            if fid in fidset:
-                continue
-            elif fid:
-                fidset.add(fid)
-                indices = fdict[fid]
-                indices.sort()
-                append(indices)
-                fragindices[indices] = c
-                c += 1
-            else:
-                # these are non-bonded atoms, e.g. ions
-                fragindices[i] = c
-                append([i])
-                c += 1
+        fragindices = evalFragments(self._bonds, self._n_atoms)
+        order = fragindices.argsort(kind='mergesort')
+        bounds = np.cumsum(np.bincount(fragindices))[:-1]
         self._data['fragindex'] = fragindices
-        self._fragments = fragments
+        self._fragments = np.split(order, bounds)
 
 
 for fname, field in ATOMIC_FIELDS.items():
@@ -1137,10 +1336,17 @@ for fname, field in ATOMIC_FIELDS.items():
                 try:
                     return self._data[var].copy()
                 except KeyError:
-                    pass
+                    if self._categories and var in self._categories:
+                        codes, vocab = self._categories[var]
+                        return vocab[codes]
 
         def _getData(self, var=fname):
-            return self._data.get(var)
+            try:
+                return self._data[var]
+            except KeyError:
+                if self._categories and var in self._categories:
+                    codes, vocab = self._categories[var]
+                    return vocab[codes]
 
     if not field.private:
         getData = wrapGetMethod(getData)
@@ -1159,11 +1365,14 @@ for fname, field in ATOMIC_FIELDS.items():
     # Define public method for setting values in data array
     def setData(self, array, var=fname, dtype=field.dtype,
                 ndim=field.ndim, none=field.none, flags=field.flags):
+        self._setDataTimeStamp()
         if array is None:
             self._data.pop(var, None)
+            if self._categories:
+                self._categories.pop(var, None)
         else:
             if np.isscalar(array):
-                self._data[var][:] = array
+                self._setValues(var, slice(None), array)
             else:
                 if self._n_atoms == 0:
                     self._n_atoms = len(array)
@@ -1185,7 +1394,10 @@ for fname, field in ATOMIC_FIELDS.items():
                     except ValueError:
                         raise ValueError('array cannot be assigned type '
                                         '{0}'.format(dtype))
-                self._data[var] = array
+                if self.isCategorical(var):
+                    self._setCategories(var, array)
+                else:
+                    self._data[var] = array
                 if none: self._none(none)
                 if flags and self._flags:
                     self._resetFlags(var)
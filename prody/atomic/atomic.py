@@ -184,6 +184,8 @@ class Atomic(object):
                     new._data[label] = this.getData(label)
             else:
                 new.setData(label, this.getData(label))
+                if ag.isCategorical(label):
+                    new.setCategorical(label)
 
         #if readonly:
         #    for label in READONLY:
@@ -228,8 +230,9 @@ class Atomic(object):
     toAtomGroup = copy
 
     def select(self, selstr, **kwargs):
-        """Returns atoms matching *selstr* criteria.  See :mod:`~.select` module
-        documentation for details and usage examples."""
+        """Returns atoms matching *selstr* criteria.  *selstr* may also be a
+        :class:`.CompiledSelection`.  See :mod:`~.select` module documentation
+        for details and usage examples."""
 
         return SELECT.select(self, selstr, **kwargs)
 
@@ -5,8 +5,25 @@ by using :meth:`.AtomGroup.setBonds` method."""
 from numbers import Integral
 import numpy as np
 
+from prody.kdtree import KDTree
+
 __all__ = ['Bond']
 
+#: Covalent radii (Å) of elements from Cordero B, et al. Covalent radii
+#: revisited. *Dalton Trans* **2008** 21:2832-2838.
+COVALENT_RADII = {
+    'H': 0.31, 'D': 0.31, 'LI': 1.28, 'BE': 0.96, 'B': 0.84, 'C': 0.76,
+    'N': 0.71, 'O': 0.66, 'F': 0.57, 'NA': 1.66, 'MG': 1.41, 'AL': 1.21,
+    'SI': 1.11, 'P': 1.07, 'S': 1.05, 'CL': 1.02, 'K': 2.03, 'CA': 1.76,
+    'V': 1.53, 'CR': 1.39, 'MN': 1.39, 'FE': 1.32, 'CO': 1.26, 'NI': 1.24,
+    'CU': 1.32, 'ZN': 1.22, 'AS': 1.19, 'SE': 1.20, 'BR': 1.20, 'MO': 1.54,
+    'CD': 1.44, 'I': 1.39, 'PT': 1.36, 'AU': 1.36, 'HG': 1.32,
+}
+
+#: Pairs of atom names that make covalent links between residues, i.e.
+#: peptide, phosphodiester, and disulfide bonds.
+RESIDUE_LINKS = [('C', 'N'), ("O3'", 'P'), ('O3*', 'P'), ('SG', 'SG')]
+
 class Bond(object):
 
     """A pointer class for bonded atoms.  Following built-in functions are
@@ -119,24 +136,152 @@ def evalBonds(bonds, n_atoms):
     """Returns an array mapping atoms to their bonded neighbors and an array
     that stores number of bonds made by each atom."""
 
-    numbonds = np.bincount(bonds.reshape((bonds.shape[0] * 2)))
-    bmap = np.zeros((n_atoms, numbonds.max()), int)
+    indptr, indices = evalBondGraph(bonds, n_atoms)
+    numbonds = np.diff(indptr)
+    bmap = np.zeros((n_atoms, numbonds.max() if n_atoms else 0), int)
     bmap.fill(-1)
-    index = np.zeros(n_atoms, int)
-    for bond in bonds:
-        a, b = bond
-        bmap[a, index[a]] = b
-        bmap[b, index[b]] = a
-        index[bond] += 1
+    rows = np.repeat(np.arange(n_atoms), numbonds)
+    cols = np.arange(len(indices)) - indptr[rows]
+    bmap[rows, cols] = indices
     return bmap, numbonds
 
 
+def evalBondGraph(bonds, n_atoms):
+    """Returns bond graph in compressed sparse row (CSR) form, i.e. arrays
+    *indptr* and *indices*, where neighbors of atom ``i`` are
+    ``indices[indptr[i]:indptr[i+1]]`` in ascending order."""
+
+    bonds = np.asarray(bonds).reshape((-1, 2))
+    source = np.concatenate([bonds[:, 0], bonds[:, 1]])
+    target = np.concatenate([bonds[:, 1], bonds[:, 0]])
+    order = np.lexsort((target, source))
+    indptr = np.zeros(n_atoms + 1, int)
+    indptr[1:] = np.cumsum(np.bincount(source, minlength=n_atoms))
+    return indptr, target[order]
+
+
+def expandBonded(indptr, indices, which):
+    """Returns indices of atoms bonded to atoms at indices *which*, i.e.
+    non-zero elements of product of the adjacency matrix and a vector of
+    *which* atoms.  Indices may be repeated."""
+
+    starts = indptr[which]
+    counts = indptr[np.asarray(which) + 1] - starts
+    total = counts.sum()
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return indices[np.repeat(starts, counts) + offsets]
+
+
+def evalFragments(bonds, n_atoms):
+    """Returns fragment indices of atoms, i.e. indices of connected components
+    of the bond graph, which start from zero and are assigned in the order of
+    appearance.  Components are found using :mod:`scipy.sparse.csgraph` when
+    it is available, and using :func:`_linkFragments` otherwise."""
+
+    if len(bonds):
+        try:
+            from scipy.sparse import coo_matrix
+            from scipy.sparse.csgraph import connected_components
+        except ImportError:
+            pass
+        else:
+            a, b = np.asarray(bonds).T
+            graph = coo_matrix((np.ones(len(a), bool), (a, b)),
+                               shape=(n_atoms, n_atoms))
+            return connected_components(graph, directed=False)[1].astype(int)
+    return _linkFragments(bonds, n_atoms)
+
+
+def _linkFragments(bonds, n_atoms):
+    """Returns fragment indices of atoms as :func:`evalFragments` does.
+    Components are found by repeatedly linking their roots, the smallest atom
+    index, and compressing paths to the roots."""
+
+    roots = np.arange(n_atoms)
+    if len(bonds):
+        a, b = np.asarray(bonds).T
+        while True:
+            ra, rb = roots[a], roots[b]
+            differ = ra != rb
+            if not differ.any():
+                break
+            ra, rb = ra[differ], rb[differ]
+            # link larger root to smallest root it is bonded to, which keeps
+            # the graph acyclic, repeated roots are reduced unbuffered
+            np.minimum.at(roots, np.maximum(ra, rb), np.minimum(ra, rb))
+            while True:
+                jumped = roots[roots]
+                if (jumped == roots).all():
+                    break
+                roots = jumped
+    return np.unique(roots, return_inverse=True)[1]
+
+
+def getCovalentRadii(elements, default=0.76):
+    """Returns covalent radii of *elements*, see :data:`COVALENT_RADII`.
+    Radii are looked up once for each unique element symbol, which is
+    case-insensitive.  *default* radius is used for unknown elements."""
+
+    elements, inverse = np.unique(np.asarray(elements), return_inverse=True)
+    radii = np.array([COVALENT_RADII.get(str(e).strip().upper(), default)
+                      for e in elements], float)
+    return radii[inverse]
+
+
+def guessElements(names, resnames=None):
+    """Returns element symbols guessed from atom *names*, i.e. the first
+    letter of a name after leading digits.  When *resnames* are given, names
+    of single atom residues that match a two letter element symbol, such as
+    ``ZN`` or ``MG`` ions, are kept."""
+
+    names = np.char.upper(np.char.strip(np.asarray(names, str)))
+    if resnames is not None:
+        resnames = np.char.upper(np.char.strip(np.asarray(resnames, str)))
+        keys = np.char.add(np.char.add(names, ' '), resnames)
+    else:
+        keys = names
+    keys, inverse = np.unique(keys, return_inverse=True)
+    elements = []
+    for key in keys:
+        items = str(key).split(' ')
+        name = items[0].lstrip('0123456789')
+        if len(items) > 1 and name == items[1] and name in COVALENT_RADII:
+            elements.append(name)
+        else:
+            elements.append(name[:1])
+    return np.array(elements, str)[inverse]
+
+
+def evalCovalentBonds(coords, radii, tolerance=0.45):
+    """Returns an array of pairs of indices of atoms that are closer than the
+    sum of their covalent *radii* plus *tolerance*.  Pairs are found in a
+    single neighbor search with the longest possible bond length as radius.
+    Pairs closer than 0.4 Å, e.g. alternate locations, are not bonded."""
+
+    radii = np.asarray(radii, float)
+    if not len(radii):
+        return np.zeros((0, 2), int)
+    kdtree = KDTree(coords, method='celllist')
+    kdtree.search(2 * radii.max() + tolerance)
+    if not kdtree.getCount():
+        return np.zeros((0, 2), int)
+    pairs = kdtree.getIndices()
+    dist = kdtree.getDistances()
+    which = (dist > 0.4) & (dist <= radii[pairs[:, 0]] + radii[pairs[:, 1]] +
+                                     tolerance)
+    return pairs[which]
+
+
 def trimBonds(bonds, indices):
     """Returns bonds between atoms at given indices."""
 
-    iset = set(indices)
-    bonds = [bond for bond in bonds if bond[0] in iset and bond[1] in iset]
-    if bonds:
-        newindices = np.zeros(indices.max()+1, int)
-        newindices[indices] = np.arange(len(indices))
-        return newindices[np.array(bonds)]
+    indices = np.asarray(indices)
+    if not len(indices) or not len(bonds):
+        return None
+    newindices = np.zeros(max(indices.max(), bonds.max()) + 1, int)
+    newindices.fill(-1)
+    newindices[indices] = np.arange(len(indices))
+    bonds = newindices[bonds]
+    bonds = bonds[(bonds > -1).all(1)]
+    if len(bonds):
+        return bonds
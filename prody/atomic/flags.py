@@ -55,7 +55,10 @@ PLANTERS = {}
 EDITORS = {}
 FIELDS = defaultdict(set)  # flags that fill be nulled when a field changes
 FIELDSDEFAULT = ['name', 'resname', 'resnum']
+DEPENDENTS = defaultdict(set)  # flags that will be nulled when a flag changes
+HIERARCHY = ['chain', 'segment', 'resnum', 'icode']  # fields of residues
 TIMESTAMP = 0
+CHANGES = []  # time stamps and labels of flags affected by changes
 
 PDBLIGSUM = ('.. _{0}: '
              'http://www.pdb.org/pdb/ligand/ligandsummary.do?hetId={0}\n')
@@ -200,12 +203,53 @@ def addPlanter(func, *labels, **kwargs):
             EDITORS[label] = editor
     for field in kwargs.get('fields', FIELDSDEFAULT):
         FIELDS[field].update(labels)
+    # flags calculated using other flags are nulled along with them
+    for flag in kwargs.get('flags', []):
+        for field, dependents in FIELDS.items():
+            if flag in dependents:
+                dependents.update(labels)
+        for alias in ALIASES.get(flag, [flag]):
+            DEPENDENTS[alias].update(labels)
+        for dependents in DEPENDENTS.values():
+            if flag in dependents:
+                dependents.update(labels)
+
+
+def setTimeStamp(labels=None):
+    """Set a new time stamp for flag definitions and record *labels* of
+    changed definitions.  **None** means that all flags are affected."""
+
+    timestamp = max(int(time()), TIMESTAMP + 1)
+    SETTINGS[TIMESTAMP_KEY] = timestamp
+    if labels is not None:
+        affected = set()
+        for label in labels:
+            for alias in ALIASES.get(label, [label]):
+                affected.add(alias)
+                affected.update(DEPENDENTS[alias])
+        labels = affected
+    CHANGES.append((timestamp, labels))
+
+
+def getChangedFlags(timestamp):
+    """Returns labels of flags whose definitions changed after *timestamp*,
+    or **None** when all flags need to be recalculated."""
+
+    if timestamp < SESSIONTS:
+        return None
+    labels = set()
+    for ts, changed in CHANGES:
+        if ts > timestamp:
+            if changed is None:
+                return None
+            labels.update(changed)
+    return labels
 
 
 def updateNonstandard(nonstd):
 
     SETTINGS[NONSTANDARD_KEY] = nonstd
-    SETTINGS[TIMESTAMP_KEY] = int(time())
+    setTimeStamp()
     SETTINGS.save()
     updateDefinitions()
 
@@ -215,7 +259,7 @@ def changeDefinitions(**kwargs):
     defs = SETTINGS.get(DEFINITIONS_KEY, {})
     defs.update(kwargs)
     SETTINGS[DEFINITIONS_KEY] = defs
-    SETTINGS[TIMESTAMP_KEY] = int(time())
+    setTimeStamp(kwargs)
     SETTINGS.save()
     updateDefinitions()
 
@@ -225,12 +269,12 @@ def resetDefinitions(flag):
     if flag == 'all':
         SETTINGS.pop(DEFINITIONS_KEY, None)
         SETTINGS.pop(NONSTANDARD_KEY, None)
-        SETTINGS[TIMESTAMP_KEY] = int(time())
+        setTimeStamp()
         SETTINGS.save()
         updateDefinitions()
     elif flag == 'nonstdaa':
         SETTINGS.pop(NONSTANDARD_KEY, None)
-        SETTINGS[TIMESTAMP_KEY] = int(time())
+        setTimeStamp()
         SETTINGS.save()
         updateDefinitions()
     else:
@@ -239,7 +283,7 @@ def resetDefinitions(flag):
         except KeyError:
             pass
         else:
-            SETTINGS[TIMESTAMP_KEY] = int(time())
+            setTimeStamp([flag])
             SETTINGS.save()
             updateDefinitions()
 
@@ -767,7 +811,7 @@ def setCalpha(ag, label):
         ag._setSubset(label, array([]))
     return flags
 
-addPlanter(setCalpha, 'ca', 'calpha')
+addPlanter(setCalpha, 'ca', 'calpha', fields=['name', 'resname'])
 
 
 def setProtein(ag, label):
@@ -783,7 +827,8 @@ def setProtein(ag, label):
     ag._setFlags('protein', flags)
     return flags
 
-addPlanter(setProtein, 'protein', 'aminoacid')
+addPlanter(setProtein, 'protein', 'aminoacid', fields=HIERARCHY,
+           flags=['calpha'])
 
 # subsets
 #==============================================================================
@@ -802,8 +847,10 @@ def setBackbone(ag, label):
     ag._setFlags(label, flags)
     return flags
 
-addPlanter(setBackbone, 'bb', 'backbone', editor=changeBackbone)
-addPlanter(setBackbone, 'bbfull', 'backbonefull', editor=changeBackbone)
+addPlanter(setBackbone, 'bb', 'backbone', editor=changeBackbone,
+           fields=['name'], flags=['protein'])
+addPlanter(setBackbone, 'bbfull', 'backbonefull', editor=changeBackbone,
+           fields=['name'], flags=['protein'])
 
 
 def setSidechain(ag, label):
@@ -818,7 +865,8 @@ def setSidechain(ag, label):
     ag._setFlags(label, flags)
     return flags
 
-addPlanter(setSidechain, 'sc', 'sidechain')
+addPlanter(setSidechain, 'sc', 'sidechain', fields=[],
+           flags=['protein', 'bbfull'])
 
 
 def setCategories(ag, label):
@@ -837,7 +885,7 @@ def setCategories(ag, label):
     return flags
 
 addPlanter(setCategories, 'stdaa', 'nonstdaa', *list(CATEGORIZED.keys()),
-           aliases=False)
+           aliases=False, fields=['resname'] + HIERARCHY, flags=['ca'])
 
 
 def setAll(ag, label):
@@ -846,7 +894,7 @@ def setAll(ag, label):
     ag._setFlags('all', flags)
     return flags
 
-addPlanter(setAll, 'all')
+addPlanter(setAll, 'all', fields=[])
 
 
 def setNone(ag, label):
@@ -855,7 +903,7 @@ def setNone(ag, label):
     ag._setFlags('none', flags)
     return flags
 
-addPlanter(setNone, 'none')
+addPlanter(setNone, 'none', fields=[])
 
 # hetero, nucleic, water, etc.
 #==============================================================================
@@ -870,8 +918,9 @@ def setResiflag(ag, label):
 
 addPlanter(setResiflag, 'nucleobase', 'nucleoside', 'nucleotide',
            'water', 'ion', 'lipid', 'sugar', 'heme', 'at', 'cg', 'purine',
-           'pyrimidine', aliases=False, editor=changeResnames)
-addPlanter(setResiflag, 'nucleic')
+           'pyrimidine', aliases=False, editor=changeResnames,
+           fields=['resname'])
+addPlanter(setResiflag, 'nucleic', fields=['resname'])
 
 
 def setHetero(ag, label):
@@ -882,7 +931,7 @@ def setHetero(ag, label):
     ag._setFlags('hetero', flags)
     return flags
 
-addPlanter(setHetero, 'hetero',)
+addPlanter(setHetero, 'hetero', fields=[], flags=['protein', 'nucleic'])
 
 
 # element
@@ -897,7 +946,8 @@ def setElement(ag, label):
     return flags
 
 addPlanter(setElement, 'hydrogen', 'carbon', 'nitrogen', 'oxygen', 'sulfur',
-           aliases=False, editor=changeNameRegex)
+           aliases=False, editor=changeNameRegex, fields=['name'],
+           flags=['ion'])
 
 
 def setNoh(ag, label):
@@ -907,7 +957,7 @@ def setNoh(ag, label):
     ag._setFlags(label, flags)
     return flags
 
-addPlanter(setNoh, 'noh', 'heavy')
+addPlanter(setNoh, 'noh', 'heavy', fields=[], flags=['hydrogen'])
 
 
 # secondary
@@ -1158,3 +1208,4 @@ def listNonstdAAProps(resname):
 
 
 updateDefinitions()
+SESSIONTS = TIMESTAMP
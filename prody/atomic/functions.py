@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 """This module defines some functions for handling atomic classes and data."""
 
+import os
+from hashlib import sha1
+from numbers import Number
 from textwrap import wrap
 
-from numpy import load, savez, ones, zeros, array, argmin, where
+from numpy import load, save, savez, ones, zeros, array, argmin, where
 from numpy import ndarray, asarray, isscalar, concatenate, arange, ix_
+from numpy import empty, cumsum, result_type, unique, split, bincount
 
 from prody.utilities import openFile, rangeString, getDistance
-from prody import LOGGER
+from prody import LOGGER, SETTINGS, __version__
 
 from . import flags
 from . import select
@@ -15,12 +19,13 @@ from . import select
 from .atomic import Atomic
 from .atomgroup import AtomGroup
 from .atommap import AtomMap
-from .bond import trimBonds, evalBonds
+from .bond import trimBonds, evalBonds, evalFragments
 from .fields import ATOMIC_FIELDS
 from .selection import Selection
 from .hierview import HierView
 
 __all__ = ['iterFragments', 'findFragments', 'loadAtoms', 'saveAtoms',
+           'pathAtomsCache', 'joinAtoms',
            'isReserved', 'listReservedWords', 'sortAtoms', 'sliceAtoms', 
            'extendAtoms', 'sliceAtomicData', 'extendAtomicData']
 
@@ -30,18 +35,10 @@ SAVE_SKIP_POINTER = set(['numbonds', 'fragindex', 'segindex', 'chindex',
                          'resindex'])
 
 
-def saveAtoms(atoms, filename=None, **kwargs):
-    """Save *atoms* in ProDy internal format.  All :class:`.Atomic` classes are
-    accepted as *atoms* argument.  This function saves user set atomic data as
-    well.  Note that title of the :class:`.AtomGroup` instance is used as the
-    filename when *atoms* is not an :class:`.AtomGroup`.  To avoid overwriting
-    an existing file with the same name, specify a *filename*."""
-
-    try:
-        atoms.getACSIndex()
-    except AttributeError:
-        raise TypeError('atoms must be Atomic instance, not {0}'
-                        .format(type(atoms)))
+def _getAtomArrays(atoms):
+    """Returns a dictionary of arrays that store data of *atoms* in the
+    layout used by :func:`saveAtoms`.  The dictionary can be turned back into
+    an atom group using :func:`_buildAtomGroup`."""
 
     try:
         ag = atoms.getAtomGroup()
@@ -53,11 +50,6 @@ def saveAtoms(atoms, filename=None, **kwargs):
         SKIP = SAVE_SKIP_POINTER
         title = str(atoms)
 
-    if filename is None:
-        filename = ag.getTitle().replace(' ', '_')
-    if '.ag.npz' not in filename:
-        filename += '.ag.npz'
-
     attr_dict = {'title': title}
     attr_dict['n_atoms'] = atoms.numAtoms()
     attr_dict['n_csets'] = atoms.numCoordsets()
@@ -69,7 +61,7 @@ def saveAtoms(atoms, filename=None, **kwargs):
     bonds = ag._bonds
     bmap = ag._bmap
     if bonds is not None and bmap is not None:
-        if atoms == ag:
+        if atoms is ag:
             attr_dict['bonds'] = bonds
             attr_dict['bmap'] = bmap
             attr_dict['numbonds'] = ag._data['numbonds']
@@ -82,15 +74,77 @@ def saveAtoms(atoms, filename=None, **kwargs):
             attr_dict['bmap'], attr_dict['numbonds'] = \
                 evalBonds(bonds, len(atoms))
 
+    categories = []
     for label in atoms.getDataLabels():
         if label in SKIP:
             continue
-        attr_dict[label] = atoms._getData(label)
+        if ag.isCategorical(label):
+            # save codes and vocabulary, which are restored without decoding
+            codes, vocab = ag._getCategories(label)
+            if atoms is not ag:
+                codes = codes[atoms._getIndices()]
+            attr_dict[label + '.codes'] = codes
+            attr_dict[label + '.vocab'] = vocab
+            categories.append(label)
+        else:
+            attr_dict[label] = atoms._getData(label)
+    if categories:
+        attr_dict['categories'] = array(categories)
     for label in atoms.getFlagLabels():
         if label in SKIP:
             continue
         attr_dict[label] = atoms._getFlags(label)
 
+    return attr_dict
+
+
+def saveAtoms(atoms, filename=None, **kwargs):
+    """Save *atoms* in ProDy internal format.  All :class:`.Atomic` classes are
+    accepted as *atoms* argument.  This function saves user set atomic data as
+    well.  Note that title of the :class:`.AtomGroup` instance is used as the
+    filename when *atoms* is not an :class:`.AtomGroup`.  To avoid overwriting
+    an existing file with the same name, specify a *filename*.
+
+    By default, arrays are saved in a single :file:`.ag.npz` file.  When
+    ``format='npy'`` is passed, each array is saved in a separate
+    :file:`.npy` file in a :file:`.ag` directory, which can be loaded using
+    memory mapping, see :func:`loadAtoms`.  Categorical data is saved as
+    codes and vocabulary, and is loaded in categorical form."""
+
+    try:
+        atoms.getACSIndex()
+    except AttributeError:
+        raise TypeError('atoms must be Atomic instance, not {0}'
+                        .format(type(atoms)))
+
+    format = kwargs.pop('format', 'npz')
+    if format not in ('npz', 'npy'):
+        raise ValueError("format must be 'npz' or 'npy'")
+
+    if filename is None:
+        try:
+            filename = atoms.getAtomGroup().getTitle()
+        except AttributeError:
+            filename = atoms.getTitle()
+        filename = filename.replace(' ', '_')
+    if format == 'npy':
+        if not filename.endswith('.ag'):
+            filename += '.ag'
+    elif '.ag.npz' not in filename:
+        filename += '.ag.npz'
+
+    attr_dict = _getAtomArrays(atoms)
+
+    if format == 'npy':
+        if not os.path.isdir(filename):
+            os.makedirs(filename)
+        for label in os.listdir(filename):
+            if label.endswith('.npy'):
+                os.remove(os.path.join(filename, label))
+        for label, data in attr_dict.items():
+            save(os.path.join(filename, label + '.npy'), data)
+        return filename
+
     ostream = openFile(filename, 'wb', **kwargs)
     savez(ostream, **attr_dict)
     ostream.close()
@@ -99,25 +153,55 @@ def saveAtoms(atoms, filename=None, **kwargs):
 
 SKIPLOAD = set(['title', 'n_atoms', 'n_csets', 'bonds', 'bmap',
                 'coordinates', 'cslabels', 'numbonds', 'flagsts',
-                'segindex', 'chindex', 'resindex'])
+                'segindex', 'chindex', 'resindex', 'categories'])
 
 
-def loadAtoms(filename):
-    """Returns :class:`.AtomGroup` instance loaded from *filename* using
-    :func:`numpy.load` function.  See also :func:`saveAtoms`."""
+class NpyDirectory(object):
 
-    LOGGER.timeit('_prody_loadatoms')
-    attr_dict = load(filename)
-    files = set(attr_dict.files)
+    """Dictionary like access to arrays saved in a directory by
+    :func:`saveAtoms`.  Arrays are read when they are accessed, and atomic
+    data arrays are memory mapped when *mmap_mode* is given."""
 
-    if not 'n_atoms' in files:
-        raise ValueError('{0} is not a valid atomic data file'
-                         .format(repr(filename)))
+    def __init__(self, path, mmap_mode=None):
+
+        self.path = path
+        self.mmap_mode = mmap_mode
+        self.files = [fn[:-4] for fn in os.listdir(path)
+                      if fn.endswith('.npy')]
+
+    def __getitem__(self, label):
+
+        if (label in SKIPLOAD and label != 'coordinates' or
+            label.endswith('.vocab')):
+            mmap_mode = None
+        else:
+            mmap_mode = self.mmap_mode
+        return load(os.path.join(self.path, label + '.npy'), mmap_mode)
+
+    def __contains__(self, label):
+
+        return label in self.files
+
+    def items(self):
+
+        for label in self.files:
+            yield label, self[label]
+
+
+def _buildAtomGroup(attr_dict):
+    """Returns an :class:`.AtomGroup` built from arrays in *attr_dict*, which
+    may be a dictionary returned by :func:`_getAtomArrays` or arrays loaded
+    from a file saved by :func:`saveAtoms`."""
+
+    try:
+        files = set(attr_dict.files)
+    except AttributeError:
+        files = set(attr_dict)
     title = str(attr_dict['title'])
 
+    ag = AtomGroup(title)
     if 'coordinates' in files:
         coords = attr_dict['coordinates']
-        ag = AtomGroup(title)
         ag._n_csets = int(attr_dict['n_csets'])
         ag._coords = coords
     ag._n_atoms = int(attr_dict['n_atoms'])
@@ -130,10 +214,17 @@ def loadAtoms(filename):
         ag._bmap = attr_dict['bmap']
         ag._data['numbonds'] = attr_dict['numbonds']
 
+    if 'categories' in files:
+        ag._categories = {}
+        for label in attr_dict['categories']:
+            label = str(label)
+            ag._categories[label] = (attr_dict[label + '.codes'],
+                                     attr_dict[label + '.vocab'])
+
     skip_flags = set()
 
     for label, data in attr_dict.items():
-        if label in SKIPLOAD:
+        if label in SKIPLOAD or '.' in label:
             continue
         if data.ndim == 1 and data.dtype == bool:
             if label in skip_flags:
@@ -154,10 +245,285 @@ def loadAtoms(filename):
     if 'cslabels' in files:
         ag.setCSLabels(list(attr_dict['cslabels']))
 
+    return ag
+
+
+def loadAtoms(filename, mmap_mode=None):
+    """Returns :class:`.AtomGroup` instance loaded from *filename* using
+    :func:`numpy.load` function.  See also :func:`saveAtoms`.
+
+    When *filename* is a directory saved using ``format='npy'``, coordinate
+    sets and atomic data can be memory mapped by passing *mmap_mode*, e.g.
+    ``'r'`` for read only or ``'c'`` for copy-on-write access.  Memory mapped
+    arrays are read from the disk when and as they are accessed, so loading
+    is fast even for large structures with many coordinate sets."""
+
+    LOGGER.timeit('_prody_loadatoms')
+    if os.path.isdir(filename):
+        attr_dict = NpyDirectory(filename, mmap_mode)
+    else:
+        attr_dict = load(filename)
+    if not 'n_atoms' in attr_dict.files:
+        raise ValueError('{0} is not a valid atomic data file'
+                         .format(repr(filename)))
+    ag = _buildAtomGroup(attr_dict)
+
     LOGGER.report('Atom group was loaded in %.2fs.', '_prody_loadatoms')
     return ag
 
 
+def pathAtomsCache(folder=None, size=None):
+    """Returns or specify the folder for caching atom groups parsed from
+    structure files, and the size limit of the cache in megabytes (default
+    is 1024).  When a cache folder is set, :func:`.parsePDB`,
+    :func:`.parseCIF`, and :func:`.parsePSF` save atom groups they parse in
+    the format of :func:`saveAtoms` and load them from the cache when the
+    same file is parsed again with the same arguments.  Files are identified
+    by their path, modification time and size.  When the cache grows beyond
+    its size limit, least recently used atom groups are removed.  To release
+    the current folder, pass an invalid path, e.g. ``folder=''``."""
+
+    if folder is None:
+        folder = SETTINGS.get('atoms_cache_folder')
+        if folder:
+            if os.path.isdir(folder):
+                return folder
+            else:
+                LOGGER.warn('Atoms cache folder {0} is not accessible.'
+                            .format(repr(folder)))
+    else:
+        if os.path.isdir(folder):
+            folder = os.path.abspath(folder)
+            if size is None:
+                size = SETTINGS.get('atoms_cache_size', 1024)
+            elif not isinstance(size, Number) or size <= 0:
+                raise ValueError('size must be a positive number')
+            LOGGER.info('Atoms cache folder is set: {0} ({1} MB)'
+                        .format(repr(folder), size))
+            SETTINGS['atoms_cache_folder'] = folder
+            SETTINGS['atoms_cache_size'] = size
+            SETTINGS.save()
+        else:
+            current = SETTINGS.pop('atoms_cache_folder')
+            if current:
+                LOGGER.info('Atoms cache folder {0} is released.'
+                            .format(repr(current)))
+                SETTINGS.pop('atoms_cache_size')
+                SETTINGS.save()
+            else:
+                raise IOError('{0} is not a valid path.'.format(repr(folder)))
+
+
+CACHE_USED = {}
+
+
+def _getCachePath(filename, parser, kwargs):
+    """Returns the path of the cache file for atoms parsed from *filename* by
+    *parser* using keyword arguments *kwargs*, or **None** when caching is
+    not enabled or when *kwargs* do not allow it."""
+
+    folder = SETTINGS.get('atoms_cache_folder')
+    if not folder or not os.path.isdir(folder):
+        return None
+    if kwargs.get('header') or kwargs.get('biomol') or \
+        kwargs.get('ag') is not None:
+        return None
+    try:
+        stat = os.stat(filename)
+    except (OSError, TypeError):
+        return None
+    key = [__version__, parser, os.path.abspath(filename),
+           stat.st_mtime, stat.st_size]
+    for label in sorted(kwargs):
+        value = kwargs[label]
+        if value is not None and not isinstance(value, (str, Number)):
+            return None
+        key.append((label, value))
+    key = sha1(repr(key).encode()).hexdigest()
+    return os.path.join(folder, key + '.ag.npz')
+
+
+def _loadCached(path):
+    """Returns the atom group cached in *path*, or **None** if there is not
+    one."""
+
+    if path is None or not os.path.isfile(path):
+        return None
+    try:
+        with load(path) as attr_dict:
+            ag = _buildAtomGroup(attr_dict)
+        os.utime(path, None)
+    except Exception as err:
+        LOGGER.debug('Cached atoms in {0} could not be loaded: {1}'
+                     .format(path, err))
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return ag
+
+
+def _saveCached(path, ag):
+    """Save *ag* to cache file *path*, and remove least recently used files
+    when the cache grows beyond its size limit."""
+
+    if path is None or not isinstance(ag, AtomGroup):
+        return
+    folder = os.path.dirname(path)
+    temp = '{0}.{1}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp, 'wb') as out:
+            savez(out, **_getAtomArrays(ag))
+        os.rename(temp, path)
+        size = os.path.getsize(path)
+    except (OSError, IOError) as err:
+        LOGGER.debug('Atoms could not be cached in {0}: {1}'
+                     .format(path, err))
+        if os.path.isfile(temp):
+            os.remove(temp)
+        return
+
+    limit = SETTINGS.get('atoms_cache_size', 1024) * 1048576
+    used = CACHE_USED.get(folder)
+    if used is None:
+        used = sum(_listCached(folder)[1])
+    else:
+        used += size
+    if used > limit:
+        paths, sizes, times = _listCached(folder)
+        used = sum(sizes)
+        for i in sorted(range(len(paths)), key=times.__getitem__):
+            if used <= limit * 0.9:
+                break
+            try:
+                os.remove(paths[i])
+            except OSError:
+                continue
+            used -= sizes[i]
+    CACHE_USED[folder] = used
+
+
+def _listCached(folder):
+    """Returns paths, sizes, and modification times of cache files in
+    *folder*."""
+
+    paths, sizes, times = [], [], []
+    for fn in os.listdir(folder):
+        if fn.endswith('.ag.npz'):
+            path = os.path.join(folder, fn)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            paths.append(path)
+            sizes.append(stat.st_size)
+            times.append(stat.st_mtime)
+    return paths, sizes, times
+
+
+def joinAtoms(atomgroups, title=None):
+    """Returns a new :class:`.AtomGroup` containing copies of atoms of all
+    *atomgroups* in the given order.  The result is the same as adding atom
+    groups one by one, e.g. ``sum(atomgroups[1:], atomgroups[0])``, but
+    arrays are allocated only once, so that large assemblies are built in
+    linear time.  In addition, bonds and user set flags are retained and
+    serial numbers are offset to remain unique.
+
+    If all atom groups have the same number of coordinate sets, all of them
+    are copied, otherwise active coordinate sets are copied.  If an atom
+    group is missing some data, zero values are used for its atoms.
+
+    :arg atomgroups: atom groups to join
+    :type atomgroups: list
+
+    :arg title: title of the new atom group, default is titles of atom
+        groups joined with ``' + '``
+    :type title: str"""
+
+    atomgroups = list(atomgroups)
+    if not atomgroups:
+        raise ValueError('atomgroups must contain at least one atom group')
+    for ag in atomgroups:
+        if not isinstance(ag, AtomGroup):
+            raise TypeError('atomgroups must contain AtomGroup instances')
+
+    if title is None:
+        title = ' + '.join(ag.getTitle() for ag in atomgroups)
+    new = AtomGroup(title)
+
+    offsets = zeros(len(atomgroups) + 1, int)
+    offsets[1:] = cumsum([ag.numAtoms() for ag in atomgroups])
+    n_atoms = offsets[-1]
+    slices = [slice(start, stop) for start, stop in
+              zip(offsets[:-1], offsets[1:])]
+
+    n_csets = set(ag.numCoordsets() for ag in atomgroups)
+    if 0 in n_csets:
+        if len(n_csets) > 1:
+            LOGGER.warn('No coordinate sets are copied to {0}'
+                        .format(new.getTitle()))
+    elif len(n_csets) == 1:
+        n_csets = n_csets.pop()
+        coords = empty((n_csets, n_atoms, 3))
+        for ag, sl in zip(atomgroups, slices):
+            coords[:, sl] = ag._getCoordsets()
+        new.setCoords(coords)
+        if n_csets > 1:
+            LOGGER.info('All {0} coordinate sets are copied to '
+                        '{1}.'.format(n_csets, new.getTitle()))
+    else:
+        coords = empty((n_atoms, 3))
+        for ag, sl in zip(atomgroups, slices):
+            coords[sl] = ag._getCoords()
+        new.setCoords(coords)
+        LOGGER.info('Active coordinate sets are copied to {0}.'
+                    .format(new.getTitle()))
+    new._n_atoms = int(n_atoms)
+
+    labels = set()
+    for ag in atomgroups:
+        labels.update(ag.getDataLabels())
+    for label in labels:
+        if label in ATOMIC_FIELDS and ATOMIC_FIELDS[label].readonly:
+            continue
+        arrays = [ag._getData(label) for ag in atomgroups]
+        present = [arr for arr in arrays if arr is not None]
+        data = zeros((n_atoms,) + present[0].shape[1:],
+                     result_type(*present))
+        for arr, sl in zip(arrays, slices):
+            if arr is not None:
+                data[sl] = arr
+        if label == 'serial':
+            shift = 0
+            for arr, sl in zip(arrays, slices):
+                if arr is not None and len(arr):
+                    data[sl] += shift
+                    shift = data[sl].max()
+        new._data[label] = data
+        if any(ag.isCategorical(label) for ag in atomgroups):
+            new.setCategorical(label)
+
+    skip_flags = set()
+    for ag in atomgroups:
+        for label in ag.getFlagLabels('user'):
+            if label in skip_flags:
+                continue
+            torf = zeros(n_atoms, bool)
+            for other, sl in zip(atomgroups, slices):
+                if label in (other._flags or {}):
+                    torf[sl] = other._getFlags(label)
+            new._setFlags(label, torf)
+            skip_flags.update(flags.ALIASES.get(label, [label]))
+
+    bonds = [ag._bonds + offset for ag, offset in zip(atomgroups, offsets)
+             if ag._bonds is not None]
+    if bonds:
+        new.setBonds(concatenate(bonds))
+
+    return new
+
+
 def iterFragments(atoms):
     """Yield fragments, connected subsets in *atoms*, as :class:`.Selection`
     instances."""
@@ -172,53 +538,30 @@ def iterFragments(atoms):
     except AttributeError:
         raise TypeError('atoms must be an Atomic instance')
 
-    bonds = atoms._iterBonds()
-    return _iterFragments(atoms, ag, bonds)
+    bonds = ag._bonds
+    if bonds is None:
+        raise ValueError('bonds are not set, use `AtomGroup.setBonds`')
+    torf = zeros(len(ag), bool)
+    torf[atoms._getIndices()] = True
+    return _iterFragments(atoms, ag, bonds[torf[bonds].all(1)])
 
 
 def _iterFragments(atoms, ag, bonds):
 
-    fids = zeros((len(ag)), int)
-    fdict = {}
-    c = 0
-    for a, b in bonds:
-        af = fids[a]
-        bf = fids[b]
-        if af and bf:
-            if af != bf:
-                frag = fdict[af]
-                temp = fdict[bf]
-                fids[temp] = af
-                frag.extend(temp)
-                fdict.pop(bf)
-        elif af:
-            fdict[af].append(b)
-            fids[b] = af
-        elif bf:
-            fdict[bf].append(a)
-            fids[a] = bf
-        else:
-            c += 1
-            fdict[c] = [a, b]
-            fids[a] = fids[b] = c
-    fragments = []
-    append = fragments.append
-    fidset = set()
     indices = atoms._getIndices()
-    for i, fid in zip(indices, fids[indices]):
-        if fid in fidset:
-            continue
-        elif fid:
-            fidset.add(fid)
-            indices = fdict[fid]
-            indices.sort()
-            append(indices)
-        else:
-            # these are non-bonded atoms, e.g. ions
-            append([i])
+    fids = evalFragments(bonds, len(ag))[indices]
+    # number fragments in the order of appearance in atoms
+    fids, first, inverse = unique(fids, return_index=True,
+                                  return_inverse=True)
+    rank = zeros(len(fids), int)
+    rank[first.argsort()] = arange(len(fids))
+    fids = rank[inverse]
+    order = fids.argsort(kind='mergesort')
+    fragments = split(indices[order], cumsum(bincount(fids))[:-1])
 
     acsi = atoms.getACSIndex()
     for indices in fragments:
+        indices.sort()
         yield Selection(ag, indices, 'index ' + rangeString(indices), acsi,
                         unique=True)
 
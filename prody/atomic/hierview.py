@@ -2,7 +2,8 @@
 """This module defines :class:`HierView` class that builds a hierarchical
 views of atom groups."""
 
-from numpy import unique, zeros, arange, concatenate
+from numpy import zeros, arange, concatenate, array, split, repeat
+from numpy import flatnonzero, bincount, cumsum, union1d
 from prody.utilities.misctools import count
 
 from .atomgroup import AtomGroup
@@ -190,22 +191,15 @@ class HierView(object):
         for hvidx, _list in [(atoms._getSegindices(), _segments),
                              (atoms._getChindices(), _chains),
                              (atoms._getResindices(), _residues),]:
-            if not _list: continue
-            pidx = hvidx[0]
-            pi = 0
-            for i, idx in enumerate(hvidx):
-                if pidx == idx: continue
-                subset = _list[pidx]
-                if subset is None:
-                    _list[pidx] = indices[pi:i]
-                else:
-                    _list[pidx] = concatenate((subset, indices[pi:i]))
-                pidx, pi = idx, i
-            subset = _list[pidx]
-            if subset is None:
-                _list[pidx] = indices[pi:]
-            else:
-                _list[pidx] = concatenate((subset, indices[pi:]))
+            if not _list or not len(hvidx): continue
+            # group selected atoms by their index in the atom group view
+            order = hvidx.argsort(kind='mergesort')
+            hvidx = hvidx[order]
+            bounds = flatnonzero(hvidx[1:] != hvidx[:-1]) + 1
+            groups = split(indices[order], bounds)
+            for idx, group in zip(hvidx[concatenate(([0], bounds))].tolist(),
+                                  groups):
+                _list[idx] = group
 
     def _update(self, **kwargs):
         """Build hierarchical view for :class:`.AtomGroup` instances."""
@@ -219,44 +213,32 @@ class HierView(object):
         self._segments = _segments = []
         self._chains = _chains = []
 
-        nones = None
-        getnones = lambda: [None] * n_atoms if nones is None else nones
-        termini = ag.getFlags('pdbter')
-        if termini is None:
-            termini = getnones()
+        termini = ag._getFlags('pdbter')
 
         # identify segments
-        segindex = -1
         segindices = zeros(n_atoms, int)
 
         sgnms = ag._getSegnames()
         if sgnms is None:
             _segments = None
         else:
-            s = sgnms[0]
-            if len(unique(sgnms)) == 1:
+            starts = _getRuns(sgnms)
+            names = sgnms[starts].tolist()
+            if len(set(names)) == 1:
                 # 1 segment
-                if s:
+                if names[0]:
                     _segments.append(_indices)
-                    _dict[s] = 0
+                    _dict[names[0]] = 0
                 else:
                     _segments = None
             else:
-                ps = None       # previous segment name
-                for i, s in enumerate(sgnms):
-                    if s == ps or s in _dict:
-                        continue
-                    ps = s
-                    idx = _indices[i:][sgnms[i:] == s]
-                    segindex += 1
-                    segindices[idx] = segindex
-                    _dict[s or None] = segindex
-                    _segments.append(idx)
+                ids = _getGroups([s or None for s in names], _dict)
+                segindices = _expandRuns(ids, starts, n_atoms)
+                _segments.extend(_groupIndices(segindices))
 
         ag._data['segindex'] = segindices
 
         # identify chains
-        chindex = -1
         chindices = zeros(n_atoms, int)
 
         chids = ag._getChids()
@@ -264,57 +246,19 @@ class HierView(object):
             _chains = None
         else:
             if _segments is None:
-                if len(unique(chids)) == 1:
-                    _dict[(None, chids[0] or None)] = 0
-                    _chains.append(_indices)
-                else:
-                    pc = None
-                    for i, c in enumerate(chids):
-                        if c == pc or (None, c) in _dict:
-                            continue
-                        pc = c
-                        idx = _indices[i:][chids[i:] == c]
-                        chindex += 1
-                        chindices[idx] = chindex
-                        _dict[(None, c)] = chindex
-                        _chains.append(idx)
+                starts = _getRuns(chids)
+                keys = [(None, c or None) for c in chids[starts].tolist()]
             else:
-                pc = chids[0]
-                ps = sgnms[0]
-                _i = 0
-                for i, c in enumerate(chids):
-                    s = sgnms[i]
-                    if c == pc and s == ps:
-                        continue
-                    s_c = (ps, pc or None)
-                    cid = _dict.get(s_c)
-                    idx = _indices[_i:i]
-                    if cid is None:
-                        #segment = _dict[ps]
-                        chindex += 1
-                        chindices[idx] = chindex
-                        _dict[s_c] = chindex
-                        _chains.append(idx)
-                    else:
-                        chain = _chains[cid]
-                        chindices[idx] = cid
-                        _chains[cid] = concatenate((chain, idx))
-                    pc = c
-                    ps = s
-                    _i = i
-                s_c = (ps or None, pc or None)
-                cid = _dict.get(s_c)
-                idx = _indices[_i:]
-                if cid is None:
-                    #segment = _dict[ps]
-                    chindex += 1
-                    chindices[idx] = chindex
-                    _dict[s_c] = chindex
-                    _chains.append(idx)
-                else:
-                    chain = _chains[cid]
-                    chindices[idx] = cid
-                    _chains[cid] = concatenate((chain, idx))
+                starts = _getRuns(sgnms, chids)
+                keys = [(s or None, c or None) for s, c in
+                        zip(sgnms[starts].tolist(), chids[starts].tolist())]
+            if len(set(keys)) == 1:
+                _dict[keys[0]] = 0
+                _chains.append(_indices)
+            else:
+                ids = _getGroups(keys, _dict)
+                chindices = _expandRuns(ids, starts, n_atoms)
+                _chains.extend(_groupIndices(chindices))
 
         ag._data['chindex'] = chindices
 
@@ -322,72 +266,62 @@ class HierView(object):
             return
 
         # identify residues
-        resindex = -1
-        resindices = zeros(n_atoms, int)
-
         rnums = ag._getResnums()
         if rnums is None:
             raise ValueError('resnums are not set')
-        if _segments is None:
-            sgnms = nones = getnones()
-        if _chains is None:
-            chids = nones = getnones()
         icods = ag._getIcodes()
-        if icods is None:
-            icods = nones = getnones()
-        pr = rnums[0]
-        pi = icods[0] or None
-        pc = chids[0]
-        ps = sgnms[0]
-        _j = 0
-        _append = _residues.append
+        arrays = [rnums]
+        if icods is not None:
+            arrays.append(icods)
+        if _chains is not None:
+            arrays.append(chids)
+        if _segments is not None:
+            arrays.append(sgnms)
+        starts = _getRuns(*arrays)
+        if termini is not None and n_atoms:
+            # a terminal atom ends the residue
+            starts = union1d(starts, flatnonzero(termini[:-1]) + 1)
+        ends = concatenate((starts[1:], [n_atoms]))
+
+        n_runs = len(starts)
+        nones = [None] * n_runs
+        keys = zip(nones if _segments is None else sgnms[starts].tolist(),
+                   nones if _chains is None else chids[starts].tolist(),
+                   rnums[starts].tolist(),
+                   nones if icods is None else
+                   [i or None for i in icods[starts].tolist()])
+
+        # residues with the same identifiers are merged, unless the earlier
+        # residue ends with a terminal atom
+        lasts = (ends - 1).tolist()
+        ids = []
+        reslast = []
+        merged = False
         _get = _dict.get
         _set = _dict.__setitem__
-        for j, r in enumerate(rnums):
-            i = icods[j] or None
-            c = chids[j]
-            s = sgnms[j]
-            if r != pr or i != pi or c != pc or s != ps or (j and termini[j-1]):
-                s_c_r_i = (ps, pc, pr, pi)
-                rid = _get(s_c_r_i)
-                idx = _indices[_j:j]
-                if (rid is None or isinstance(rid, list) or
-                    termini[_residues[rid][-1]]):
-                    resindex += 1
-                    resindices[idx] = resindex
-                    _append(idx)
-                    if rid is None:
-                        _set(s_c_r_i, resindex)
-                    elif isinstance(rid, list):
-                        rid.append(resindex)
-                    else:
-                        _set(s_c_r_i, [rid, resindex])
+        for last, s_c_r_i in zip(lasts, keys):
+            rid = _get(s_c_r_i)
+            if (rid is None or isinstance(rid, list) or
+                (termini is not None and termini[reslast[rid]])):
+                resindex = len(reslast)
+                reslast.append(last)
+                ids.append(resindex)
+                if rid is None:
+                    _set(s_c_r_i, resindex)
+                elif isinstance(rid, list):
+                    rid.append(resindex)
                 else:
-                    residue = _residues[rid]
-                    resindices[idx] = rid
-                    _residues[rid] = concatenate((residue, idx))
-                ps = s
-                pc = c
-                pr = r
-                pi = i
-                _j = j
-        s_c_r_i = (ps, pc, pr, pi)
-        rid = _get(s_c_r_i)
-        idx = _indices[_j:]
-        if rid is None or isinstance(rid, list) or termini[_residues[rid][-1]]:
-            resindex += 1
-            resindices[idx] = resindex
-            _append(idx)
-            if rid is None:
-                _set(s_c_r_i, resindex)
-            elif isinstance(rid, list):
-                rid.append(resindex)
+                    _set(s_c_r_i, [rid, resindex])
             else:
-                _set(s_c_r_i, [rid, resindex])
-        else:
-            residue = _residues[rid]
-            resindices[idx] = rid
-            _residues[rid] = concatenate((residue, idx))
+                reslast[rid] = last
+                ids.append(rid)
+                merged = True
+
+        resindices = _expandRuns(array(ids, int), starts, n_atoms)
+        if merged:
+            _residues.extend(_groupIndices(resindices))
+        elif n_runs:
+            _residues.extend(split(_indices, starts[1:]))
 
         ag._data['resindex'] = resindices
 
@@ -505,3 +439,48 @@ class HierView(object):
                 item = alist[i] = Segment(ag, item, self, acsi, selstr=selstr,
                                           unique=True)
             yield item
+
+
+def _getRuns(*arrays):
+    """Returns start indices of runs of identical values in *arrays*, i.e.
+    positions where a value in any of the arrays changes."""
+
+    n_items = len(arrays[0])
+    if not n_items:
+        return zeros(0, int)
+    change = zeros(n_items, bool)
+    change[0] = True
+    for arr in arrays:
+        change[1:] |= arr[1:] != arr[:-1]
+    return flatnonzero(change)
+
+
+def _getGroups(keys, _dict):
+    """Returns group indices for run *keys*, which are numbered in the order
+    of first appearance and stored in *_dict*."""
+
+    ids = []
+    append = ids.append
+    _get = _dict.get
+    n_groups = 0
+    for key in keys:
+        index = _get(key)
+        if index is None:
+            index = _dict[key] = n_groups
+            n_groups += 1
+        append(index)
+    return array(ids, int)
+
+
+def _expandRuns(values, starts, n_items):
+    """Returns an array with *values* of runs repeated for each item."""
+
+    return repeat(values, concatenate((starts[1:], [n_items])) - starts)
+
+
+def _groupIndices(ids):
+    """Returns list of index arrays for each group in *ids*, which are
+    consecutive numbers starting from zero."""
+
+    order = ids.argsort(kind='mergesort')
+    return split(order, cumsum(bincount(ids))[:-1])
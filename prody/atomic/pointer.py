@@ -2,7 +2,7 @@
 """This module defines atom pointer base class."""
 
 from numbers import Integral
-from numpy import all, array, concatenate, ones, unique
+from numpy import all, array, concatenate, ones, zeros, unique
 
 from .atomic import Atomic
 from .bond import Bond
@@ -274,15 +274,8 @@ class AtomPointer(Atomic):
         if self._ag._bonds is None:
             raise ValueError('bonds are not set, use `AtomGroup.setBonds`')
 
-        indices = self._getIndices()
-        iset = set(indices)
-        if len(self._ag) * 0.5 >= len(self):
-            for a, b in self._ag._iterBonds():
-                if a in iset and b in iset:
-                    yield a, b
-        else:
-            for a, bmap in zip(indices, self._ag._bmap[indices]):
-                for b in bmap:
-                    if b > -1 and b in iset:
-                        yield a, b
-                iset.remove(a)
+        torf = zeros(self._ag.numAtoms(), bool)
+        torf[self._getIndices()] = True
+        bonds = self._ag._bonds
+        for a, b in bonds[torf[bonds].all(1)]:
+            yield a, b
@@ -437,16 +437,41 @@ substitution is performed automatically to ensure reproducibility of the
 selection without the keyword *center*.
 
 Keywords cannot be reserved words (see :func:`.listReservedWords`) and must be
-all alphanumeric characters."""
+all alphanumeric characters.
+
+
+Compiled selections
+-------------------------------------------------------------------------------
+
+Selection strings are parsed into an expression tree that is evaluated using
+atomic data arrays.  Parsed trees are cached for recently used selection
+strings, so repeated selections do not parse strings again.  When the same
+selection is going to be made for many structures, :func:`.compileSelection`
+can be used to obtain a :class:`.CompiledSelection` that can be passed in
+place of a selection string:
+
+.. ipython:: python
+
+   calpha = compileSelection('protein and name CA')
+   p.select(calpha)
+   calpha.select(p.protein)
+
+In addition, indices of atoms selected from an :class:`.AtomGroup` are kept
+in a small cache of the atom group.  Cached results are used until atomic
+data, flags, or bonds of the atom group are changed using its methods.
+Results of coordinate based selections are also recalculated when
+coordinates change.  Note that changes made in place to arrays returned by
+private methods (e.g. ``_getNames``) are not detected."""
 
 import sys
 from re import compile as re_compile
-from collections import Iterable
+from collections import Iterable, OrderedDict
 
 import numpy as np
 from numpy import array, ndarray, ones, zeros, arange
 from numpy import invert, unique, concatenate, all, any
 from numpy import logical_and, logical_or, floor, ceil, where
+from numpy import bitwise_and, bitwise_or, unpackbits
 
 try:
     from . import pyparsing as pp
@@ -460,6 +485,7 @@ from prody import LOGGER, SETTINGS, PY2K
 
 from .atomic import Atomic
 from .fields import ATOMIC_FIELDS
+from . import flags
 from .flags import PLANTERS as FLAG_PLANTERS
 
 from .atomgroup import AtomGroup
@@ -469,12 +495,15 @@ from .pointer import AtomPointer
 from .selection import Selection
 from .segment import Segment
 from .atommap import AtomMap
+from .bond import expandBonded
 
 from prody.utilities import rangeString
 from prody.kdtree import KDTree
 
 if PY2K:
     range = xrange
+else:
+    basestring = str
 
 DEBUG = 0
 NUMB = 0 # Select instance will not really evaluate string for the atoms
@@ -490,6 +519,7 @@ def debug(sel, loc, *args):
         print(' ' * (loc + 1) + '^')
 
 __all__ = ['Select', 'SelectionError', 'SelectionWarning',
+           'CompiledSelection', 'compileSelection',
            'defSelectionMacro', 'delSelectionMacro', 'getSelectionMacro',
            'isSelectionMacro']
 
@@ -803,6 +833,244 @@ PP_NRANGE.setParseAction(rangeParseAction)
 
 UNARY = set(['not', 'bonded', 'exbonded', 'within', 'exwithin', 'same'])
 
+PARSERS = {}
+COMPILED = OrderedDict()
+COMPILED_MAXSIZE = 256
+SELCACHE_MAXSIZE = 32
+RE_WORD = re_compile(r'\w+')
+
+
+class SelectionNode(object):
+
+    """A node of a parsed selection string.  Evaluation of a node evaluates
+    child nodes first and passes results to the :class:`Select` method named
+    *handler*, in the same way parse actions would receive them."""
+
+    __slots__ = ['_handler', '_loc', '_tokens', '_group']
+
+    def __init__(self, handler, loc, tokens, group=True):
+
+        self._handler = handler
+        self._loc = loc
+        self._tokens = tokens
+        self._group = group
+
+    def __repr__(self):
+
+        return '<SelectionNode: {0} {1}>'.format(self._handler, self._tokens)
+
+    def evaluate(self, select, sel):
+        """Returns the result of evaluating the node using *select*, which
+        must be a :class:`Select` instance prepared for a set of atoms."""
+
+        tokens = [token.evaluate(select, sel)
+                  if isinstance(token, SelectionNode) else token
+                  for token in self._tokens]
+        if self._group:
+            tokens = [tokens]
+        return getattr(select, self._handler)(sel, self._loc, tokens)
+
+
+def _nodeAction(handler):
+    """Returns a parse action that builds a :class:`SelectionNode`."""
+
+    def action(sel, loc, tokens):
+        return SelectionNode(handler, loc, list(tokens[0]))
+    return action
+
+
+def _defaultAction(sel, loc, tokens):
+
+    return SelectionNode('_default', loc, list(tokens), False)
+
+
+def getParser(selstr):
+    """Returns a key and an efficient parser that can handle *selstr*.
+    Parsers do not evaluate selection strings, but build a tree of
+    :class:`SelectionNode` instances."""
+
+    alnum = selstr
+    alpha = selstr
+    for ch in selstr:
+        if not ch.isalnum(): alnum = alnum.replace(ch, ' ')
+        if not ch.isalpha(): alpha = alpha.replace(ch, ' ')
+    items = set(alnum.split())
+    chars = set(selstr)
+
+    funcs = 4 if items.intersection(FUNCNAMES) else 0
+    opers = 2 if chars.intersection(OPERATORS) else 0
+    logic = 1 if 'or' in items or '(' in chars else 0
+
+    schars = 8 if '`' in chars and RE_SCHARS.search(selstr) else 0
+    regexp = 16 if '"' in chars and RE_REGEXP.search(selstr) else 0
+    nrange = 32 if ((':' in chars or ' to ' in alpha) and
+                    RE_NRANGE.search(selstr)) else 0
+
+    key = (logic + opers + funcs, logic + funcs + schars + regexp + nrange)
+
+    if key == (0, 0):
+        return key, _noParser
+
+    try:
+        return key, PARSERS[key][0].parseString
+    except KeyError:
+        pass
+
+    word = ~AND + ~OR
+
+    oplist = []
+    if funcs:
+        oplist.append((FUNCNAMES_OPLIST, 1, pp.opAssoc.RIGHT,
+                       _nodeAction('_func')))
+        # following causes 20% slow down
+        #word += FUNCNAMES_EXPR
+
+    if funcs or opers:
+        oplist.extend([
+            (pp.oneOf('+ -'), 1, pp.opAssoc.RIGHT, _nodeAction('_sign')),
+            (pp.oneOf('** ^'), 2, pp.opAssoc.LEFT, _nodeAction('_pow')),
+            (pp.oneOf('* / %'), 2, pp.opAssoc.LEFT, _nodeAction('_binop')),
+            (pp.oneOf('+ -'), 2, pp.opAssoc.LEFT, _nodeAction('_binop')),
+            (pp.oneOf('< > <= >= == = !='), 2, pp.opAssoc.LEFT,
+             _nodeAction('_comp'))])
+
+    oplist.extend([
+      (pp.Optional(AND), 2, pp.opAssoc.LEFT, _nodeAction('_and')),
+      (OR, 2, pp.opAssoc.LEFT, _nodeAction('_or'))])
+
+    word += WORD
+
+    expr = word
+    if schars: expr = PP_SCHARS | expr
+    if regexp: expr = PP_REGEXP | expr
+    if nrange: expr = PP_NRANGE | expr
+
+    parser = pp.operatorPrecedence(expr, oplist)
+    parser.setParseAction(_defaultAction)
+    parser.leaveWhitespace()
+    parser.enablePackrat()
+    PARSERS[key] = parser, expr, oplist
+    return key, parser.parseString
+
+
+def _noParser(selstr, parseAll=True):
+
+    debug(selstr, 0, ['_noParser'])
+    return [SelectionNode('_default', 0, selstr.split(), False)]
+
+
+def _parseSelstr(selstr):
+    """Returns the :class:`SelectionNode` tree for *selstr*, which must not
+    contain macros."""
+
+    key, parser = getParser(selstr)
+    try:
+        tokens = parser(selstr, parseAll=True)
+    except pp.ParseException as err:
+        PARSERS.pop(key, None)
+        which = selstr.rfind(' ', 0, err.column)
+        if which > -1:
+            if selstr[which + 1] == '(':
+                msg = ('an arithmetic, comparison, or logical operator '
+                       'must precede the opening parenthesis')
+            elif selstr[which - 1] == ')':
+                msg = ('an arithmetic, comparison, or logical operator '
+                       'must follow the closing parenthesis')
+            else:
+                msg = 'parsing failed here'
+        else:
+            msg = 'parsing failed here'
+
+        raise SelectionError(selstr, err.column, msg + '\n' + str(err))
+    if DEBUG: print('_parseSelstr', tokens)
+    return tokens[0]
+
+
+def compileSelection(selstr):
+    """Returns a :class:`CompiledSelection` for *selstr*.  Parsed selection
+    strings are kept in a cache of recently used selections, so compiling
+    the same selection string again does not parse it.
+
+    .. ipython:: python
+
+       calpha = compileSelection('protein and name CA')
+       calpha"""
+
+    if isinstance(selstr, CompiledSelection):
+        return selstr
+    if not isinstance(selstr, basestring):
+        raise TypeError('selstr must be a string, not {0}'
+                        .format(type(selstr)))
+    expr = replaceMacros(selstr.strip())
+    try:
+        tree = COMPILED.pop(expr)
+    except KeyError:
+        tree = _parseSelstr(expr)
+        if len(COMPILED) >= COMPILED_MAXSIZE:
+            COMPILED.popitem(last=False)
+    COMPILED[expr] = tree
+    return CompiledSelection(selstr, expr, tree)
+
+
+def _getSelCacheKey(atoms, compiled, kwargs):
+    """Returns cache key and time stamp for the result of *compiled*
+    selection from *atoms*, an :class:`.AtomGroup`, or ``(None, None)`` when
+    the result cannot be cached, i.e. when keyword arguments are arrays or
+    atoms that may change without notice."""
+
+    items = []
+    for key, value in kwargs.items(): # PY3K: OK
+        if isinstance(value, (Atomic, ndarray)):
+            return None, None
+        try:
+            hash(value)
+        except TypeError:
+            return None, None
+        items.append((key, value))
+    items.sort()
+
+    expr = compiled._expr
+    coords = None
+    if atoms._n_csets and XYZDIST.intersection(RE_WORD.findall(expr)):
+        acsi = atoms._acsi
+        coords = acsi, atoms._timestamps[acsi]
+    return (expr, tuple(items)), (atoms._datats, flags.TIMESTAMP, coords)
+
+
+class CompiledSelection(object):
+
+    """A parsed selection string that can be evaluated for any
+    :class:`.Atomic` instance without parsing the string again.  Instances
+    are returned by :func:`.compileSelection` and can be used in place of
+    selection strings, e.g. ``atoms.select(compiled)``."""
+
+    __slots__ = ['_selstr', '_expr', '_tree']
+
+    def __init__(self, selstr, expr, tree):
+
+        self._selstr = selstr
+        self._expr = expr
+        self._tree = tree
+
+    def __repr__(self):
+
+        return '<CompiledSelection: {0}>'.format(repr(self._selstr))
+
+    def __str__(self):
+
+        return self._selstr
+
+    def getSelstr(self):
+        """Returns selection string."""
+
+        return self._selstr
+
+    def select(self, atoms, **kwargs):
+        """Returns a :class:`.Selection` of *atoms* matching the selection,
+        or **None** if no atoms match.  See :meth:`.Select.select`."""
+
+        return atoms.select(self, **kwargs)
+
 
 class Select(object):
 
@@ -825,8 +1093,6 @@ class Select(object):
         self._data = dict()
         self._replace = False
 
-        self._parsers = {}
-
 
         self._evalmap = {'resnum': self._resnum, 'resid': self._resnum,
             'serial': self._serial, 'index': self._index,
@@ -871,8 +1137,8 @@ class Select(object):
         :arg atoms: atoms to be evaluated
         :type atoms: :class:`.Atomic`
 
-        :arg selstr: selection string
-        :type selstr: str
+        :arg selstr: selection string or a compiled selection
+        :type selstr: str, :class:`.CompiledSelection`
 
         Note that, if *atoms* is an :class:`.AtomMap` instance, an
         :class:`.AtomMap` is returned, instead of a a :class:`.Selection`.
@@ -887,8 +1153,11 @@ class Select(object):
         self._ss2idx = False
         self._replace = False
 
+        query = selstr
+        if isinstance(selstr, CompiledSelection):
+            selstr = selstr.getSelstr()
         self._selstr = selstr
-        indices = self.getIndices(atoms, selstr, **kwargs)
+        indices = self.getIndices(atoms, query, **kwargs)
 
         self._kwargs = None
 
@@ -930,6 +1199,9 @@ class Select(object):
         should not be used for indexing the corresponding :class:`.AtomGroup`
         instance."""
 
+        query = selstr
+        if isinstance(selstr, CompiledSelection):
+            selstr = selstr.getSelstr()
         ss = selstr.strip()
         if (len(ss.split()) == 1 and ss.isalnum() and ss not in MACROS):
             self._evalAtoms(atoms)
@@ -946,8 +1218,30 @@ class Select(object):
                 raise SelectionError(selstr, 0, 'is not a valid selection '
                                      'string', [ss])
         else:
-            torf = self.getBoolArray(atoms, selstr, **kwargs)
-            return torf.nonzero()[0]
+            key = None
+            if isinstance(atoms, AtomGroup):
+                query = compileSelection(query)
+                key, stamp = _getSelCacheKey(atoms, query, kwargs)
+            if key is not None:
+                cache = atoms._selcache
+                if cache is None:
+                    cache = atoms._selcache = OrderedDict()
+                try:
+                    cached, indices = cache.pop(key)
+                except KeyError:
+                    pass
+                else:
+                    if cached == stamp:
+                        cache[key] = cached, indices
+                        return indices.copy()
+
+            torf = self.getBoolArray(atoms, query, **kwargs)
+            indices = torf.nonzero()[0]
+            if key is not None:
+                if len(cache) >= SELCACHE_MAXSIZE:
+                    cache.popitem(last=False)
+                cache[key] = stamp, indices.copy()
+            return indices
 
     def getBoolArray(self, atoms, selstr, **kwargs):
         """Returns a boolean array with **True** values for *atoms* matching
@@ -958,6 +1252,11 @@ class Select(object):
             raise TypeError('atoms must be an Atomic instance, not {0}'
                             .format(type(atoms)))
 
+        compiled = None
+        if isinstance(selstr, CompiledSelection):
+            compiled = selstr
+            selstr = compiled.getSelstr()
+
         self._reset()
 
         for key in kwargs.keys():
@@ -995,30 +1294,11 @@ class Select(object):
                 raise SelectionError(selstr, 0, 'is not a valid selection or '
                                      'user data label')
 
-        selstr = replaceMacros(selstr)
-        try:
-            parser = self._getParser(selstr)
-            tokens = parser(selstr, parseAll=True)
-        except pp.ParseException as err:
-            self._parsers.pop(self._parser, None)
-            pass
-            which = selstr.rfind(' ', 0, err.column)
-            if which > -1:
-                if selstr[which + 1] == '(':
-                    msg = ('an arithmetic, comparison, or logical operator '
-                           'must precede the opening parenthesis')
-                elif selstr[which - 1] == ')':
-                    msg = ('an arithmetic, comparison, or logical operator '
-                           'must follow the closing parenthesis')
-                else:
-                    msg = 'parsing failed here'
-            else:
-                msg = 'parsing failed here'
-
-            raise SelectionError(selstr, err.column, msg + '\n' + str(err))
-        else:
-            if DEBUG: print('_evalSelstr', tokens)
-            torf = tokens[0]
+        if compiled is None:
+            compiled = compileSelection(selstr)
+        selstr = compiled._expr
+        torf = compiled._tree.evaluate(self, selstr)
+        if DEBUG: print('_evalSelstr', torf)
 
         if not isinstance(torf, ndarray):
             if DEBUG: print(torf)
@@ -1032,79 +1312,6 @@ class Select(object):
             print('_select', torf)
         return torf
 
-    def _getParser(self, selstr):
-        """Returns an efficient parser that can handle *selstr*."""
-
-        alnum = selstr
-        alpha = selstr
-        for ch in selstr:
-            if not ch.isalnum(): alnum = alnum.replace(ch, ' ')
-            if not ch.isalpha(): alpha = alpha.replace(ch, ' ')
-        items = set(alnum.split())
-        chars = set(selstr)
-
-
-        funcs = 4 if items.intersection(FUNCNAMES) else 0
-        opers = 2 if chars.intersection(OPERATORS) else 0
-        logic = 1 if 'or' in items or '(' in chars else 0
-
-        schars = 8 if '`' in chars and RE_SCHARS.search(selstr) else 0
-        regexp = 16 if '"' in chars and RE_REGEXP.search(selstr) else 0
-        nrange = 32 if ((':' in chars or ' to ' in alpha) and
-                        RE_NRANGE.search(selstr)) else 0
-
-        self._parser = key = (logic + opers + funcs,
-                              logic + funcs + schars + regexp + nrange)
-
-        if key == (0, 0):
-            return self._noParser
-
-        try:
-            return self._parsers[key][0].parseString
-        except KeyError:
-            pass
-
-
-        word = ~AND + ~OR
-
-        oplist = []
-        if funcs:
-            oplist.append((FUNCNAMES_OPLIST, 1, pp.opAssoc.RIGHT, self._func))
-            # following causes 20% slow down
-            #word += FUNCNAMES_EXPR
-
-        if funcs or opers:
-            oplist.extend([
-                (pp.oneOf('+ -'), 1, pp.opAssoc.RIGHT, self._sign),
-                (pp.oneOf('** ^'), 2, pp.opAssoc.LEFT, self._pow),
-                (pp.oneOf('* / %'), 2, pp.opAssoc.LEFT, self._binop),
-                (pp.oneOf('+ -'), 2, pp.opAssoc.LEFT, self._binop),
-                (pp.oneOf('< > <= >= == = !='), 2, pp.opAssoc.LEFT,
-                 self._comp)])
-
-        oplist.extend([
-          (pp.Optional(AND), 2, pp.opAssoc.LEFT, self._and),
-          (OR, 2, pp.opAssoc.LEFT, self._or)])
-
-        word += WORD
-
-        expr = word
-        if schars: expr = PP_SCHARS | expr
-        if regexp: expr = PP_REGEXP | expr
-        if nrange: expr = PP_NRANGE | expr
-
-        parser = pp.operatorPrecedence(expr, oplist)
-        parser.setParseAction(self._default)
-        parser.leaveWhitespace()
-        parser.enablePackrat()
-        self._parsers[key] = parser, expr, oplist
-        return parser.parseString
-
-    def _noParser(self, selstr, parseAll=True):
-
-        debug(selstr, 0, ['_noParser'])
-        return [self._default(selstr, 0, selstr.split())]
-
     def _getZeros(self, subset=None):
         """Returns a bool array with zero elements."""
 
@@ -1212,6 +1419,25 @@ class Select(object):
         else:
             return self._atoms._getFlags(label)[subset]
 
+    def _combineFlags(self, labels, how):
+        """Returns flags for *labels* combined using *how*, ``'and'`` or
+        ``'or'``.  Flags of atom groups are combined in packed form, eight
+        atoms at a time."""
+
+        atoms = self._atoms
+        if isinstance(atoms, AtomGroup):
+            func = bitwise_and if how == 'and' else bitwise_or
+            packed = atoms._getPackedFlags(labels[0]).copy()
+            for label in labels[1:]:
+                func(packed, atoms._getPackedFlags(label), packed)
+            return unpackbits(packed)[:atoms.numAtoms()].view(bool)
+
+        func = logical_and if how == 'and' else logical_or
+        torf = atoms.getFlags(labels[0])
+        for label in labels[1:]:
+            func(torf, atoms._getFlags(label), torf)
+        return torf
+
     def _or(self, sel, loc, tokens):
 
         debug(sel, loc, '_or', tokens)
@@ -1260,11 +1486,9 @@ class Select(object):
 
         if flags:
             if torf is None:
-                torf = atoms.getFlags(flags.pop(0))
-            while flags:
-                ss = where(torf == 0)[0]
-                if len(ss) == 0: return torf
-                torf[ss] = atoms._getFlags(flags.pop(0))[ss]
+                torf = self._combineFlags(flags, 'or')
+            elif not torf.all():
+                logical_or(torf, self._combineFlags(flags, 'or'), torf)
 
         if evals:
             if torf is None:
@@ -1469,12 +1693,11 @@ class Select(object):
 
         if flags:
             if torf is None:
-                torf = atoms.getFlags(flags.pop(0))
-
-            while flags:
-                ss = torf.nonzero()[0]
-                if len(ss) == 0: return torf, False
-                torf[ss] = atoms._getFlags(flags.pop(0))[ss]
+                torf = self._combineFlags(flags, 'and')
+            elif torf.any():
+                logical_and(torf, self._combineFlags(flags, 'and'), torf)
+            else:
+                return torf, False
 
         if unary:
             if torf is None:
@@ -1633,14 +1856,7 @@ class Select(object):
 
         if other or len(which) < 20:
             kdtree = self._atoms._getKDTree()
-            get_indices = kdtree.getIndices
-            search = kdtree.search
-            get_count = kdtree.getCount
-            torf = zeros(self._ag.numAtoms(), bool)
-            for index in which:
-                search(within, coords[index])
-                if get_count():
-                    torf[get_indices()] = True
+            torf = kdtree.searchCenters(within, coords[which], mask=True)
             if self._indices is not None:
                 torf = torf[self._indices]
             if exclude:
@@ -1653,18 +1869,9 @@ class Select(object):
             check = torf.nonzero()[0]
             torf = zeros(n_atoms, bool)
 
-            cxyz = coords[check]
             kdtree = KDTree(coords[which])
-            search = kdtree.search
-            get_count = kdtree.getCount
-            select = []
-            append = select.append
-            for i, xyz in enumerate(cxyz):
-                search(within, xyz)
-                if get_count():
-                    append(i)
-
-            torf[check[select]] = True
+            counts = kdtree.countCenters(within, coords[check])
+            torf[check[counts > 0]] = True
             if not exclude:
                 torf[which] = True
 
@@ -1715,25 +1922,23 @@ class Select(object):
                     'positive integer'.format(repr(label)), [label])
                 return zeros(self._atoms.numAtoms(), bool), False
 
-        bmap = self._ag._bmap
-        if bmap is None:
+        bgraph = self._ag._getBondGraph()
+        if bgraph is None:
             return None, SelectionError(sel, loc, 'bonds are not set',
                                         [label])
         which = torf.nonzero()[0]
         if not len(which):
             return torf, False
 
+        # each step is a product of the sparse adjacency matrix and the
+        # vector of atoms selected in the previous step
+        indptr, bonded = bgraph
         indices = self._indices
-        if indices is not None:
-            bmap = bmap[indices]
         n_atoms = self._ag.numAtoms()
         for i in range(repeat):
             torf = zeros(n_atoms, bool)
-            bonded = unique(bmap[which])
-            if bonded[0] == -1:
-                torf[bonded[1:]] = True
-            else:
-                torf[bonded] = True
+            torf[expandBonded(indptr, bonded, which if indices is None
+                              else indices[which])] = True
             if indices is not None:
                 torf = torf[indices]
             if label.startswith('ex'):
@@ -1957,12 +2162,27 @@ class Select(object):
         debug(sel, loc, '_generic', tokens)
 
         label = tokens.pop(0)
-        data, err = self._getData(sel, loc, label)
-        if err: return None, err
+        categories = self._getCategories(label)
+        if categories is None:
+            data, err = self._getData(sel, loc, label)
+            if err: return None, err
+            if subset is not None:
+                data = data[subset]
+            return self._evalGeneric(sel, loc, label, data, tokens)
 
+        # evaluate values over the vocabulary and map results to atoms
+        codes, vocab = categories
         if subset is not None:
-            data = data[subset]
-            subset = None
+            codes = codes[subset]
+        torf, err = self._evalGeneric(sel, loc, label, vocab, tokens)
+        if err: return None, err
+        return torf[codes], False
+
+    def _evalGeneric(self, sel, loc, label, data, tokens):
+        """Returns a bool array for *data* items matching values, ranges, or
+        regular expressions in *tokens*."""
+
+        subset = None
         dtype = data.dtype
         type_ = dtype.type
         isstr = dtype.char == 'S' or dtype.char == 'U'
@@ -2079,9 +2299,25 @@ class Select(object):
                     torf[subset] = [re.match(val) is not None
                                     for val in data[subset]]
         if torf is None:
-            torf = self._getZeros(subset)
+            torf = zeros(len(data), bool)
         return torf, False
 
+    def _getCategories(self, keyword):
+        """Returns codes and vocabulary of data associated with *keyword* for
+        evaluated atoms, or **None** if data is not in categorical form."""
+
+        try:
+            categories = self._ag._getCategories(
+                FIELDS_SYNONYMS.get(keyword, keyword))
+        except AttributeError:
+            return None
+        if categories is None or isinstance(self._atoms, AtomMap):
+            return None
+        codes, vocab = categories
+        if self._indices is not None:
+            codes = codes[self._indices]
+        return codes, vocab
+
     def _index(self, sel, loc, tokens, subset=None):
 
         debug(sel, loc, '_index', tokens)
@@ -143,7 +143,8 @@ class AtomSubset(AtomPointer):
             getattr(self, 'set' + ATOMIC_FIELDS[label].meth_pl)(data)
         else:
             try:
-                self._ag._data[label][self._indices] = data
+                self._ag._setValues(label, self._indices, data)
+                self._ag._setDataTimeStamp()
             except KeyError:
                 raise AttributeError('data with label {0} must be set for '
                                      'AtomGroup first'.format(repr(label)))
@@ -162,11 +163,13 @@ class AtomSubset(AtomPointer):
         if label in flags.PLANTERS:
             raise AttributeError('flag {0} cannot be changed by user'
                                     .format(repr(label)))
-        flags = self._ag._getFlags(label)
-        if flags is None:
+        torf = self._ag._getFlags(label)
+        if torf is None:
             raise AttributeError('flags with label {0} must be set for '
                                     'AtomGroup first'.format(repr(label)))
-        flags[self._indices] = value
+        torf[self._indices] = value
+        self._ag._setFlags(label, torf)
+        self._ag._setDataTimeStamp()
 
 
 for fname, field in ATOMIC_FIELDS.items():
@@ -192,12 +195,11 @@ for fname, field in ATOMIC_FIELDS.items():
         continue
 
     # Define public method for setting values in data array
-    def setData(self, value, var=fname, none=field.none):
-        array = self._ag._data[var]
-        if array is None:
-            raise AttributeError(var + ' data is not set')
-        array[self._indices] = value
+    def setData(self, value, var=fname, none=field.none, flags=field.flags):
+        self._ag._setValues(var, self._indices, value)
         if none: self._ag._none(none)
+        if flags: self._ag._resetFlags(var)
+        self._ag._setDataTimeStamp()
     setData = wrapSetMethod(setData)
     setData.__name__ = setMeth
     setData.__doc__ = field.getDocstr('set')
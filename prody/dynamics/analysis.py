@@ -116,7 +116,7 @@ def calcFractVariance(mode):
     return var / trace
 
 
-def calcProjection(ensemble, modes, rmsd=True, norm=True):
+def calcProjection(ensemble, modes, rmsd=True, norm=True, **kwargs):
     """Returns projection of conformational deviations onto given modes.
     *ensemble* coordinates are used to calculate the deviations that are
     projected onto *modes*.  For K conformations and M modes, a (K,M)
@@ -132,7 +132,23 @@ def calcProjection(ensemble, modes, rmsd=True, norm=True):
     By default root-mean-square deviation (RMSD) along the normal mode is
     calculated. To calculate the projection pass ``rmsd=True``.
     :class:`.Vector` instances are accepted as *ensemble* argument to allow
-    for projecting a deformation vector onto normal modes."""
+    for projecting a deformation vector onto normal modes.
+
+    Trajectories are projected in blocks of frames, so that memory usage does
+    not depend on the number of frames.  Following keyword arguments are
+    accepted only for trajectories, and :exc:`TypeError` is raised when they
+    are passed with other *ensemble* types:
+
+    :arg chunk: number of frames to read and project at once, default is 1000
+    :type chunk: int
+
+    :arg superpose: superpose frames onto the trajectory reference coordinates
+        before calculating deviations, default is **False**
+    :type superpose: bool
+
+    :arg out: a preallocated array, e.g. a :class:`numpy.memmap`, for storing
+        projections, must have shape ``(n_frames, n_modes)``
+    :type out: :class:`numpy.ndarray`"""
 
     if not isinstance(ensemble, (Ensemble, Conformation, Vector, TrajBase)):
         raise TypeError('ensemble must be Ensemble, Conformation, Vector, '
@@ -148,17 +164,22 @@ def calcProjection(ensemble, modes, rmsd=True, norm=True):
         n_atoms = ensemble.numSelected()
     if n_atoms != modes.numAtoms():
         raise ValueError('number of atoms are not the same')
+    if isinstance(ensemble, TrajBase):
+        projection = _projectTrajectory(ensemble, modes._getArray(), norm,
+                                        **kwargs)
+        if rmsd:
+            projection *= (1 / (n_atoms ** 0.5))
+        return projection
+    if kwargs:
+        raise TypeError('{0} argument(s) are accepted only for trajectories'
+                        .format(', '.join(repr(key) for key in
+                                          sorted(kwargs))))
     if isinstance(ensemble, Vector):
         if not ensemble.is3d():
             raise ValueError('ensemble must be a 3d vector instance')
         deviations = ensemble._getArray()
-    elif isinstance(ensemble, (Ensemble, Conformation)):
-        deviations = ensemble.getDeviations()
     else:
-        nfi = ensemble.nextIndex()
-        ensemble.goto(0)
-        deviations = np.array([frame.getDeviations() for frame in ensemble])
-        ensemble.goto(nfi)
+        deviations = ensemble.getDeviations()
     if deviations.ndim == 3:
         deviations = deviations.reshape((deviations.shape[0],
                                          deviations.shape[1] * 3))
@@ -177,6 +198,65 @@ def calcProjection(ensemble, modes, rmsd=True, norm=True):
     return projection
 
 
+def _projectTrajectory(traj, array, norm, chunk=1000, superpose=False,
+                       out=None):
+    """Returns projection of frames of *traj* onto mode *array*.  Frames are
+    read in blocks of *chunk* frames and each block is projected using a
+    single matrix product.  When *norm* is true, projections are divided by
+    the norm of all deviations, which is accumulated block by block."""
+
+    if not isinstance(chunk, int):
+        raise TypeError('chunk must be an integer')
+    elif chunk < 1:
+        raise ValueError('chunk must be a positive integer')
+
+    n_frames = traj.numFrames()
+    shape = (n_frames,) + array.shape[1:]
+    if out is None:
+        out = np.zeros(shape)
+    elif not isinstance(out, np.ndarray):
+        raise TypeError('out must be a numpy array')
+    elif out.shape != shape:
+        raise ValueError('out must have shape {0}'.format(shape))
+
+    reference = traj._getCoords()
+    weights = traj._getWeights()
+    if superpose:
+        from prody.measure import getTransformations
+
+    nfi = traj.nextIndex()
+    traj.reset()
+    sqsum = 0.
+    start = 0
+    LOGGER.progress('Projecting {0} frames from {1}:'
+                    .format(n_frames, str(traj)), n_frames,
+                    '_prody_calcProjection')
+    while start < n_frames:
+        coords = traj.nextCoordsets(chunk)
+        if coords is None:
+            break
+        coords = coords.astype(float)
+        if superpose:
+            rotations, translations = getTransformations(coords, reference,
+                                                         weights)
+            coords = np.matmul(coords, rotations.transpose(0, 2, 1))
+            coords += translations[:, None]
+        coords -= reference
+        deviations = coords.reshape((len(coords), -1))
+        if norm:
+            sqsum += (deviations ** 2).sum()
+        stop = start + len(deviations)
+        out[start:stop] = np.dot(deviations, array)
+        start = stop
+        LOGGER.update(start, label='_prody_calcProjection')
+    LOGGER.finish()
+    traj.goto(nfi)
+
+    if norm and sqsum:
+        out /= sqsum ** 0.5
+    return out
+
+
 def calcCrossProjection(ensemble, mode1, mode2, scale=None, **kwargs):
     """Returns projection of conformational deviations onto modes from
     different models.
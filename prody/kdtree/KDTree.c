@@ -17,6 +17,9 @@ struct KDTree
     struct DataPoint* _data_point_list;
     int _data_point_list_size;
     struct Radius* _radius_list;
+    long int _radius_list_size;
+    char *_mask;
+    int _count_only;
     struct Neighbor* _neighbor_list;
     struct Node *_root;
     struct Region *_query_region;
@@ -290,6 +293,9 @@ struct KDTree* KDTree_init(int dim, int bucket_size)
     tree->_root=NULL;
     tree->_coords=NULL;
     tree->_radius_list = NULL;
+    tree->_radius_list_size = 0;
+    tree->_mask = NULL;
+    tree->_count_only = 0;
     tree->_count=0;
     tree->_neighbor_count=0;
     tree->_neighbor_list = NULL;
@@ -420,18 +426,36 @@ static int KDTree_report_point(struct KDTree* tree, long int index, float *coord
 
     if (r<=tree->_radius_sq)
     {
-        int n = tree->_count;
-        struct Radius* p;
+        long int n = tree->_count;
+        struct Radius* p = tree->_radius_list;
 
-    p  = realloc(tree->_radius_list, (n+1)*sizeof(struct Radius));
-        if (p==NULL)
+        if (tree->_count_only)
         {
-            return 0;
+            /* only count the point, count search */
+            tree->_count++;
+            return 1;
+        }
+        if (tree->_mask)
+        {
+            /* only mark the point, batched mask search */
+            tree->_mask[index] = 1;
+            return 1;
+        }
+        if (n==tree->_radius_list_size)
+        {
+            /* grow the list geometrically to avoid a realloc per point */
+            long int size = n ? 2*n : 64;
+            p = realloc(tree->_radius_list, size*sizeof(struct Radius));
+            if (p==NULL)
+            {
+                return 0;
+            }
+            tree->_radius_list = p;
+            tree->_radius_list_size = size;
         }
         /* note use of sqrt - only calculated if necessary */
         p[n].index = index;
         p[n].value = sqrt(r);
-        tree->_radius_list = p;
         tree->_count++;
     }
     return 1;
@@ -474,6 +498,16 @@ long int KDTree_neighbor_get_count(struct KDTree* tree)
     return tree->_neighbor_count;
 }
 
+int KDTree_get_dim(struct KDTree* tree)
+{
+    return tree->dim;
+}
+
+long int KDTree_get_size(struct KDTree* tree)
+{
+    return tree->_data_point_list_size;
+}
+
 static int KDTree_search(struct KDTree* tree, struct Region *region, struct Node *node, int depth);
 
 static int KDTree_test_region(struct KDTree* tree, struct Node *node, struct Region *region, int depth)
@@ -621,6 +655,7 @@ int KDTree_set_data(struct KDTree* tree, float *coords, long int nr_points)
     {
         free(tree->_radius_list);
         tree->_radius_list = NULL;
+        tree->_radius_list_size = 0;
     }
     tree->_count=0;
     /* keep pointer to coords to delete it */
@@ -644,6 +679,212 @@ int KDTree_set_data(struct KDTree* tree, float *coords, long int nr_points)
     return 1;
 }
 
+static int KDTree_set_query_region(struct KDTree* tree, float *coord, float radius)
+{
+    int i;
+    int dim = tree->dim;
+    float* left = malloc(dim*sizeof(float));
+    float* right = malloc(dim*sizeof(float));
+    if (left==NULL || right==NULL)
+    {
+        if (left) free(left);
+        if (right) free(right);
+        return 0;
+    }
+
+    tree->_radius=radius;
+    tree->_radius_sq=radius*radius;
+
+    for (i=0; i<dim; i++)
+    {
+        left[i]=coord[i]-radius;
+        right[i]=coord[i]+radius;
+        tree->_center_coord[i]=coord[i];
+    }
+
+    Region_destroy(tree->_query_region);
+    tree->_query_region= Region_create(left, right);
+
+    free(left);
+    free(right);
+
+    if (!tree->_query_region) return 0;
+    return 1;
+}
+
+int KDTree_search_centers_radius(struct KDTree* tree, float *coords, long int n, float radius, long *indptr, char *mask)
+{
+    /* search points within radius of each of n centers; when mask is given,
+     * points found are marked in it, otherwise they are accumulated in the
+     * radius list and indptr[i+1] is set to the count after center i */
+    long int i;
+    int ok = 1;
+
+    Region_dim=tree->dim;
+
+    if (tree->_radius_list)
+    {
+        free(tree->_radius_list);
+        tree->_radius_list = NULL;
+        tree->_radius_list_size = 0;
+    }
+    tree->_count=0;
+    tree->_mask=mask;
+    if (indptr) indptr[0] = 0;
+
+    for (i=0; i<n; i++)
+    {
+        ok = KDTree_set_query_region(tree, coords+i*tree->dim, radius);
+        if (ok) ok = KDTree_search(tree, NULL, NULL, 0);
+        if (!ok) break;
+        if (indptr) indptr[i+1] = tree->_count;
+    }
+    tree->_mask=NULL;
+    return ok;
+}
+
+int KDTree_count_centers_radius(struct KDTree* tree, float *coords, long int n, float radius, long *counts)
+{
+    /* count points within radius of each of n centers without storing them */
+    long int i;
+    int ok = 1;
+
+    Region_dim=tree->dim;
+
+    if (tree->_radius_list)
+    {
+        free(tree->_radius_list);
+        tree->_radius_list = NULL;
+        tree->_radius_list_size = 0;
+    }
+    tree->_count_only=1;
+
+    for (i=0; i<n; i++)
+    {
+        tree->_count=0;
+        ok = KDTree_set_query_region(tree, coords+i*tree->dim, radius);
+        if (ok) ok = KDTree_search(tree, NULL, NULL, 0);
+        if (!ok) break;
+        counts[i] = tree->_count;
+    }
+    tree->_count_only=0;
+    tree->_count=0;
+    return ok;
+}
+
+/* k nearest neighbors */
+
+static void KDTree_heap_sift_down(long *indices, float *dists, long int k, long int i)
+{
+    /* restore max-heap property of dists below position i */
+    while (1)
+    {
+        long int largest = i, left = 2*i+1, right = 2*i+2;
+        float dist;
+        long index;
+
+        if (left<k && dists[left]>dists[largest]) largest = left;
+        if (right<k && dists[right]>dists[largest]) largest = right;
+        if (largest==i) return;
+        dist = dists[i]; dists[i] = dists[largest]; dists[largest] = dist;
+        index = indices[i]; indices[i] = indices[largest]; indices[largest] = index;
+        i = largest;
+    }
+}
+
+static void KDTree_heap_push(long *indices, float *dists, long int *n, long int k, long index, float dist)
+{
+    long int i;
+
+    if (*n<k)
+    {
+        /* sift up the new point */
+        i = (*n)++;
+        while (i>0 && dists[(i-1)/2]<dist)
+        {
+            dists[i] = dists[(i-1)/2];
+            indices[i] = indices[(i-1)/2];
+            i = (i-1)/2;
+        }
+        dists[i] = dist;
+        indices[i] = index;
+    }
+    else if (dist<dists[0])
+    {
+        /* replace the farthest point */
+        dists[0] = dist;
+        indices[0] = index;
+        KDTree_heap_sift_down(indices, dists, k, 0);
+    }
+}
+
+static void KDTree_knn_node(struct KDTree* tree, struct Node *node, float *coord, long int k, long *indices, float *dists, long int *n)
+{
+    if (Node_is_leaf(node))
+    {
+        long int i;
+
+        for (i=node->_start; i<node->_end; i++)
+        {
+            struct DataPoint data_point;
+
+            data_point=tree->_data_point_list[i];
+            KDTree_heap_push(indices, dists, n, k, data_point._index,
+                             KDTree_dist(coord, data_point._coord, tree->dim));
+        }
+    }
+    else
+    {
+        float diff = coord[node->_cut_dim] - node->_cut_value;
+        struct Node *near, *far;
+
+        if (diff<=0)
+        {
+            near = node->_left;
+            far = node->_right;
+        }
+        else
+        {
+            near = node->_right;
+            far = node->_left;
+        }
+        KDTree_knn_node(tree, near, coord, k, indices, dists, n);
+        /* far half can only contain closer points if the splitting plane
+         * is closer than the current k-th neighbor */
+        if (*n<k || diff*diff<dists[0])
+            KDTree_knn_node(tree, far, coord, k, indices, dists, n);
+    }
+}
+
+int KDTree_knn_centers(struct KDTree* tree, float *coords, long int n, long int k, long *indices, float *dists)
+{
+    /* find k nearest points of each of n centers, results are written in
+     * rows of indices and dists with shape (n, k) in increasing distance */
+    long int i, j, found;
+
+    if (!tree->_root || k<1 || k>tree->_data_point_list_size) return 0;
+
+    for (i=0; i<n; i++)
+    {
+        long *idx = indices + i*k;
+        float *dst = dists + i*k;
+
+        found = 0;
+        KDTree_knn_node(tree, tree->_root, coords+i*tree->dim, k, idx, dst, &found);
+        /* heap sort in place, largest goes to the end */
+        for (j=k-1; j>0; j--)
+        {
+            float dist = dst[0];
+            long index = idx[0];
+            dst[0] = dst[j]; dst[j] = dist;
+            idx[0] = idx[j]; idx[j] = index;
+            KDTree_heap_sift_down(idx, dst, j, 0);
+        }
+        for (j=0; j<k; j++) dst[j] = sqrt(dst[j]);
+    }
+    return 1;
+}
+
 int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius)
 {
     int i;
@@ -663,6 +904,7 @@ int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius)
     {
         free(tree->_radius_list);
         tree->_radius_list = NULL;
+        tree->_radius_list_size = 0;
     }
     tree->_count=0;
 
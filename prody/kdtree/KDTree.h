@@ -7,7 +7,12 @@ void KDTree_destroy(struct KDTree* tree);
 int KDTree_set_data(struct KDTree* tree, float *coords, long int nr_points);
 long int KDTree_get_count(struct KDTree* tree);
 long int KDTree_neighbor_get_count(struct KDTree* tree);
+int KDTree_get_dim(struct KDTree* tree);
+long int KDTree_get_size(struct KDTree* tree);
 int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius);
+int KDTree_search_centers_radius(struct KDTree* tree, float *coords, long int n, float radius, long *indptr, char *mask);
+int KDTree_count_centers_radius(struct KDTree* tree, float *coords, long int n, float radius, long *counts);
+int KDTree_knn_centers(struct KDTree* tree, float *coords, long int n, long int k, long *indices, float *dists);
 void KDTree_copy_indices(struct KDTree* tree, long *indices);
 void KDTree_copy_radii(struct KDTree* tree, float *radii);
 int KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius, struct Neighbor** neighbors);
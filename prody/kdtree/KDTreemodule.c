@@ -1,4 +1,5 @@
 #include <Python.h>
+#include <string.h>
 #include "KDTree.h"
 
 
@@ -514,6 +515,259 @@ PyTree_neighbor_simple_search(PyTree* self, PyObject* args)
     return list;
 }
 
+static float*
+PyTree_copy_centers(PyObject *obj, int dim, Py_ssize_t *nr_centers)
+{
+    /* copy a (n, dim) array of centers into a newly allocated float array */
+    float* coords = NULL;
+    Py_ssize_t n, m, i, j;
+    Py_ssize_t rowstride, colstride;
+    const int flags = PyBUF_FORMAT | PyBUF_STRIDES;
+    const char* p;
+    char datatype;
+    Py_buffer view;
+
+    if (PyObject_GetBuffer(obj, &view, flags) == -1) return NULL;
+    if (view.ndim != 2) {
+        PyErr_SetString(PyExc_RuntimeError, "Array must be two-dimensional");
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    n = view.shape[0];
+    m = view.shape[1];
+    if (m != dim) {
+        PyErr_Format(PyExc_ValueError,
+            "centers must have %d columns, one for each dimension", dim);
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    rowstride = view.strides[0];
+    colstride = view.strides[1];
+    coords = malloc(m*n*sizeof(float) + 1);
+    if (!coords) {
+        PyErr_NoMemory();
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    p = view.buf;
+    datatype = view.format[0];
+    switch (datatype) {
+        case '@':
+        case '=':
+        case '<':
+        case '>':
+        case '!': datatype = view.format[1]; break;
+        default: break;
+    }
+    switch (datatype) {
+        case 'd': COPY2DARRAY(double); break;
+        case 'f': COPY2DARRAY(float); break;
+        case 'i': COPY2DARRAY(int); break;
+        case 'I': COPY2DARRAY(unsigned int); break;
+        case 'l': COPY2DARRAY(long); break;
+        case 'L': COPY2DARRAY(unsigned long); break;
+        default:
+            PyErr_Format(PyExc_RuntimeError,
+                "array should contain numerical data (format character was %c).",
+                datatype);
+            PyBuffer_Release(&view);
+            free(coords);
+            return NULL;
+    }
+    PyBuffer_Release(&view);
+    *nr_centers = n;
+    return coords;
+}
+
+static char
+PyTree_get_output(PyObject *obj, Py_buffer *view, const char *formats, Py_ssize_t size)
+{
+    /* get a writable buffer for an output array with one of the formats
+     * and size items, returns the format character or 0 on failure */
+    const int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | PyBUF_WRITABLE;
+    char datatype;
+
+    if (PyObject_GetBuffer(obj, view, flags) == -1) return 0;
+    datatype = view->format[0];
+    switch (datatype) {
+        case '@':
+        case '=':
+        case '<':
+        case '>':
+        case '!': datatype = view->format[1]; break;
+        default: break;
+    }
+    if (!strchr(formats, datatype)) {
+        PyErr_Format(PyExc_RuntimeError,
+            "array has incorrect data format ('%c', expected one of '%s')",
+            datatype, formats);
+        PyBuffer_Release(view);
+        return 0;
+    }
+    if (size >= 0 && view->len / view->itemsize != size) {
+        PyErr_SetString(PyExc_ValueError, "array has incorrect size");
+        PyBuffer_Release(view);
+        return 0;
+    }
+    return datatype;
+}
+
+static char PyTree_search_centers_radius__doc__[] =
+"search points within radius of each center in a (n, 3) array; output\n"
+"array is either a long array of length n+1 that is filled with offsets\n"
+"of neighbors of each center in indices and radii, or a boolean mask of\n"
+"length equal to number of points that is set for all points found\n";
+
+static PyObject*
+PyTree_search_centers_radius(PyTree* self, PyObject* args)
+{
+    PyObject *obj, *out;
+    double radius;
+    Py_ssize_t n;
+    float *coords;
+    struct KDTree* tree = self->tree;
+    int ok;
+    Py_buffer view;
+    char datatype;
+
+    if(!PyArg_ParseTuple(args, "OdO:KDTree_search_centers_radius", &obj,
+                         &radius, &out))
+        return NULL;
+
+    if(radius <= 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "Radius must be positive.");
+        return NULL;
+    }
+
+    coords = PyTree_copy_centers(obj, KDTree_get_dim(tree), &n);
+    if (!coords) return NULL;
+    datatype = PyTree_get_output(out, &view, "l?bB", -1);
+    if (!datatype) {
+        free(coords);
+        return NULL;
+    }
+    if (datatype == 'l') {
+        if (view.len / view.itemsize != n + 1) {
+            PyErr_SetString(PyExc_ValueError,
+                "offset array must have length number of centers plus one");
+            goto exit;
+        }
+        ok = KDTree_search_centers_radius(tree, coords, n, radius,
+                                          (long *) view.buf, NULL);
+    }
+    else {
+        if (view.len / view.itemsize != KDTree_get_size(tree)) {
+            PyErr_SetString(PyExc_ValueError,
+                "mask array must have length number of points");
+            goto exit;
+        }
+        ok = KDTree_search_centers_radius(tree, coords, n, radius,
+                                          NULL, (char *) view.buf);
+    }
+    if (!ok) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    free(coords);
+    PyBuffer_Release(&view);
+    Py_INCREF(Py_None);
+    return Py_None;
+
+exit:
+    PyBuffer_Release(&view);
+    free(coords);
+    return NULL;
+}
+
+static char PyTree_count_centers_radius__doc__[] =
+"count points within radius of each center in a (n, 3) array, counts are\n"
+"written into a long array of length n\n";
+
+static PyObject*
+PyTree_count_centers_radius(PyTree* self, PyObject* args)
+{
+    PyObject *obj, *out;
+    double radius;
+    Py_ssize_t n;
+    float *coords;
+    int ok;
+    Py_buffer view;
+
+    if(!PyArg_ParseTuple(args, "OdO:KDTree_count_centers_radius", &obj,
+                         &radius, &out))
+        return NULL;
+
+    if(radius <= 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "Radius must be positive.");
+        return NULL;
+    }
+
+    coords = PyTree_copy_centers(obj, KDTree_get_dim(self->tree), &n);
+    if (!coords) return NULL;
+    if (!PyTree_get_output(out, &view, "l", n)) {
+        free(coords);
+        return NULL;
+    }
+    ok = KDTree_count_centers_radius(self->tree, coords, n, radius,
+                                     (long *) view.buf);
+    free(coords);
+    PyBuffer_Release(&view);
+    if (!ok) return PyErr_NoMemory();
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static char PyTree_knn_centers__doc__[] =
+"find k nearest points of each center in a (n, 3) array, indices and\n"
+"distances are written into long and float arrays with n*k items\n";
+
+static PyObject*
+PyTree_knn_centers(PyTree* self, PyObject* args)
+{
+    PyObject *obj, *out1, *out2;
+    long k;
+    Py_ssize_t n;
+    float *coords;
+    int ok;
+    Py_buffer view1, view2;
+
+    if(!PyArg_ParseTuple(args, "OlOO:KDTree_knn_centers", &obj, &k,
+                         &out1, &out2))
+        return NULL;
+
+    if(k <= 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "k must be positive.");
+        return NULL;
+    }
+
+    coords = PyTree_copy_centers(obj, KDTree_get_dim(self->tree), &n);
+    if (!coords) return NULL;
+    if (!PyTree_get_output(out1, &view1, "l", n*k)) {
+        free(coords);
+        return NULL;
+    }
+    if (!PyTree_get_output(out2, &view2, "f", n*k)) {
+        PyBuffer_Release(&view1);
+        free(coords);
+        return NULL;
+    }
+    ok = KDTree_knn_centers(self->tree, coords, n, k, (long *) view1.buf,
+                            (float *) view2.buf);
+    free(coords);
+    PyBuffer_Release(&view1);
+    PyBuffer_Release(&view2);
+    if (!ok) {
+        PyErr_SetString(PyExc_ValueError,
+            "k must not exceed the number of points in the tree");
+        return NULL;
+    }
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
 static char PyTree_get_indices__doc__[] =
 "returns indices of coordinates within radius as a Numpy array\n";
 
@@ -604,6 +858,9 @@ static PyMethodDef PyTree_methods[] = {
     {"get_count", (PyCFunction)PyTree_get_count, METH_NOARGS, NULL},
     {"set_data", (PyCFunction)PyTree_set_data, METH_VARARGS, NULL},
     {"search_center_radius", (PyCFunction)PyTree_search_center_radius, METH_VARARGS, NULL},
+    {"search_centers_radius", (PyCFunction)PyTree_search_centers_radius, METH_VARARGS, PyTree_search_centers_radius__doc__},
+    {"count_centers_radius", (PyCFunction)PyTree_count_centers_radius, METH_VARARGS, PyTree_count_centers_radius__doc__},
+    {"knn_centers", (PyCFunction)PyTree_knn_centers, METH_VARARGS, PyTree_knn_centers__doc__},
     {"neighbor_get_count", (PyCFunction)PyTree_neighbor_get_count, METH_NOARGS, NULL},
     {"neighbor_search", (PyCFunction)PyTree_neighbor_search, METH_VARARGS, NULL},
     {"neighbor_simple_search", (PyCFunction)PyTree_neighbor_simple_search, METH_VARARGS, NULL},
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+"""This module defines :class:`CellList` class for neighbor search using cell
+lists (linked cells), which handles orthorhombic and triclinic periodic
+boundary conditions natively."""
+
+from numpy import array, ndarray, empty, zeros, ones, arange, repeat, unique
+from numpy import concatenate, cumsum, bincount, lexsort, floor, sqrt, cos
+from numpy import sin, radians, dot, eye, diff, allclose, clip, minimum
+from numpy.linalg import inv
+
+__all__ = ['CellList']
+
+CHUNK = 20000
+
+
+def getCellVectors(unitcell):
+    """Returns box vectors as rows of a ``(3, 3)`` array for *unitcell*,
+    which may be orthorhombic dimensions with shape ``(3,)``, dimensions and
+    angles in degrees ``(a, b, c, alpha, beta, gamma)`` with shape ``(6,)``,
+    or box vectors with shape ``(3, 3)``.  A zero length dimension is treated
+    as non-periodic and replaced by a very long vector."""
+
+    if not isinstance(unitcell, ndarray):
+        raise TypeError('unitcell must be a Numpy array')
+    unitcell = array(unitcell, float)
+    if unitcell.shape == (3, 3):
+        vectors = unitcell
+    elif unitcell.shape in ((3,), (6,)):
+        a, b, c = unitcell[:3]
+        if unitcell.shape == (3,) or allclose(unitcell[3:], 90.):
+            vectors = eye(3) * unitcell[:3]
+        else:
+            alpha, beta, gamma = radians(unitcell[3:])
+            vectors = zeros((3, 3))
+            vectors[0, 0] = a
+            vectors[1, 0] = b * cos(gamma)
+            vectors[1, 1] = b * sin(gamma)
+            vectors[2, 0] = c * cos(beta)
+            vectors[2, 1] = c * (cos(alpha) - cos(beta) * cos(gamma)) / \
+                            sin(gamma)
+            vectors[2, 2] = sqrt(c * c - vectors[2, 0] ** 2 -
+                                 vectors[2, 1] ** 2)
+    else:
+        raise ValueError('unitcell.shape must be (3,), (6,), or (3, 3)')
+
+    for i in range(3):
+        if not vectors[i].any():
+            vectors[i, i] = 1e9
+    return vectors
+
+
+def isOrthorhombic(unitcell):
+    """Returns **True** if *unitcell* describes an orthorhombic box."""
+
+    vectors = getCellVectors(unitcell)
+    return allclose(vectors, eye(3) * vectors.diagonal())
+
+
+class CellList(object):
+
+    """Neighbor search using cell lists.  Points are binned into cells that
+    are at least as wide as the search radius, so that neighbors of a point
+    are found in the cell containing it and in the cells around it.
+
+    When a *unitcell* is given, distances are calculated using the minimum
+    image convention for orthorhombic and triclinic boxes, without making
+    copies of the system.  Points do not need to be wrapped into the unit
+    cell.  Only the minimum image distance of a pair is reported, so pairs
+    are found once even when the search radius is longer than half of the
+    width of the box.
+
+    Search methods and results mirror those of :class:`.KDTree`, which can
+    use this class for searches, e.g. ``KDTree(coords, method='celllist')``."""
+
+    def __init__(self, coords, unitcell=None, **kwargs):
+        """
+        :arg coords: coordinate array with shape ``(N, 3)``, where N is number
+            of atoms
+        :type coords: :class:`numpy.ndarray`, :class:`.Atomic`, :class:`.Frame`
+
+        :arg unitcell: unitcell dimensions with shape ``(3,)``, dimensions
+            and angles with shape ``(6,)``, or box vectors with shape
+            ``(3, 3)``
+        :type unitcell: :class:`numpy.ndarray`"""
+
+        if not isinstance(coords, ndarray):
+            if unitcell is None:
+                try:
+                    unitcell = coords.getUnitcell()
+                except AttributeError:
+                    pass
+            try:
+                coords = coords.getCoords()
+            except AttributeError:
+                raise TypeError('coords must be a Numpy array or must have '
+                                'getCoords attribute')
+        if coords.ndim != 2 or coords.shape[-1] != 3:
+            raise ValueError('coords.shape must be (N,3)')
+
+        self._coords = array(coords, float)
+        self._n_points = len(coords)
+        if unitcell is None:
+            self._box = self._inv = None
+        else:
+            self._box = getCellVectors(unitcell)
+            self._inv = inv(self._box)
+        self._unitcell = unitcell
+        self._grid = None
+        self._radius = None
+        self._images = None
+        self._indices = None
+        self._distances = None
+        self._none = kwargs.pop('none', lambda: None)
+        try:
+            self._none()
+        except TypeError:
+            raise TypeError('none argument must be callable')
+
+    def __call__(self, radius, center=None):
+        """Shorthand method for searching and retrieving results."""
+
+        self.search(radius, center)
+        return self.getIndices(), self.getDistances()
+
+    def _getCells(self, coords, shape, origin, size):
+        """Returns cell indices of *coords* along each dimension."""
+
+        if self._box is None:
+            cells = floor((coords - origin) / size).astype(int)
+            return clip(cells, 0, shape - 1)
+        frac = dot(coords, self._inv)
+        frac -= floor(frac)
+        cells = floor(frac * shape).astype(int)
+        return clip(cells, 0, shape - 1)
+
+    def _build(self, radius):
+        """Bin points into cells at least *radius* wide."""
+
+        if self._grid is not None and self._radius == radius:
+            return self._grid
+
+        coords = self._coords
+        if self._box is None:
+            if len(coords):
+                origin = coords.min(0)
+                extent = coords.max(0) - origin
+            else:
+                origin = extent = zeros(3)
+            shape = ones(3, int)
+            shape[:] = floor(extent / radius)
+            shape[shape < 1] = 1
+            limit = 4 * self._n_points + 1000
+            total = shape.prod()
+            if total > limit:
+                shape = floor(shape / (float(total) / limit) ** (1. / 3))
+                shape = shape.astype(int)
+                shape[shape < 1] = 1
+            size = extent / shape
+            size[size == 0] = 1.
+        else:
+            # distance between opposite faces of the box
+            width = 1. / sqrt((self._inv ** 2).sum(0))
+            shape = floor(width / radius).astype(int)
+            shape[shape < 1] = 1
+            origin = size = None
+            # rounding fractional coordinates gives the minimum image only
+            # for distances shorter than half of the width of a skewed box,
+            # so images around the rounded one are compared for longer ones
+            if radius > width.min() / 2 and not isOrthorhombic(self._box):
+                shifts = array([(i, j, k) for i in (-1, 0, 1)
+                                for j in (-1, 0, 1) for k in (-1, 0, 1)
+                                if i or j or k], float)
+                self._images = dot(shifts, self._box)
+            else:
+                self._images = None
+
+        cells = self._getCells(coords, shape, origin, size)
+        flat = (cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2]
+        order = flat.argsort(kind='mergesort')
+        starts = zeros(shape.prod() + 1, int)
+        starts[1:] = cumsum(bincount(flat, minlength=shape.prod()))
+
+        if self._box is None:
+            shifts = [array([-1, 0, 1])] * 3
+        else:
+            # unique neighbor cells when there are less than three cells
+            shifts = [unique(arange(-1, 2) % n) for n in shape]
+        offsets = array([(i, j, k) for i in shifts[0] for j in shifts[1]
+                         for k in shifts[2]], int)
+
+        self._grid = shape, origin, size, order, starts, offsets
+        self._radius = radius
+        return self._grid
+
+    def _pairs(self, radius, centers=None):
+        """Yield arrays of center indices, point indices, and distances for
+        pairs within *radius*, in chunks of centers.  When *centers* is not
+        given, unique pairs of points are yielded with center index being
+        the smaller one."""
+
+        shape, origin, size, order, starts, offsets = self._build(radius)
+        coords = self._coords
+        half = centers is None
+        if half:
+            centers = coords
+            cells = self._getCells(coords, shape, origin, size)
+        else:
+            cells = self._getCells(centers, shape, origin, size)
+        box, inv_ = self._box, self._inv
+        periodic = box is not None
+
+        for first in range(0, len(centers), CHUNK):
+            last = min(first + CHUNK, len(centers))
+            qcells = cells[first:last]
+            qindex = arange(first, last)
+            which, found = [], []
+            for offset in offsets:
+                ncells = qcells + offset
+                if periodic:
+                    ncells %= shape
+                    valid = None
+                else:
+                    valid = ((ncells >= 0) & (ncells < shape)).all(1)
+                    ncells = ncells[valid]
+                flat = ((ncells[:, 0] * shape[1] + ncells[:, 1]) * shape[2] +
+                        ncells[:, 2])
+                begin = starts[flat]
+                counts = starts[flat + 1] - begin
+                total = counts.sum()
+                if not total:
+                    continue
+                index = qindex if valid is None else qindex[valid]
+                which.append(repeat(index, counts))
+                # position of each candidate within its cell
+                local = arange(total) - repeat(cumsum(counts) - counts, counts)
+                found.append(order[repeat(begin, counts) + local])
+            if not which:
+                continue
+            which = concatenate(which)
+            found = concatenate(found)
+            if half:
+                keep = which < found
+                which, found = which[keep], found[keep]
+            delta = coords[found] - centers[which]
+            if periodic:
+                frac = dot(delta, inv_)
+                frac -= floor(frac + 0.5)
+                delta = dot(frac, box)
+            dist = (delta ** 2).sum(1)
+            if periodic and self._images is not None:
+                for image in self._images:
+                    dist = minimum(dist, ((delta + image) ** 2).sum(1))
+            dist = sqrt(dist)
+            keep = dist <= radius
+            yield which[keep], found[keep], dist[keep]
+
+    def search(self, radius, center=None):
+        """Search pairs within *radius* of each other or points within *radius*
+        of *center*.
+
+        :arg radius: distance (Å)
+        :type radius: float
+
+        :arg center: a point in Cartesian coordinate system
+        :type center: :class:`numpy.ndarray`"""
+
+        if not isinstance(radius, (float, int)):
+            raise TypeError('radius must be a number')
+        if radius <= 0:
+            raise TypeError('radius must be a positive number')
+
+        if center is not None:
+            if not isinstance(center, ndarray):
+                raise TypeError('center must be a Numpy array instance')
+            if center.shape != (3,):
+                raise ValueError('center.shape must be (3,)')
+            indptr, self._indices, self._distances = \
+                self.searchCenters(radius, center)
+            return
+
+        rows, cols, dists = [], [], []
+        for which, found, dist in self._pairs(radius):
+            rows.append(which)
+            cols.append(found)
+            dists.append(dist)
+        if rows:
+            rows, cols = concatenate(rows), concatenate(cols)
+            dists = concatenate(dists)
+            order = lexsort((cols, rows))
+            self._indices = array([rows[order], cols[order]]).T
+            self._distances = dists[order]
+        else:
+            self._indices = empty((0, 2), int)
+            self._distances = empty(0)
+
+    def searchCenters(self, radius, centers, mask=False):
+        """Search points within *radius* of each of *centers*.  Results are
+        returned as in :meth:`.KDTree.searchCenters`.
+
+        :arg radius: distance (Å)
+        :type radius: float
+
+        :arg centers: points in Cartesian coordinate system, with shape
+            ``(n_centers, 3)`` or ``(3,)``
+        :type centers: :class:`numpy.ndarray`
+
+        :arg mask: return a boolean mask of points found, default is **False**
+        :type mask: bool"""
+
+        if not isinstance(radius, (float, int)):
+            raise TypeError('radius must be a number')
+        if radius <= 0:
+            raise TypeError('radius must be a positive number')
+        if not isinstance(centers, ndarray):
+            raise TypeError('centers must be a Numpy array instance')
+        if centers.shape == (3,):
+            centers = centers.reshape((1, 3))
+        if centers.ndim != 2 or centers.shape[1] != 3:
+            raise ValueError('centers.shape must be (n_centers, 3) or (3,)')
+
+        n_centers = len(centers)
+        if mask:
+            torf = zeros(self._n_points, bool)
+            for which, found, dist in self._pairs(radius, centers):
+                torf[found] = True
+            return torf
+
+        rows, cols, dists = [], [], []
+        for which, found, dist in self._pairs(radius, centers):
+            rows.append(which)
+            cols.append(found)
+            dists.append(dist)
+        indptr = zeros(n_centers + 1, int)
+        if not rows:
+            return indptr, empty(0, int), empty(0)
+        rows, cols = concatenate(rows), concatenate(cols)
+        dists = concatenate(dists)
+        order = lexsort((cols, rows))
+        indptr[1:] = cumsum(bincount(rows, minlength=n_centers))
+        return indptr, cols[order], dists[order]
+
+    def countCenters(self, radius, centers):
+        """Returns an array with the number of points within *radius* of each
+        of *centers*."""
+
+        return diff(self.searchCenters(radius, centers)[0])
+
+    def getIndices(self):
+        """Returns array of indices for points or pairs, depending on the type
+        of the most recent search."""
+
+        if self.getCount():
+            return self._indices
+        return self._none()
+
+    def getDistances(self):
+        """Returns array of distances."""
+
+        if self.getCount():
+            return self._distances
+        return self._none()
+
+    def getCount(self):
+        """Returns number of points or pairs."""
+
+        if self._indices is None:
+            return 0
+        return len(self._indices)
+
+    def getUnitcell(self):
+        """Returns box vectors as rows of an array, or **None** if one was not
+        provided."""
+
+        if self._box is not None:
+            return self._box.copy()
@@ -2,19 +2,18 @@
 """This module defines :class:`KDTree` class for dealing with atomic coordinate
 sets and handling periodic boundary conditions."""
 
-from numpy import array, ndarray, concatenate, empty
+from numpy import array, ndarray, concatenate, empty, zeros, repeat, arange
+from numpy import lexsort, diff, bincount, cumsum, ones
 
 from prody import LOGGER
 
+from .celllist import CellList, getCellVectors, isOrthorhombic
+
 try:
     from ._CKDTree import KDTree as CKDTree
 except ImportError:
-    try:
-        from Bio.KDTree._CKDTree import KDTree as CKDTree
-    except ImportError:
-        raise ImportError('CKDTree module could not be imported. '
-                          'Reinstall ProDy or install Biopython '
-                          'to solve the problem.')
+    raise ImportError('CKDTree module could not be imported. '
+                      'Reinstall ProDy to solve the problem.')
 
 __all__ = ['KDTree']
 
@@ -76,6 +75,19 @@ class KDTree(object):
     Only requirement for this approach to work is that the system must be
     in the original unitcell with parts in its immediate periodic images.
 
+    *Batched search*
+
+    Points around many centers can be found with a single call using
+    :meth:`searchCenters`, which returns neighbors of all centers in
+    compressed sparse row format or a boolean mask of points found.
+
+
+    *Cell lists*
+
+    When ``method='celllist'`` is passed, searches are performed using a
+    :class:`.CellList`, which handles periodic boundaries using the minimum
+    image convention without replicating the system and supports triclinic
+    unit cells.  Cell lists are used by default for triclinic unit cells.
 
     .. seealso::
        :func:`.wrapAtoms` can be used for wrapping atoms into the single
@@ -88,11 +100,16 @@ class KDTree(object):
         :type coords: :class:`numpy.ndarray`, :class:`.Atomic`, :class:`.Frame`
 
         :arg unitcell: orthorhombic unitcell dimension array with shape
-            ``(3,)``
+            ``(3,)``, or with ``method='celllist'`` also dimensions and angles
+            with shape ``(6,)`` or box vectors with shape ``(3, 3)``
         :type unitcell: :class:`numpy.ndarray`
 
         :arg bucketsize: number of points per tree node, default is 10
-        :type bucketsize: int"""
+        :type bucketsize: int
+
+        :arg method: neighbor search method, ``'kdtree'`` or ``'celllist'``,
+            default is ``'kdtree'`` unless a triclinic *unitcell* is given
+        :type method: str"""
 
         unitcell = kwargs.get('unitcell')
         if not isinstance(coords, ndarray):
@@ -130,10 +147,33 @@ class KDTree(object):
         if self._bucketsize < 1:
             raise ValueError('bucketsize must be a positive integer')
 
+        method = kwargs.get('method')
+        if method not in (None, 'kdtree', 'celllist'):
+            raise ValueError('method must be kdtree or celllist')
+        if unitcell is not None and method != 'celllist':
+            if not isinstance(unitcell, ndarray):
+                raise TypeError('unitcell must be a Numpy array')
+            if unitcell.shape != (3,):
+                if not isOrthorhombic(unitcell):
+                    if method == 'kdtree':
+                        raise ValueError('triclinic unitcell can only be used '
+                                         'with celllist method')
+                    method = 'celllist'
+                elif unitcell.shape == (6,):
+                    unitcell = unitcell[:3]
+                else:
+                    unitcell = getCellVectors(unitcell).diagonal()
+
         self._coords = None
         self._unitcell = None
         self._neighbors = None
-        if unitcell is None:
+        self._n_points = coords.shape[0]
+        self._engine = None
+        if method == 'celllist':
+            self._engine = CellList(coords, unitcell=unitcell,
+                                    none=kwargs.get('none', lambda: None))
+            self._unitcell = unitcell
+        elif unitcell is None:
             self._kdtree = CKDTree(3, self._bucketsize)
             self._kdtree.set_data(coords)
         else:
@@ -177,6 +217,9 @@ class KDTree(object):
         :arg center: a point in Cartesian coordinate system
         :type center: :class:`numpy.ndarray`"""
 
+        if self._engine is not None:
+            return self._engine.search(radius, center)
+
         if not isinstance(radius, (float, int)):
             raise TypeError('radius must be a number')
         if radius <= 0:
@@ -240,10 +283,171 @@ class KDTree(object):
                 self._pdbkeys = list(_dict)
 
 
+    def searchCenters(self, radius, centers, mask=False):
+        """Search points within *radius* of each of *centers* at once and
+        return results directly.  By default, a tuple of three arrays,
+        ``(indptr, indices, distances)``, is returned in compressed sparse
+        row format, i.e. indices of points within *radius* of ``centers[i]``
+        are ``indices[indptr[i]:indptr[i+1]]``.  When *mask* is **True**, a
+        boolean array with **True** values for points within *radius* of any
+        of the centers is returned instead.  Results of an earlier
+        :meth:`search` call are discarded.
+
+        :arg radius: distance (Å)
+        :type radius: float
+
+        :arg centers: points in Cartesian coordinate system, with shape
+            ``(n_centers, 3)`` or ``(3,)``
+        :type centers: :class:`numpy.ndarray`
+
+        :arg mask: return a boolean mask of points found, default is **False**
+        :type mask: bool"""
+
+        if self._engine is not None:
+            return self._engine.searchCenters(radius, centers, mask)
+
+        if not isinstance(radius, (float, int)):
+            raise TypeError('radius must be a number')
+        if radius <= 0:
+            raise TypeError('radius must be a positive number')
+        centers = checkCenters(centers)
+
+        if self._unitcell is None:
+            replicate = [None]
+        else:
+            replicate = self._replicate
+        n_centers = len(centers)
+        search = self._kdtree.search_centers_radius
+
+        if mask:
+            torf = zeros(self._n_points, bool)
+            for rep in replicate:
+                search(centers if rep is None else centers + rep, radius,
+                       torf)
+            return torf
+
+        which, indices, distances = [], [], []
+        indptr = empty(n_centers + 1, int)
+        for rep in replicate:
+            search(centers if rep is None else centers + rep, radius, indptr)
+            count = indptr[-1]
+            if count:
+                which.append(repeat(arange(n_centers), diff(indptr)))
+                indices.append(get_KDTree_indices(self._kdtree))
+                distances.append(get_KDTree_radii(self._kdtree))
+        if self._unitcell is None:
+            if indices:
+                return indptr, indices[0], distances[0]
+            return indptr, empty(0, int), empty(0, 'f')
+
+        indptr = zeros(n_centers + 1, int)
+        if not indices:
+            return indptr, empty(0, int), empty(0, 'f')
+        which = concatenate(which)
+        indices = concatenate(indices)
+        distances = concatenate(distances)
+        # keep the minimum image distance for each center and point pair
+        order = lexsort((distances, indices, which))
+        which, indices = which[order], indices[order]
+        distances = distances[order]
+        first = ones(len(order), bool)
+        first[1:] = (diff(which) != 0) | (diff(indices) != 0)
+        which = which[first]
+        indptr[1:] = cumsum(bincount(which, minlength=n_centers))
+        return indptr, indices[first], distances[first]
+
+    def countCenters(self, radius, centers):
+        """Returns an array with the number of points within *radius* of each
+        of *centers*.  Points are counted without retrieving them, so this is
+        suitable for calculating coordination or contact numbers.  Results
+        of an earlier :meth:`search` call are discarded.
+
+        :arg radius: distance (Å)
+        :type radius: float
+
+        :arg centers: points in Cartesian coordinate system, with shape
+            ``(n_centers, 3)`` or ``(3,)``
+        :type centers: :class:`numpy.ndarray`"""
+
+        if self._engine is not None:
+            return self._engine.countCenters(radius, centers)
+
+        if not isinstance(radius, (float, int)):
+            raise TypeError('radius must be a number')
+        if radius <= 0:
+            raise TypeError('radius must be a positive number')
+
+        if self._unitcell is not None:
+            indptr = self.searchCenters(radius, centers)[0]
+            return diff(indptr)
+
+        centers = checkCenters(centers)
+        counts = empty(len(centers), int)
+        self._kdtree.count_centers_radius(centers, radius, counts)
+        self._neighbors = None
+        return counts
+
+    def searchNearest(self, centers, k=1):
+        """Returns indices of *k* nearest points to each of *centers* and
+        distances to them, sorted by distance.  Arrays returned have shape
+        ``(n_centers, k)``, or ``(k,)`` when a single center with shape
+        ``(3,)`` is given.
+
+        :arg centers: points in Cartesian coordinate system, with shape
+            ``(n_centers, 3)`` or ``(3,)``
+        :type centers: :class:`numpy.ndarray`
+
+        :arg k: number of nearest points, default is 1
+        :type k: int"""
+
+        if self._engine is not None:
+            raise ValueError('nearest neighbor search is not supported with '
+                             'celllist method')
+
+        if not isinstance(k, int):
+            raise TypeError('k must be an integer')
+        if k < 1 or k > self._n_points:
+            raise ValueError('k must be between 1 and number of points')
+        single = isinstance(centers, ndarray) and centers.shape == (3,)
+        centers = checkCenters(centers)
+        n_centers = len(centers)
+
+        if self._unitcell is None:
+            indices = empty((n_centers, k), int)
+            distances = empty((n_centers, k), 'f')
+            self._kdtree.knn_centers(centers, k, indices, distances)
+        else:
+            # nearest points among all periodic images of the centers,
+            # keeping minimum image distance for each point
+            n_rep = len(self._replicate)
+            indices = empty((n_centers, n_rep * k), int)
+            distances = empty((n_centers, n_rep * k), 'f')
+            idx, dist = empty((n_centers, k), int), empty((n_centers, k), 'f')
+            for i, rep in enumerate(self._replicate):
+                self._kdtree.knn_centers(centers + rep, k, idx, dist)
+                indices[:, i * k:(i + 1) * k] = idx
+                distances[:, i * k:(i + 1) * k] = dist
+            rows = repeat(arange(n_centers), n_rep * k)
+            order = lexsort((distances.ravel(), indices.ravel(), rows))
+            dups = zeros(len(order), bool)
+            dups[1:] = ((diff(rows[order]) == 0) &
+                        (diff(indices.ravel()[order]) == 0))
+            distances.ravel()[order[dups]] = float('inf')
+            order = distances.argsort(1, kind='mergesort')[:, :k]
+            rows = arange(n_centers)[:, None]
+            indices = indices[rows, order]
+            distances = distances[rows, order]
+        if single:
+            return indices[0], distances[0]
+        return indices, distances
+
     def getIndices(self):
         """Returns array of indices for points or pairs, depending on the type
         of the most recent search."""
 
+        if self._engine is not None:
+            return self._engine.getIndices()
+
         if self.getCount():
             if self._unitcell is None:
                 if self._neighbors is None:
@@ -258,6 +462,9 @@ class KDTree(object):
     def getDistances(self):
         """Returns array of distances."""
 
+        if self._engine is not None:
+            return self._engine.getDistances()
+
         if self.getCount():
             if self._unitcell is None:
                 if self._neighbors is None:
@@ -272,6 +479,9 @@ class KDTree(object):
     def getCount(self):
         """Returns number of points or pairs."""
 
+        if self._engine is not None:
+            return self._engine.getCount()
+
         if self._unitcell is None:
             if self._neighbors is None:
                 return self._kdtree.get_count()
@@ -280,6 +490,17 @@ class KDTree(object):
         else:
             return len(self._pbcdict)
 
+def checkCenters(centers):
+    """Returns *centers* as an array with shape ``(n_centers, 3)``."""
+
+    if not isinstance(centers, ndarray):
+        raise TypeError('centers must be a Numpy array instance')
+    if centers.shape == (3,):
+        centers = centers.reshape((1, 3))
+    if centers.ndim != 2 or centers.shape[1] != 3:
+        raise ValueError('centers.shape must be (n_centers, 3) or (3,)')
+    return centers
+
 def get_KDTree_indices(kdtree):
     indices = None
     try:
@@ -9,6 +9,7 @@ Identify contacts
 Following class and functions are for contact identifications:
 
   * :class:`.Contacts` - identify intermolecular contacts
+  * :class:`.ContactSeries` - identify contacts in trajectory frames
   * :func:`.findNeighbors` - identify interacting atom pairs
   * :func:`.iterNeighbors` - identify interacting atom pairs
 
@@ -23,6 +24,8 @@ Following functions are for measuring simple quantities:
   * :func:`.calcOmega` - calculate omega (ω) angle
   * :func:`.calcPhi` - calculate phi (φ) angle
   * :func:`.calcPsi` - calculate psi (ψ) angle
+  * :func:`.calcTorsions` - calculate torsion angles of all residues
+  * :func:`.calcInternalCoords` - calculate distances, angles or dihedrals
   * :func:`.calcGyradius` - calculate radius of gyration
   * :func:`.calcCenter` - calculate geometric (or mass) center
   * :func:`.calcDeformVector` - calculate deformation vector
@@ -47,9 +50,13 @@ Following class and functions are for handling coordinate transformations:
   * :func:`.alignCoordsets` - align multiple coordinate sets
   * :func:`.applyTransformation` - apply a transformation
   * :func:`.calcTransformation` - calculate a transformation
+  * :func:`.calcTransformations` - calculate many transformations at once
+  * :func:`.applyTransformations` - apply many transformations at once
   * :func:`.calcRMSD` - calculate root-mean-square distance
   * :func:`.superpose` - superpose atoms or coordinate sets
   * :func:`.moveAtoms` - move atoms by given offset
+  * :func:`.wrapAtoms` - wrap atoms into a periodic image
+  * :func:`.iterWrapped` - wrap trajectory frames in blocks
 """
 
 __all__ = []
@@ -69,4 +76,4 @@ from . import transform
 from .transform import *
 __all__.extend(transform.__all__)
 
-from .transform import getRMSD, getTransformation
+from .transform import getRMSD, getTransformation, getTransformations
@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
 """ This module defines a class and function for identifying contacts."""
 
-from numpy import array, ndarray
+from numpy import array, ndarray, arange, zeros, unique, repeat, bincount
+from numpy import concatenate, cumsum, lexsort, flatnonzero, diff, minimum
+from numpy import maximum
 
 from prody.atomic import Atomic, Atom, AtomGroup, AtomSubset, Selection
-from prody.kdtree import KDTree
+from prody.kdtree import KDTree, CellList
 from prody.utilities import rangeString
+from prody import LOGGER
 
-__all__ = ['Contacts', 'iterNeighbors', 'findNeighbors']
+from .measure import _iterCoordsets
+
+__all__ = ['Contacts', 'ContactSeries', 'iterNeighbors', 'findNeighbors']
 
 class Contacts(object):
 
@@ -15,16 +20,19 @@ class Contacts(object):
     Contacts are identified using the coordinates of atoms at the time
     of instantiation."""
 
-    def __init__(self, atoms, unitcell=None):
-        """*atoms* must be an :class:`.Atomic` instance.  When an orthorhombic
-        *unitcell* array is given"""
+    def __init__(self, atoms, unitcell=None, method=None):
+        """*atoms* must be an :class:`.Atomic` instance.  When a *unitcell*
+        array is given, periodic boundary conditions will be taken into
+        account.  Neighbor search *method* may be ``'kdtree'`` or
+        ``'celllist'``, see :class:`.KDTree` for details."""
 
         try:
             self._acsi = atoms.getACSIndex()
         except AttributeError:
             try:
                 self._ag = atoms.getAtoms()
-                unitcell = unitcell or atoms.getUnitcell()[:3]
+                if unitcell is None:
+                    unitcell = atoms.getUnitcell()
                 self._indices = atoms.getSelection()
             except AttributeError:
                 try:
@@ -38,7 +46,8 @@ class Contacts(object):
                                          '(3,).')
                     self._ag = None
                     self._indices = None
-                    self._kdtree = KDTree(atoms, unitcell=unitcell)
+                    self._kdtree = KDTree(atoms, unitcell=unitcell,
+                                          method=method)
             else:
                 if self._ag is not None:
                     self._acsi = self._ag.getACSIndex()
@@ -47,17 +56,19 @@ class Contacts(object):
                 else:
                     self._acsi = None
                 self._kdtree = KDTree(self._atoms._getCoords(),
-                                      unitcell=unitcell)
+                                      unitcell=unitcell, method=method)
         else:
             try:
                 self._ag = atoms.getAtomGroup()
             except AttributeError:
                 self._ag = atoms
                 self._indices = None
-                self._kdtree = KDTree(atoms._getCoords(), unitcell=unitcell)
+                self._kdtree = KDTree(atoms._getCoords(), unitcell=unitcell,
+                                      method=method)
             else:
                 self._indices = atoms._getIndices()
-                self._kdtree = KDTree(atoms._getCoords(), unitcell=unitcell)
+                self._kdtree = KDTree(atoms._getCoords(), unitcell=unitcell,
+                                      method=method)
         self._unitcell = unitcell
         self._atoms = atoms
 
@@ -85,7 +96,7 @@ class Contacts(object):
                                 'coordinate array')
             else:
                 if shape == (3,):
-                    center = [center]
+                    center = array([center])
                 elif not ndim == 2 and shape[1] == 3:
                     raise ValueError('center.shape must be (n_atoms, 3) or'
                                      '(3,)')
@@ -93,21 +104,11 @@ class Contacts(object):
             if center is None:
                 raise ValueError('center does not have coordinate data')
 
-        search = self._kdtree.search
-        get_indices = self._kdtree.getIndices
-        get_count = self._kdtree.getCount
-        indices = set()
-        update = indices.update
-        radius = float(radius)
-        for xyz in center:
-            search(radius, xyz)
-            if get_count():
-                update(get_indices())
-        indices = list(indices)
-        if indices:
-            indices.sort()
+        indices = self._kdtree.searchCenters(float(radius), center,
+                                             mask=True).nonzero()[0]
+        if len(indices):
             if self._ag is None:
-                return array(indices)
+                return indices
             else:
                 if self._indices is not None:
                     indices = self._indices[indices]
@@ -128,16 +129,18 @@ class Contacts(object):
         return self._unitcell.copy()
 
 
-def iterNeighbors(atoms, radius, atoms2=None, unitcell=None):
+def iterNeighbors(atoms, radius, atoms2=None, unitcell=None, method=None):
     """Yield pairs of *atoms* that are within *radius* of each other and the
     distance between them.  If *atoms2* is also provided, one atom from *atoms*
     and another from *atoms2* will be yielded.  If one of *atoms* or *atoms2*
     is a coordinate array, pairs of indices and distances will be yielded.
-    When orthorhombic *unitcell* dimensions are provided, periodic boundary
-    conditions will be taken into account (see :class:`.KDTree` and also
+    When *unitcell* dimensions are provided, periodic boundary conditions
+    will be taken into account (see :class:`.KDTree` and also
     :func:`wrapAtoms` for details).  If *atoms* is a :class:`.Frame` instance
     and *unitcell* is not provided, unitcell information from frame will be
-    if available."""
+    if available.  Neighbor search *method* may be ``'kdtree'`` or
+    ``'celllist'``, the latter handles triclinic unit cells and large
+    periodic systems without replicating coordinates."""
 
     radius = float(radius)
     if radius <= 0:
@@ -150,7 +153,7 @@ def iterNeighbors(atoms, radius, atoms2=None, unitcell=None):
             ndim, shape = atoms.ndim, atoms.shape
         except AttributeError:
             try:
-                uc = atoms.getUnitcell()[:3]
+                uc = atoms.getUnitcell()
             except AttributeError:
                 raise TypeError('atoms must be an Atomic or Frame instance or '
                                 'a coordinate array')
@@ -191,7 +194,7 @@ def iterNeighbors(atoms, radius, atoms2=None, unitcell=None):
         if len(coords) <= 1:
             raise ValueError('atoms must be more than 1')
 
-        kdtree = KDTree(coords, unitcell=unitcell, none=list)
+        kdtree = KDTree(coords, unitcell=unitcell, none=list, method=method)
 
         _dict = {}
         if ag is None:
@@ -243,30 +246,38 @@ def iterNeighbors(atoms, radius, atoms2=None, unitcell=None):
         if coords2.ndim == 1:
             coords2 = array([coords2])
         if len(coords) >= len(coords2):
-            kdtree = KDTree(coords, unitcell=unitcell, none=list)
+            kdtree = KDTree(coords, unitcell=unitcell, none=list,
+                            method=method)
+            indptr, found, dists = kdtree.searchCenters(radius, coords2)
             _dict = {}
             if ag is None or ag2 is None:
-                for j, xyz in enumerate(coords2):
-                    for i, r in zip(*kdtree(radius, xyz)):
+                for j in range(len(coords2)):
+                    start, stop = indptr[j], indptr[j + 1]
+                    for i, r in zip(found[start:stop], dists[start:stop]):
                         yield (i, j, r)
             else:
-                for a2 in atoms2.iterAtoms():
-                    for i, r in zip(*kdtree(radius, a2._getCoords())):
+                for j, a2 in enumerate(atoms2.iterAtoms()):
+                    start, stop = indptr[j], indptr[j + 1]
+                    for i, r in zip(found[start:stop], dists[start:stop]):
                         a1 = _dict.get(i)
                         if a1 is None:
                             a1 = Atom(ag, index(i), acsi)
                             _dict[i] = a1
                         yield (a1, a2, r)
         else:
-            kdtree = KDTree(coords2, unitcell=unitcell, none=list)
+            kdtree = KDTree(coords2, unitcell=unitcell, none=list,
+                            method=method)
+            indptr, found, dists = kdtree.searchCenters(radius, coords)
             _dict = {}
             if ag is None or ag2 is None:
-                for i, xyz in enumerate(coords):
-                    for j, r in zip(*kdtree(radius, xyz)):
+                for i in range(len(coords)):
+                    start, stop = indptr[i], indptr[i + 1]
+                    for j, r in zip(found[start:stop], dists[start:stop]):
                         yield (i, j, r)
             else:
-                for a1 in atoms.iterAtoms():
-                    for i, r in zip(*kdtree(radius, a1._getCoords())):
+                for k, a1 in enumerate(atoms.iterAtoms()):
+                    start, stop = indptr[k], indptr[k + 1]
+                    for i, r in zip(found[start:stop], dists[start:stop]):
                         a2 = _dict.get(i)
                         if a2 is None:
                             a2 = Atom(ag2, index2(i), acsi2)
@@ -274,8 +285,283 @@ def iterNeighbors(atoms, radius, atoms2=None, unitcell=None):
                         yield (a1, a2, r)
 
 
-def findNeighbors(atoms, radius, atoms2=None, unitcell=None):
+def findNeighbors(atoms, radius, atoms2=None, unitcell=None, method=None):
     """Returns list of neighbors that are within *radius* of each other and the
     distance between them.  See :func:`iterNeighbors` for more details."""
 
-    return list(iterNeighbors(atoms, radius, atoms2, unitcell))
+    return list(iterNeighbors(atoms, radius, atoms2, unitcell, method))
+
+
+def _calcContactKeys(args):
+    """Returns number of contacts in each of coordinate sets and unique keys
+    of contacting pairs, ``i * n_units + j`` for units *i* < *j*.  Unit cells
+    are given for each coordinate set, or are **None**."""
+
+    coordsets, radius, unitcells, units, n_units = args
+    counts = zeros(len(coordsets), int)
+    keys = []
+    for f, coords in enumerate(coordsets):
+        unitcell = None if unitcells is None else unitcells[f]
+        cells = CellList(coords, unitcell=unitcell)
+        cells.search(radius)
+        if not cells.getCount():
+            continue
+        i, j = cells.getIndices().T
+        if units is not None:
+            i, j = units[i], units[j]
+            which = i != j
+            i, j = minimum(i[which], j[which]), maximum(i[which], j[which])
+            key = unique(i * n_units + j)
+        else:
+            key = i * n_units + j
+        counts[f] = len(key)
+        keys.append(key)
+    if keys:
+        return counts, concatenate(keys)
+    return counts, zeros(0, int)
+
+
+class ContactSeries(object):
+
+    """A class for contacts of atoms or residues in each frame of a
+    trajectory.  Contacts of each frame are identified using a cell list
+    neighbor search and are stored in compressed sparse row form, i.e.
+    indices of contacting pairs in each frame.  Contact frequencies and
+    lifetimes are calculated from these arrays without a loop over frames."""
+
+    def __init__(self, atoms, radius, coordsets=None, **kwargs):
+        """*atoms* must be an :class:`.Atomic` instance.  Contacts are
+        identified for all coordinate sets of *atoms*, or for *coordsets*
+        when given.
+
+        :arg radius: distance (Å) between atoms in contact
+        :type radius: float
+
+        :arg coordsets: coordinate sets of *atoms*, an array with shape
+            ``([n_frames,] n_atoms, 3)``, an :class:`.Ensemble`, or a
+            trajectory, whose frames are read in chunks
+        :type coordsets: :class:`numpy.ndarray`
+
+        :arg residues: when **True**, contacts between residues that have at
+            least one pair of atoms in contact are identified, default is
+            **False**
+        :type residues: bool
+
+        :arg unitcell: orthorhombic unitcell dimensions with shape ``(3,)``,
+            or triclinic unitcell dimensions and angles with shape ``(6,)``
+            or box vectors with shape ``(3, 3)``, or **True** to use unit
+            cells of frames when *coordsets* is a trajectory, e.g. of an NPT
+            simulation
+        :type unitcell: :class:`numpy.ndarray`, bool
+
+        :arg chunk: number of frames processed at once, default is 1000
+        :type chunk: int
+
+        :arg n_cpu: number of processes that handle chunks of frames,
+            default is 1
+        :type n_cpu: int"""
+
+        if not isinstance(atoms, Atomic):
+            raise TypeError('atoms must be an Atomic instance')
+        radius = float(radius)
+        if radius <= 0:
+            raise ValueError('radius must be a positive number')
+        chunk = kwargs.get('chunk', 1000)
+        if not isinstance(chunk, int):
+            raise TypeError('chunk must be an integer')
+        elif chunk < 1:
+            raise ValueError('chunk must be a positive integer')
+        n_cpu = kwargs.get('n_cpu', 1)
+        if not isinstance(n_cpu, int):
+            raise TypeError('n_cpu must be an integer')
+        elif n_cpu < 1:
+            raise ValueError('n_cpu must be equal to or greater than 1')
+
+        if kwargs.get('residues', False):
+            resindices = atoms._getResindices()
+            self._resindices, units = unique(resindices, return_inverse=True)
+            n_units = len(self._resindices)
+        else:
+            self._resindices = units = None
+            n_units = atoms.numAtoms()
+        if coordsets is None:
+            coordsets = atoms._getCoordsets()
+            if coordsets is None:
+                raise ValueError('coordinates of atoms are not set')
+        elif isinstance(coordsets, Atomic):
+            coordsets = coordsets._getCoordsets()
+
+        self._atoms = atoms
+        self._radius = radius
+        self._n_units = n_units
+
+        unitcell = kwargs.get('unitcell')
+
+        if unitcell is True:
+            if not hasattr(coordsets, 'nextCoordsets'):
+                raise TypeError('coordsets must be a trajectory to use unit '
+                                'cells of frames')
+            if not coordsets.hasUnitcell():
+                raise ValueError('trajectory does not contain unit cells')
+
+        def iterUnitcells():
+            if unitcell is True:
+                nfi = coordsets.nextIndex()
+                coordsets.reset()
+                try:
+                    while True:
+                        block = coordsets.nextCoordsets(chunk, unitcell=True)
+                        if block is None:
+                            break
+                        yield block
+                finally:
+                    coordsets.goto(nfi)
+            else:
+                for block in _iterCoordsets(coordsets, chunk):
+                    if block.ndim == 2:
+                        block = block.reshape((1,) + block.shape)
+                    if unitcell is None:
+                        yield block, None
+                    else:
+                        yield block, [unitcell] * len(block)
+
+        def iterBlocks():
+            for block, unitcells in iterUnitcells():
+                if block.shape[1] != atoms.numAtoms():
+                    raise ValueError('coordsets must have shape '
+                                     '([n_frames,] {0}, 3)'
+                                     .format(atoms.numAtoms()))
+                for first in range(0, len(block), chunk):
+                    yield (block[first:first + chunk], radius,
+                           None if unitcells is None else
+                           unitcells[first:first + chunk], units, n_units)
+
+        if n_cpu > 1:
+            import multiprocessing
+            from itertools import islice
+            n_cpu = min(multiprocessing.cpu_count(), n_cpu)
+            pool = multiprocessing.Pool(n_cpu)
+            try:
+                # submit a few blocks per process at a time, so that frames
+                # are not all read into memory before they are processed
+                blocks = iterBlocks()
+                results = []
+                while True:
+                    tasks = list(islice(blocks, 2 * n_cpu))
+                    if not tasks:
+                        break
+                    results.extend(pool.imap(_calcContactKeys, tasks))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [_calcContactKeys(args) for args in iterBlocks()]
+
+        counts = concatenate([counts for counts, keys in results] or
+                             [zeros(0, int)])
+        keys = concatenate([keys for counts, keys in results] or
+                           [zeros(0, int)])
+        keys, self._ids = unique(keys, return_inverse=True)
+        self._pairs = array([keys // n_units, keys % n_units]).T
+        self._indptr = zeros(len(counts) + 1, int)
+        self._indptr[1:] = cumsum(counts)
+
+    def __repr__(self):
+
+        return '<ContactSeries: {0} ({1} pairs in {2} frames)>'.format(
+            str(self._atoms), self.numPairs(), self.numFrames())
+
+    def __str__(self):
+
+        return 'ContactSeries ' + str(self._atoms)
+
+    def __len__(self):
+
+        return self.numFrames()
+
+    def getAtoms(self):
+        """Returns atoms provided at instantiation."""
+
+        return self._atoms
+
+    def getRadius(self):
+        """Returns contact radius."""
+
+        return self._radius
+
+    def numFrames(self):
+        """Returns number of frames."""
+
+        return len(self._indptr) - 1
+
+    def numPairs(self):
+        """Returns number of pairs that are in contact in at least one
+        frame."""
+
+        return len(self._pairs)
+
+    def getPairs(self):
+        """Returns pairs that are in contact in at least one frame, as an array
+        with shape ``(n_pairs, 2)``.  Pairs are positions of atoms in atoms,
+        or indices of residues when contacts are calculated for residues."""
+
+        pairs = self._pairs
+        if self._resindices is not None:
+            pairs = self._resindices[pairs]
+        return pairs.copy()
+
+    def getContacts(self, index):
+        """Returns indices of pairs, see :meth:`getPairs`, that are in contact
+        in frame at *index*."""
+
+        return self._ids[self._indptr[index]:self._indptr[index + 1]].copy()
+
+    def getCSR(self):
+        """Returns contacts in compressed sparse row form, i.e. *indptr* and
+        *indices* arrays, where indices of pairs in contact in frame ``i``
+        are ``indices[indptr[i]:indptr[i+1]]``."""
+
+        return self._indptr.copy(), self._ids.copy()
+
+    def getCounts(self):
+        """Returns number of frames in which each pair is in contact."""
+
+        return bincount(self._ids, minlength=self.numPairs())
+
+    def getFrequencies(self):
+        """Returns fraction of frames in which each pair is in contact."""
+
+        return self.getCounts() / float(max(1, self.numFrames()))
+
+    def getFrequencyMatrix(self):
+        """Returns a symmetric matrix of contact frequencies, with rows and
+        columns for atoms, or residues when contacts are calculated for
+        residues."""
+
+        n_units = self._n_units
+        matrix = zeros((n_units, n_units))
+        i, j = self._pairs.T
+        matrix[i, j] = matrix[j, i] = self.getFrequencies()
+        return matrix
+
+    def getEvents(self):
+        """Returns run length encoded contact events, i.e. arrays of pair
+        indices, first frames, and number of consecutive frames in which
+        pairs are in contact, ordered by pair and frame."""
+
+        ids = self._ids
+        frames = repeat(arange(self.numFrames()), diff(self._indptr))
+        order = lexsort((frames, ids))
+        ids, frames = ids[order], frames[order]
+        starts = flatnonzero((diff(ids) != 0) | (diff(frames) != 1)) + 1
+        starts = concatenate([[0], starts]) if len(ids) else starts
+        lengths = diff(concatenate([starts, [len(ids)]]))
+        return ids[starts], frames[starts], lengths
+
+    def getLifetimes(self):
+        """Returns average number of consecutive frames in which each pair is
+        in contact."""
+
+        ids, firsts, lengths = self.getEvents()
+        return (bincount(ids, lengths, self.numPairs()) /
+                bincount(ids, minlength=self.numPairs()))
@@ -3,10 +3,14 @@
 and measuring quantities."""
 
 from numpy import ndarray, power, sqrt, array, zeros, arccos
-from numpy import sign, tile, concatenate, pi, cross, subtract, var
+from numpy import sign, tile, concatenate, pi, cross, subtract, var, matmul
+from numpy import dot, around, repeat, arange, diff, triu_indices, maximum
+from numpy import fill_diagonal, arctan2, full, nan, unique
 
 from prody.atomic import Atomic, Residue, Atom
 from prody.utilities import importLA, checkCoords, getDistance
+from prody.kdtree import CellList
+from prody.kdtree.celllist import getCellVectors, isOrthorhombic
 from prody import LOGGER, PY2K
 
 if PY2K:
@@ -15,6 +19,7 @@ if PY2K:
 __all__ = ['buildDistMatrix', 'calcDistance',
            'calcCenter', 'calcGyradius', 'calcAngle',
            'calcDihedral', 'calcOmega', 'calcPhi', 'calcPsi',
+           'calcTorsions', 'getTorsionIndices', 'calcInternalCoords',
            'calcMSF', 'calcRMSF',
            'calcDeformVector',
            'buildADPMatrix', 'calcADPAxes', 'calcADPs',
@@ -24,8 +29,29 @@ RAD2DEG = 180 / pi
 
 DISTMAT_FORMATS = set(['mat', 'rcd', 'arr'])
 
-
-def buildDistMatrix(atoms1, atoms2=None, unitcell=None, format='mat'):
+# names of atoms forming torsions, with offsets of residues that contain them
+# and residue specific names of side chain atoms
+TORSIONS = {
+    'phi': ((-1, 'C'), (0, 'N'), (0, 'CA'), (0, 'C')),
+    'psi': ((0, 'N'), (0, 'CA'), (0, 'C'), (1, 'N')),
+    'omega': ((0, 'CA'), (0, 'C'), (1, 'N'), (1, 'CA')),
+    'chi1': ((0, 'N'), (0, 'CA'), (0, 'CB'),
+             (0, {'CYS': 'SG', 'SER': 'OG', 'THR': 'OG1', 'ILE': 'CG1',
+                  'VAL': 'CG1', 'GLY': None, 'ALA': None, None: 'CG'})),
+    'chi2': ((0, 'CA'), (0, 'CB'),
+             (0, {'ILE': 'CG1', None: 'CG'}),
+             (0, {'ASN': 'OD1', 'ASP': 'OD1', 'HIS': 'ND1', 'ILE': 'CD1',
+                  'LEU': 'CD1', 'MET': 'SD', 'PHE': 'CD1', 'TRP': 'CD1',
+                  'TYR': 'CD1', 'ARG': 'CD', 'GLN': 'CD', 'GLU': 'CD',
+                  'LYS': 'CD', 'PRO': 'CD', None: None})),
+}
+
+# number of distances calculated at once in a block of rows
+DISTMAT_BLOCK = 1 << 18
+
+
+def buildDistMatrix(atoms1, atoms2=None, unitcell=None, format='mat',
+                    **kwargs):
     """Returns distance matrix.  When *atoms2* is given, a distance matrix
     with shape ``(len(atoms1), len(atoms2))`` is built.  When *atoms2* is
     **None**, a symmetric matrix with shape ``(len(atoms1), len(atoms1))``
@@ -38,13 +64,32 @@ def buildDistMatrix(atoms1, atoms2=None, unitcell=None, format='mat'):
     :arg atoms2: atom or coordinate data
     :type atoms2: :class:`.Atomic`, :class:`numpy.ndarray`
 
-    :arg unitcell: orthorhombic unitcell dimension array with shape ``(3,)``
+    :arg unitcell: orthorhombic unitcell dimension array with shape ``(3,)``,
+        or triclinic unitcell dimensions and angles with shape ``(6,)`` or
+        box vectors with shape ``(3, 3)``
     :type unitcell: :class:`numpy.ndarray`
 
     :arg format: format of the resulting array, one of ``'mat'`` (matrix,
         default), ``'rcd'`` (arrays of row indices, column indices, and
         distances), or ``'arr'`` (only array of distances)
-    :type format: bool"""
+    :type format: bool
+
+    :arg cutoff: when given, only distances up to *cutoff* are calculated
+        using a :class:`.CellList`, other elements of the matrix are zero and
+        ``'rcd'`` and ``'arr'`` formats contain only pairs within *cutoff*
+    :type cutoff: float
+
+    :arg sparse: when **True** and *cutoff* is given, ``'mat'`` format is
+        returned as a :class:`scipy.sparse.csr_matrix`, default is **False**
+    :type sparse: bool
+
+    :arg dtype: data type of distances, e.g. ``'float32'`` to halve memory
+        usage of large matrices, default is :class:`float`
+    :type dtype: :class:`numpy.dtype`
+
+    :arg n_cpu: number of threads that calculate blocks of rows of the
+        matrix, default is 1
+    :type n_cpu: int"""
 
     if not isinstance(atoms1, ndarray):
         try:
@@ -63,35 +108,142 @@ def buildDistMatrix(atoms1, atoms2=None, unitcell=None, format='mat'):
                 raise TypeError('atoms2 must be Atomic instance or an array')
     if atoms1.shape[-1] != 3 or atoms2.shape[-1] != 3:
         raise ValueError('one and two must have shape ([M,]N,3)')
+    if format not in DISTMAT_FORMATS:
+        raise ValueError('format must be one of mat, rcd, or arr')
 
+    distance = getDistance
     if unitcell is not None:
         if not isinstance(unitcell, ndarray):
             raise TypeError('unitcell must be an array')
         elif unitcell.shape != (3,):
-            raise ValueError('unitcell.shape must be (3,)')
-
-    dist = zeros((len(atoms1), len(atoms2)))
-    if symmetric:
-        if format not in DISTMAT_FORMATS:
-            raise ValueError('format must be one of mat, rcd, or arr')
-        if format == 'mat':
-            for i, xyz in enumerate(atoms1[:-1]):
-                dist[i, i+1:] = dist[i+1:, i] = getDistance(xyz, atoms2[i+1:],
-                                                            unitcell)
+            if not isOrthorhombic(unitcell):
+                distance = _getTriclinicDistance(unitcell)
+            elif unitcell.shape == (6,):
+                unitcell = unitcell[:3]
+            else:
+                unitcell = getCellVectors(unitcell).diagonal()
+
+    dtype = kwargs.get('dtype', float)
+    n_cpu = kwargs.get('n_cpu', 1)
+    if not isinstance(n_cpu, int):
+        raise TypeError('n_cpu must be an integer')
+    elif n_cpu < 1:
+        raise ValueError('n_cpu must be equal to or greater than 1')
+
+    cutoff = kwargs.get('cutoff')
+    if cutoff is not None:
+        cells = CellList(atoms2, unitcell=unitcell)
+        if symmetric:
+            cells.search(float(cutoff))
+            if cells.getCount():
+                (row, col), dist = cells.getIndices().T, cells.getDistances()
+            else:
+                row = col = zeros(0, int)
+                dist = zeros(0)
         else:
-            dist = concatenate([getDistance(xyz, atoms2[i+1:], unitcell)
-                                for i, xyz in enumerate(atoms1)])
-            if format == 'rcd':
-                n_atoms = len(atoms1)
-                rc = array([(i, j) for i in range(n_atoms)
-                            for j in range(i + 1, n_atoms)])
-                row, col = rc.T
-                dist = (row, col, dist)
+            indptr, col, dist = cells.searchCenters(float(cutoff), atoms1)
+            row = repeat(arange(len(atoms1)), diff(indptr))
+        dist = dist.astype(dtype)
+        if format == 'mat':
+            shape = (len(atoms1), len(atoms2))
+            if symmetric:
+                row, col = concatenate([row, col]), concatenate([col, row])
+                dist = concatenate([dist, dist])
+            if kwargs.get('sparse', False):
+                try:
+                    from scipy.sparse import csr_matrix
+                except ImportError:
+                    raise ImportError('failed to import scipy.sparse, which '
+                                      'is required for sparse matrices')
+                return csr_matrix((dist, (row, col)), shape=shape)
+            matrix = zeros(shape, dtype)
+            matrix[row, col] = dist
+            return matrix
+        elif format == 'rcd':
+            return row, col, dist
+        return dist
+    elif kwargs.get('sparse', False):
+        raise ValueError('cutoff must be given for a sparse matrix')
+
+    n_rows, n_cols = len(atoms1), len(atoms2)
+    size = max(1, DISTMAT_BLOCK // max(1, n_cols))
+    starts = range(0, n_rows, size)
+
+    if unitcell is None:
+        # use Gram matrix of coordinates centered to limit round off errors
+        center = atoms1.mean(0) if n_rows else zeros(3)
+        atoms1 = atoms1 - center
+        atoms2 = atoms2 - center
+        sqnorms1 = power(atoms1, 2).sum(1)
+        sqnorms2 = power(atoms2, 2).sum(1)
+
+        def distances(first, last, start):
+            dist = dot(atoms1[first:last], atoms2[start:].T)
+            dist *= -2
+            dist += sqnorms1[first:last, None]
+            dist += sqnorms2[start:]
+            return sqrt(maximum(dist, 0, dist), dist)
+    else:
+        atoms1 = atoms1.astype(dtype, copy=False)
+        atoms2 = atoms2.astype(dtype, copy=False)
+
+        def distances(first, last, start):
+            return distance(atoms1[first:last, None], atoms2[None, start:],
+                            unitcell)
+
+    if symmetric and format != 'mat':
+        # upper triangle in row major order, as returned in 'rcd' format
+        def block(first):
+            last = min(first + size, n_rows)
+            upper = arange(n_cols - first) > arange(last - first)[:, None]
+            return distances(first, last, first)[upper]
+    else:
+        matrix = zeros((n_rows, n_cols), dtype)
 
+        def block(first):
+            last = min(first + size, n_rows)
+            if symmetric:
+                matrix[first:last, first:] = distances(first, last, first)
+                matrix[first:, first:last] = matrix[first:last, first:].T
+            else:
+                matrix[first:last] = distances(first, last, 0)
+
+    if n_cpu > 1 and len(starts) > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(n_cpu, len(starts)))
+        try:
+            blocks = pool.map(block, starts)
+        finally:
+            pool.close()
     else:
-        for i, xyz in enumerate(atoms1):
-            dist[i] = getDistance(xyz, atoms2, unitcell)
-    return dist
+        blocks = [block(first) for first in starts]
+
+    if symmetric and format != 'mat':
+        dist = concatenate(blocks) if blocks else zeros(0)
+        dist = dist.astype(dtype, copy=False)
+        if format == 'rcd':
+            row, col = triu_indices(n_rows, 1)
+            return row, col, dist
+        return dist
+    if symmetric:
+        fill_diagonal(matrix, 0)
+    return matrix
+
+
+def _getTriclinicDistance(unitcell):
+    """Returns a function that calculates minimum image distances in a
+    triclinic *unitcell*, with the same signature as :func:`.getDistance`."""
+
+    box = getCellVectors(unitcell)
+    inverse = importLA().inv(box)
+
+    def distance(coords1, coords2, unitcell=None):
+
+        frac = dot(coords1 - coords2, inverse)
+        frac -= around(frac)
+        return sqrt(power(dot(frac, box), 2).sum(axis=-1))
+
+    return distance
 
 
 def calcDistance(atoms1, atoms2, unitcell=None):
@@ -132,20 +284,60 @@ def calcDistance(atoms1, atoms2, unitcell=None):
     return getDistance(atoms1, atoms2, unitcell)
 
 
+def calcInternalCoords(atoms, indices, radian=False, **kwargs):
+    """Returns distances, angles or dihedral angles (in degrees) of many
+    tuples of atoms at once.  *indices* is an integer array with shape
+    ``(n_tuples, 2)`` for distances, ``(n_tuples, 3)`` for angles, or
+    ``(n_tuples, 4)`` for dihedral angles.  Values are returned in an array
+    with shape ``(n_tuples,)`` for a single coordinate set, or
+    ``(n_csets, n_tuples)`` for multiple coordinate sets.
+
+    :arg atoms: coordinate data, an :class:`.Atomic` (active coordinate set),
+        an array with shape ``([n_csets,]n_atoms,3)``, an :class:`.Ensemble`,
+        or a trajectory (reference coordinates, unless *frames* is **True**)
+    :type atoms: :class:`.Atomic`, :class:`numpy.ndarray`
+
+    :arg frames: calculate for all coordinate sets of an :class:`.Ensemble`
+        or all frames of a trajectory, default is **False**
+    :type frames: bool
+
+    :arg unitcell: orthorhombic unitcell dimension array with shape ``(3,)``,
+        used for distances
+    :type unitcell: :class:`numpy.ndarray`
+
+    :arg chunk: number of trajectory frames to read at once, default is 1000
+    :type chunk: int"""
+
+    try:
+        indices = array(indices, int)
+    except (TypeError, ValueError):
+        raise TypeError('indices must be an integer array')
+    if indices.ndim != 2 or indices.shape[1] not in (2, 3, 4):
+        raise ValueError('indices.shape must be (n_tuples, 2), (n_tuples, 3) '
+                         'or (n_tuples, 4)')
+    unitcell = kwargs.get('unitcell')
+    width = indices.shape[1]
+
+    def calculate(coords):
+        tuples = [coords[..., column, :] for column in indices.T]
+        if width == 2:
+            return getDistance(tuples[0], tuples[1], unitcell)
+        elif width == 3:
+            return getAngle(tuples[0], tuples[1], tuples[2], radian)
+        return getDihedral(tuples[0], tuples[1], tuples[2], tuples[3], radian)
+
+    return _calcCoordsets(calculate, atoms, kwargs.get('chunk', 1000),
+                          kwargs.get('frames', False))
+
+
 def calcAngle(atoms1, atoms2, atoms3, radian=False):
-    """Returns the angle between atoms in degrees."""
-
-    if not isinstance(atoms1, Atomic):
-        raise TypeError('atoms1 must be an Atomic instance')
-    if not isinstance(atoms2, Atomic):
-        raise TypeError('atoms2 must be an Atomic instance')
-    if not isinstance(atoms3, Atomic):
-        raise TypeError('atoms3 must be an Atomic instance')
-    if not atoms1.numAtoms() == atoms2.numAtoms() == atoms3.numAtoms():
-        raise ValueError('all arguments must have same number of atoms')
+    """Returns the angle between atoms in degrees.  Arguments may be
+    :class:`.Atomic` instances or arrays with shape ``([M,]N,3)``, e.g.
+    coordinate sets of *M* frames, in which case angles of all frames are
+    calculated at once."""
 
-    return getAngle(atoms1._getCoords(), atoms2._getCoords(),
-                    atoms3._getCoords(), radian)
+    coords = _getCoordArrays(atoms1, atoms2, atoms3)
+    return getAngle(coords[0], coords[1], coords[2], radian)
 
 
 def getAngle(coords1, coords2, coords3, radian):
@@ -162,39 +354,122 @@ def getAngle(coords1, coords2, coords3, radian):
 
 
 def calcDihedral(atoms1, atoms2, atoms3, atoms4, radian=False):
-    """Returns the dihedral angle between atoms in degrees."""
-
-    if not isinstance(atoms1, Atomic):
-        raise TypeError('atoms1 must be an Atomic instance')
-    if not isinstance(atoms2, Atomic):
-        raise TypeError('atoms2 must be an Atomic instance')
-    if not isinstance(atoms3, Atomic):
-        raise TypeError('atoms3 must be an Atomic instance')
-    if not isinstance(atoms4, Atomic):
-        raise TypeError('atoms4 must be an Atomic instance')
-    if not (atoms1.numAtoms() == atoms2.numAtoms() ==
-            atoms3.numAtoms() == atoms4.numAtoms()):
+    """Returns the dihedral angle between atoms in degrees.  Arguments may be
+    :class:`.Atomic` instances or arrays with shape ``([M,]N,3)``, e.g.
+    coordinate sets of *M* frames, in which case angles of all frames are
+    calculated at once."""
+
+    coords = _getCoordArrays(atoms1, atoms2, atoms3, atoms4)
+    return getDihedral(coords[0], coords[1], coords[2], coords[3], radian)
+
+
+def _getCoordArrays(*atoms):
+    """Returns coordinate arrays of *atoms*, which must have the same number
+    of atoms."""
+
+    coords = []
+    for i, item in enumerate(atoms):
+        if not isinstance(item, ndarray):
+            try:
+                item = item._getCoords()
+            except AttributeError:
+                raise TypeError('atoms{0} must be an Atomic instance or an '
+                                'array'.format(i + 1))
+            if item is None:
+                raise ValueError('coordinates of atoms{0} are not set'
+                                 .format(i + 1))
+        if item.shape[-1] != 3:
+            raise ValueError('atoms{0} must have shape ([M,]N,3)'
+                             .format(i + 1))
+        coords.append(item)
+    if len(set(item.shape[-2:-1] for item in coords)) > 1:
         raise ValueError('all arguments must have same number of atoms')
+    return coords
+
+
+def _iterCoordsets(atoms, chunk=1000):
+    """Yield coordinate data of *atoms*.  Active coordinate set of an
+    :class:`.Atomic` and arrays are yielded as they are, all coordinate sets
+    of an :class:`.Ensemble` are yielded at once, and frames of a trajectory
+    are read and yielded in blocks of *chunk* frames."""
+
+    if not isinstance(chunk, int):
+        raise TypeError('chunk must be an integer')
+    elif chunk < 1:
+        raise ValueError('chunk must be a positive integer')
+
+    if isinstance(atoms, ndarray):
+        coords = atoms
+    elif isinstance(atoms, Atomic):
+        coords = atoms._getCoords()
+        if coords is None:
+            raise ValueError('coordinates of atoms are not set')
+    elif hasattr(atoms, 'nextCoordsets'):
+        nfi = atoms.nextIndex()
+        atoms.reset()
+        try:
+            while True:
+                coords = atoms.nextCoordsets(chunk)
+                if coords is None:
+                    break
+                yield coords
+        finally:
+            atoms.goto(nfi)
+        return
+    else:
+        try:
+            coords = atoms.getCoordsets()
+        except AttributeError:
+            try:
+                coords = atoms.getCoords()
+            except AttributeError:
+                raise TypeError('atoms must be an Atomic instance, an array, '
+                                'an Ensemble, or a trajectory')
+    if coords.ndim not in (2, 3) or coords.shape[-1] != 3:
+        raise ValueError('coords must have shape ([n_csets,]n_atoms,3)')
+    yield coords
+
+
+def _calcCoordsets(func, atoms, chunk=1000, frames=False):
+    """Returns values calculated by *func* for coordinate data of *atoms*,
+    concatenated for blocks of trajectory frames.  Unless *frames* is
+    **True**, reference coordinates of an :class:`.Ensemble` or a trajectory
+    are used."""
 
-    return getDihedral(atoms1._getCoords(), atoms2._getCoords(),
-                       atoms3._getCoords(), atoms4._getCoords(), radian)
+    if not frames and not isinstance(atoms, (ndarray, Atomic)):
+        try:
+            coords = atoms._getCoords()
+        except AttributeError:
+            try:
+                coords = atoms.getCoords()
+            except AttributeError:
+                raise TypeError('atoms must be an Atomic instance, an array, '
+                                'an Ensemble, or a trajectory')
+        if coords is None:
+            raise ValueError('coordinates of atoms are not set')
+        return func(coords)
+
+    values = [func(coords) for coords in _iterCoordsets(atoms, chunk)]
+    if len(values) == 1:
+        return values[0]
+    elif not values:
+        return zeros(0)
+    return concatenate(values)
 
 
 def getDihedral(coords1, coords2, coords3, coords4, radian=False):
-    """Returns the dihedral angle in degrees."""
+    """Returns the dihedral angle in degrees.  Coordinate arrays may have
+    any shape ``(..., 3)``, in which case an array of angles is returned."""
 
     a1 = coords2 - coords1
     a2 = coords3 - coords2
     a3 = coords4 - coords3
 
     v1 = cross(a1, a2)
-    v1 = v1 / (v1 * v1).sum(-1)**0.5
     v2 = cross(a2, a3)
-    v2 = v2 / (v2 * v2).sum(-1)**0.5
-    porm = sign((v1 * a3).sum(-1))
-    rad = arccos((v1*v2).sum(-1) / ((v1**2).sum(-1) * (v2**2).sum(-1))**0.5)
-    if not porm == 0:
-        rad = rad * porm
+    x = (v1 * v2).sum(-1)
+    y = (a1 * v2).sum(-1) * sqrt((a2 * a2).sum(-1))
+    rad = arctan2(y, x)
     if radian:
         return rad
     else:
@@ -331,23 +606,175 @@ def getPsiAtoms(residue, dist=4.1):
     return N, CA, C, _N
 
 
-def calcCenter(atoms, weights=None):
-    """Returns geometric center of *atoms*.  If *weights* is given it must
-    be a flat array with length equal to number of atoms.  Mass center of
-    atoms can be calculated by setting weights equal to atom masses, i.e.
-    ``weights=atoms.getMasses()``."""
+def getTorsionIndices(atoms, angles=('phi', 'psi', 'omega'), dist=4.1):
+    """Returns an array of indices of atoms that form torsion *angles* of
+    amino acid residues in *atoms*, with shape ``(n_residues, n_angles, 4)``.
+    Residues are those that have a Cα atom, in the order they appear in
+    *atoms*.  Indices are positions of atoms in *atoms* and are -1 for
+    undefined angles, e.g. φ of the first residue of a chain.  Neighboring
+    residues are considered connected if the distance between their Cα atoms
+    is shorter than *dist*, set it to **None** to skip this check.  Indices
+    can be reused for calculating angles of many frames, see
+    :func:`calcTorsions`.
 
-    try:
+    :arg angles: names of torsion angles, ``'phi'``, ``'psi'``, ``'omega'``,
+        ``'chi1'``, or ``'chi2'``
+    :type angles: list"""
+
+    if not isinstance(atoms, Atomic):
+        raise TypeError('atoms must be an Atomic instance')
+    if isinstance(angles, str):
+        angles = [angles]
+    for angle in angles:
+        if angle not in TORSIONS:
+            raise ValueError('{0} is not a valid torsion angle, valid angles '
+                             'are {1}'.format(repr(angle),
+                                              ', '.join(sorted(TORSIONS))))
+
+    names = atoms._getNames()
+    if names is None:
+        raise ValueError('atom names are not set')
+    resindices = atoms._getResindices()
+    isaa = atoms._getFlags('aminoacid')
+    resnames = atoms._getResnames()
+    n_res = resindices.max() + 3 if len(resindices) else 3
+    positions = {}
+
+    def locate(name):
+        """Returns positions of atoms with *name* indexed by residue index,
+        shifted by one so that neighbors of terminal residues are -1."""
+
+        try:
+            return positions[name]
+        except KeyError:
+            which = (isaa & (names == name)).nonzero()[0][::-1]
+            pos = full(n_res, -1, int)
+            # first atom with the given name in a residue is used
+            pos[resindices[which] + 1] = which
+            positions[name] = pos
+            return pos
+
+    cas = locate('CA')
+    residues = cas[1:-1]
+    residues = residues[residues > -1]
+    residues.sort()
+    rindex = resindices[residues] + 1
+    rnames = resnames[residues]
+    if dist:
         coords = atoms._getCoords()
-    except AttributeError:
+        connected = []
+        for offset in (-1, 1):
+            other = cas[rindex + offset]
+            torf = other > -1
+            torf[torf] = getDistance(coords[residues[torf]],
+                                     coords[other[torf]]) <= dist
+            connected.append(torf)
+    else:
+        connected = [cas[rindex - 1] > -1, cas[rindex + 1] > -1]
+
+    indices = full((len(residues), len(angles), 4), -1, int)
+    for a, angle in enumerate(angles):
+        quads = indices[:, a]
+        for i, (offset, name) in enumerate(TORSIONS[angle]):
+            if isinstance(name, dict):
+                default = name[None]
+                column = full(len(residues), -1, int)
+                for resname in unique(rnames):
+                    which = rnames == resname
+                    resname = name.get(resname, default)
+                    if resname is not None:
+                        column[which] = locate(resname)[rindex[which]]
+            else:
+                column = locate(name)[rindex + offset]
+            quads[:, i] = column
+        offsets = set(offset for offset, name in TORSIONS[angle])
+        valid = (quads > -1).all(1)
+        if -1 in offsets:
+            valid &= connected[0]
+        if 1 in offsets:
+            valid &= connected[1]
+        quads[~valid] = -1
+    return indices
+
+
+def calcTorsions(atoms, angles=('phi', 'psi', 'omega'), coordsets=None,
+                 radian=False, **kwargs):
+    """Returns torsion *angles* of amino acid residues in *atoms* in degrees,
+    as an array with shape ``(n_residues, n_angles)``, or with shape
+    ``(n_frames, n_residues, n_angles)`` when multiple coordinate sets are
+    given.  Atoms forming the angles are determined once using
+    :func:`getTorsionIndices` and angles of all frames are calculated at
+    once.  Undefined angles are **nan**.
+
+    :arg angles: names of torsion angles, ``'phi'``, ``'psi'``, ``'omega'``,
+        ``'chi1'``, or ``'chi2'``
+    :type angles: list
+
+    :arg coordsets: coordinates of *atoms*, an array with shape
+        ``([n_frames,] n_atoms, 3)``, e.g. a chunk of trajectory frames, or
+        an object with :meth:`getCoordsets` method, e.g. an :class:`.Ensemble`
+        or an :class:`.AtomGroup`, default is active coordinates of *atoms*
+    :type coordsets: :class:`numpy.ndarray`
+
+    :arg dist: see :func:`getTorsionIndices`, default is 4.1
+    :type dist: float
+
+    :arg indices: indices returned by :func:`getTorsionIndices` for
+        the same *angles*, which saves determining them repeatedly
+    :type indices: :class:`numpy.ndarray`"""
+
+    if isinstance(angles, str):
+        angles = [angles]
+    indices = kwargs.get('indices')
+    if indices is None:
+        indices = getTorsionIndices(atoms, angles, kwargs.get('dist', 4.1))
+    elif indices.ndim != 3 or indices.shape[1:] != (len(angles), 4):
+        raise ValueError('indices.shape must be (n_residues, {0}, 4)'
+                         .format(len(angles)))
+
+    if coordsets is None:
+        coordsets = atoms._getCoords()
+        if coordsets is None:
+            raise ValueError('coordinates of atoms are not set')
+    elif not isinstance(coordsets, ndarray):
         try:
-            coords = atoms.getCoords()
+            coordsets = coordsets.getCoordsets()
         except AttributeError:
-            coords = atoms
-            try:
-                checkCoords(coords, csets=True, dtype=None, name='atoms')
-            except TypeError:
-                raise TypeError('atoms must be an Atomic instance')
+            raise TypeError('coordsets must be an array or must have '
+                            'getCoordsets method')
+    if coordsets.shape[-2:] != (atoms.numAtoms(), 3):
+        raise ValueError('coordsets.shape must be ([n_frames,] {0}, 3)'
+                         .format(atoms.numAtoms()))
+
+    valid = indices[..., 0] > -1
+    quads = coordsets[..., indices * valid[..., None], :]
+    rad = getDihedral(quads[..., 0, :], quads[..., 1, :], quads[..., 2, :],
+                      quads[..., 3, :], True)
+    rad[..., ~valid] = nan
+    if radian:
+        return rad
+    else:
+        return rad * RAD2DEG
+
+
+def calcCenter(atoms, weights=None, **kwargs):
+    """Returns geometric center of *atoms*.  If *weights* is given it must
+    be a flat array with length equal to number of atoms.  Mass center of
+    atoms can be calculated by setting weights equal to atom masses, i.e.
+    ``weights=atoms.getMasses()``.  Centers of multiple coordinate sets are
+    returned in an array with shape ``(n_csets, 3)``.
+
+    :arg atoms: coordinate data, an :class:`.Atomic` (active coordinate set),
+        an array with shape ``([n_csets,]n_atoms,3)``, an :class:`.Ensemble`,
+        or a trajectory (reference coordinates, unless *frames* is **True**)
+    :type atoms: :class:`.Atomic`, :class:`numpy.ndarray`
+
+    :arg frames: calculate for all coordinate sets of an :class:`.Ensemble`
+        or all frames of a trajectory, default is **False**
+    :type frames: bool
+
+    :arg chunk: number of trajectory frames to read at once, default is 1000
+    :type chunk: int"""
 
     if weights is not None:
         try:
@@ -355,16 +782,20 @@ def calcCenter(atoms, weights=None):
         except AttributeError:
             raise TypeError('weights must be a numpy array')
         else:
-            if shape[0] != coords.shape[-2]:
-                raise ValueError('weights.shape[0] must be equal to number of '
-                                 'atoms')
             if ndim != 2:
                 try:
                     weights = weights.reshape((shape[0], 1))
                 except ValueError:
                     raise ValueError('weights.shape must be a (n_atoms, 1)')
 
-    return getCenter(coords, weights)
+    def calculate(coords):
+        if weights is not None and len(weights) != coords.shape[-2]:
+            raise ValueError('weights.shape[0] must be equal to number of '
+                             'atoms')
+        return getCenter(coords, weights)
+
+    return _calcCoordsets(calculate, atoms, kwargs.get('chunk', 1000),
+                          kwargs.get('frames', False))
 
 
 def getCenter(coords, weights=None):
@@ -468,50 +899,50 @@ def pickCentralConf(ens, weights=None):
         return atoms
 
 
-def calcGyradius(atoms, weights=None):
-    """Calculate radius of gyration of *atoms*."""
+def calcGyradius(atoms, weights=None, **kwargs):
+    """Calculate radius of gyration of *atoms*.  Radii of multiple coordinate
+    sets are returned in an array.
+
+    :arg atoms: coordinate data, an :class:`.Atomic` (active coordinate set),
+        an array with shape ``([n_csets,]n_atoms,3)``, an :class:`.Ensemble`,
+        or a trajectory (reference coordinates, unless *frames* is **True**)
+    :type atoms: :class:`.Atomic`, :class:`numpy.ndarray`
+
+    :arg frames: calculate for all coordinate sets of an :class:`.Ensemble`
+        or all frames of a trajectory, default is **False**
+    :type frames: bool
+
+    :arg weights: atomic weights, e.g. masses
+    :type weights: :class:`numpy.ndarray`
+
+    :arg chunk: number of trajectory frames to read at once, default is 1000
+    :type chunk: int"""
 
-    if not isinstance(atoms, ndarray):
-        try:
-            coords = atoms._getCoords()
-        except AttributeError:
-            raise TypeError('atoms must have atomic coordinate data')
-    else:
-        coords = atoms
-        if not coords.ndim in (2, 3):
-            raise ValueError('coords may be a 2 or 3 dimentional array')
-        elif coords.shape[-1] != 3:
-            raise ValueError('coords must have shape ([n_csets,]n_atoms,3)')
     if weights is not None:
-        weights = weights.flatten()
-        if len(weights) != coords.shape[-2]:
+        weights = array(weights, float).flatten()
+
+    def calculate(coords):
+        if weights is not None and len(weights) != coords.shape[-2]:
             raise ValueError('length of weights must match number of atoms')
-        wsum = weights.sum()
-    else:
-        wsum = coords.shape[-2]
+        return getGyradius(coords, weights)
 
-    if coords.ndim == 2:
-        if weights is None:
-            com = coords.mean(0)
-            d2sum = ((coords - com)**2).sum()
-        else:
+    return _calcCoordsets(calculate, atoms, kwargs.get('chunk', 1000),
+                          kwargs.get('frames', False))
 
-            com = (coords * weights).mean(0) / wsum
-            d2sum = (((coords - com)**2).sum(1) * weights).sum()
-    else:
-        rgyr = []
-        for coords in coords:
-            if weights is None:
-                com = coords.mean(0)
-                d2sum = ((coords - com)**2).sum()
-                rgyr.append(d2sum)
-            else:
 
-                com = (coords * weights).mean(0) / wsum
-                d2sum = (((coords - com)**2).sum(1) * weights).sum()
-                rgyr.append(d2sum)
-        d2sum = array(rgyr)
-    return (d2sum / wsum) ** 0.5
+def getGyradius(coords, weights=None):
+    """Returns radius of gyration of coordinates with shape
+    ``([n_csets,]n_atoms,3)``."""
+
+    if weights is None:
+        com = coords.mean(-2)
+        d2sum = ((coords - com[..., None, :]) ** 2).sum(-1).mean(-1)
+    else:
+        wsum = weights.sum()
+        com = (coords * weights[:, None]).sum(-2) / wsum
+        d2sum = (((coords - com[..., None, :]) ** 2).sum(-1) *
+                 weights).sum(-1) / wsum
+    return d2sum ** 0.5
 
 _MSF_DOCSTRING = """  *coordsets* may be an
     instance of :class:`.Ensemble`, :class:`.TrajBase`, or :class:`.Atomic`.
@@ -519,17 +950,38 @@ _MSF_DOCSTRING = """  *coordsets* may be an
     after they are superposed. For other ProDy objects, coordinate sets should
     be aligned prior to MSF calculation.
 
-    Note that using trajectory files that store 32-bit coordinate will result
-    in lower precision in calculations.  Over 10,000 frames this may result
-    in up to 5% difference from the values calculated using 64-bit arrays.
-    To ensure higher-precision calculations for :class:`.DCDFile` instances,
-    you may use *astype* argument, i.e. ``astype=float``, to auto recast
-    coordinate data to double-precision (64-bit) floating-point format."""
+    Trajectory frames are read in blocks of *chunk* frames (default is 1000),
+    superposed onto the trajectory reference coordinates in a single batched
+    operation, and first and second moments of each block are evaluated in
+    double-precision and merged pairwise.  This keeps the calculation accurate
+    for trajectory files that store 32-bit coordinates.  Blocks may be
+    processed by multiple processes by passing ``n_cpu=2`` or more.
+
+    When *window* is given, coordinate sets are also split into consecutive
+    windows of *window* frames and MSF of each window is returned in an array
+    with shape ``(n_windows, n_atoms)`` as the second item of a tuple.  This
+    can be used to monitor convergence along a trajectory.
+
+    :arg chunk: number of trajectory frames to read and superpose at once
+    :type chunk: int
 
+    :arg window: number of frames in each window
+    :type window: int
 
-def calcMSF(coordsets):
+    :arg n_cpu: number of processes for trajectory calculations
+    :type n_cpu: int"""
+
+
+def calcMSF(coordsets, **kwargs):
     """Calculate mean square fluctuation(s) (MSF)."""
 
+    window = kwargs.pop('window', None)
+    if window is not None:
+        if not isinstance(window, int):
+            raise TypeError('window must be an integer')
+        elif window < 1:
+            raise ValueError('window must be a positive integer')
+
     try:
         ncsets = coordsets.numFrames()
     except AttributeError:
@@ -545,36 +997,123 @@ def calcMSF(coordsets):
         if ndim != 3 or shape[0] == 1:
             raise ValueError('coordsets must contain multiple sets')
         msf = var(coordsets, 0).sum(1)
+        if window is not None:
+            windows = array([var(coordsets[i:i+window], 0).sum(1)
+                             for i in range(0, shape[0], window)])
     else:
+        chunk = kwargs.pop('chunk', 1000)
+        n_cpu = kwargs.pop('n_cpu', 1)
+        if not isinstance(chunk, int):
+            raise TypeError('chunk must be an integer')
+        elif chunk < 1:
+            raise ValueError('chunk must be a positive integer')
+        if not isinstance(n_cpu, int):
+            raise TypeError('n_cpu must be an integer')
+        elif n_cpu < 1:
+            raise ValueError('n_cpu must be equal to or greater than 1')
+
         nfi = coordsets.nextIndex()
-        natoms = coordsets.numSelected()
-        total = zeros((natoms, 3))
-        sqsum = zeros((natoms, 3))
+        reference = coordsets._getCoords()
+        weights = coordsets._getWeights()
+        coordsets.reset()
+
+        windows = None if window is None else []
+
+        size = ncsets if window is None else window
+        pool = None
+        if n_cpu > 1:
+            import multiprocessing
+            pool = multiprocessing.Pool(min(multiprocessing.cpu_count(),
+                                            n_cpu))
+            mapper = pool.map
+        else:
+            mapper = lambda func, args: [func(arg) for arg in args]
 
         LOGGER.progress('Evaluating {0} frames from {1}:'
                         .format(ncsets, str(coordsets)), ncsets,
                         '_prody_calcMSF')
-        ncsets = 0
-        coordsets.reset()
-        for frame in coordsets:
-            frame.superpose()
-            coords = frame._getCoords()
-            total += coords
-            sqsum += coords ** 2
-            ncsets += 1
-            LOGGER.update(ncsets, label='_prody_calcMSF')
+        total = current = None
+        filled = 0
+        try:
+            while True:
+                blocks = []
+                for i in range(n_cpu):
+                    block = coordsets.nextCoordsets(min(chunk,
+                                                        size - filled))
+                    if block is None:
+                        break
+                    blocks.append((block, reference, weights))
+                    filled += len(block)
+                    if filled == size:
+                        break
+                if not blocks:
+                    break
+                for moments in mapper(_calcMoments, blocks):
+                    current = _mergeMoments(current, moments)
+                if filled == size:
+                    total = _mergeMoments(total, current)
+                    if windows is not None:
+                        windows.append((current[2] / current[0]).sum(1))
+                    current = None
+                    filled = 0
+                LOGGER.update(coordsets.nextIndex(), label='_prody_calcMSF')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
         LOGGER.finish()
-        msf = (sqsum/ncsets - (total/ncsets)**2).sum(1)
+        if current is not None:
+            total = _mergeMoments(total, current)
+            if windows is not None:
+                windows.append((current[2] / current[0]).sum(1))
+        msf = (total[2] / total[0]).sum(1)
+        if windows is not None:
+            windows = array(windows)
         coordsets.goto(nfi)
-    return msf
+    if window is None:
+        return msf
+    return msf, windows
 
 calcMSF.__doc__ += _MSF_DOCSTRING
 
 
-def calcRMSF(coordsets):
+def _calcMoments(args):
+    """Returns number, mean, and sum of squared deviations of coordinate sets
+    after superposing them onto the reference coordinates."""
+
+    coords, reference, weights = args
+    coords = coords.astype(float)
+    if reference is not None:
+        from .transform import getTransformations
+        rotations, translations = getTransformations(coords, reference,
+                                                     weights)
+        coords = matmul(coords, rotations.transpose(0, 2, 1))
+        coords += translations[:, None]
+    mean = coords.mean(0)
+    return len(coords), mean, ((coords - mean) ** 2).sum(0)
+
+
+def _mergeMoments(first, second):
+    """Returns moments of two sets of samples merged using pairwise update
+    formula of Chan et al."""
+
+    if first is None:
+        return second
+    n_a, mean_a, m2_a = first
+    n_b, mean_b, m2_b = second
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    return (n, mean_a + delta * (float(n_b) / n),
+            m2_a + m2_b + delta ** 2 * (float(n_a) * n_b / n))
+
+
+def calcRMSF(coordsets, **kwargs):
     """Returns root mean square fluctuation(s) (RMSF)."""
 
-    return calcMSF(coordsets) ** 0.5
+    msf = calcMSF(coordsets, **kwargs)
+    if isinstance(msf, tuple):
+        return msf[0] ** 0.5, msf[1] ** 0.5
+    return msf ** 0.5
 
 calcRMSF.__doc__ += _MSF_DOCSTRING
 
@@ -4,16 +4,18 @@
 import numpy as np
 
 from prody import LOGGER
-from prody.atomic import AtomPointer
+from prody.atomic import Atomic, AtomPointer
 from prody.utilities import importLA
+from prody.kdtree.celllist import getCellVectors
 
-from .measure import calcCenter
+from .measure import calcCenter, _iterCoordsets
 
 linalg = importLA()
 
 __all__ = ['Transformation', 'applyTransformation', 'alignCoordsets',
            'calcRMSD', 'calcTransformation', 'superpose',
-           'moveAtoms', 'wrapAtoms',
+           'calcTransformations', 'applyTransformations',
+           'moveAtoms', 'wrapAtoms', 'iterWrapped',
            'printRMSD']
 
 
@@ -157,6 +159,161 @@ def getTransformation(mob, tar, weights=None):
     return rotation, tar_com - np.dot(mob_com, rotation)
 
 
+def getTransformations(mobs, tar, weights=None):
+    """Returns rotation matrices with shape ``(n_sets, 3, 3)`` and translation
+    vectors with shape ``(n_sets, 3)`` that superpose each coordinate set in
+    *mobs* onto *tar*.  All singular value decompositions are evaluated in a
+    single batched call."""
+
+    if weights is None:
+        mob_com = mobs.mean(1)
+        tar_com = tar.mean(0)
+        mobs = mobs - mob_com[:, None]
+        tar = tar - tar_com
+        matrix = np.einsum('kni,nj->kij', mobs, tar)
+    else:
+        weights_sum = weights.sum()
+        weights_dot = np.dot(weights.T, weights)
+        mob_com = (mobs * weights).sum(1) / weights_sum
+        tar_com = (tar * weights).sum(0) / weights_sum
+        mobs = mobs - mob_com[:, None]
+        tar = tar - tar_com
+        matrix = np.einsum('kni,nj->kij', mobs * weights,
+                           tar * weights) / weights_dot
+
+    U, s, Vh = np.linalg.svd(matrix)
+    rotations = Vh.transpose(0, 2, 1)
+    rotations[:, :, 2] *= np.sign(np.linalg.det(matrix))[:, None]
+    rotations = np.matmul(rotations, U.transpose(0, 2, 1))
+
+    return rotations, tar_com - np.einsum('kj,kij->ki', mob_com, rotations)
+
+
+def _getMobiles(mobiles):
+    """Returns coordinate sets of *mobiles*, which may be an array with shape
+    ``(n_sets, n_atoms, 3)``, an object with coordinate sets, or a list of
+    arrays or :class:`.Atomic` instances with the same number of atoms."""
+
+    if isinstance(mobiles, np.ndarray):
+        mobs = mobiles
+    elif isinstance(mobiles, (list, tuple)):
+        mobs = []
+        for mobile in mobiles:
+            if not isinstance(mobile, np.ndarray):
+                try:
+                    mobile = mobile._getCoords()
+                except AttributeError:
+                    raise TypeError('mobiles must be numpy arrays or objects '
+                                    'with getCoords method')
+            mobs.append(mobile)
+        try:
+            mobs = np.array(mobs)
+        except ValueError:
+            raise ValueError('mobiles must have same number of atoms')
+    else:
+        try:
+            mobs = mobiles._getCoordsets()
+        except AttributeError:
+            raise TypeError('mobiles must be a numpy array, a list, or an '
+                            'object with getCoordsets method')
+    if mobs is None:
+        raise ValueError('mobiles do not have coordinate data')
+    if mobs.ndim == 2:
+        mobs = mobs.reshape((1,) + mobs.shape)
+    if mobs.ndim != 3 or mobs.shape[-1] != 3:
+        raise ValueError('mobiles must have shape (n_sets, n_atoms, 3)')
+    return mobs
+
+
+def calcTransformations(mobiles, target, weights=None):
+    """Returns transformation matrices with shape ``(n_sets, 4, 4)`` that
+    minimize the weighted RMSD between each of *mobiles* and *target*, and
+    RMSD values after superposition.  All transformations are calculated at
+    once, see also :func:`calcTransformation` and :func:`applyTransformations`.
+
+    :arg mobiles: coordinate sets with shape ``(n_sets, n_atoms, 3)``, an
+        :class:`.Atomic` or :class:`.Ensemble` instance, whose coordinate sets
+        are used, or a list of coordinate arrays or :class:`.Atomic` instances
+    :type mobiles: :class:`numpy.ndarray`, :class:`.Atomic`, list
+
+    :arg target: target coordinates with shape ``(n_atoms, 3)``
+    :type target: :class:`numpy.ndarray`, :class:`.Atomic`
+
+    :arg weights: atomic weights with shape ``(n_atoms, 1)``
+    :type weights: :class:`numpy.ndarray`"""
+
+    mobs = _getMobiles(mobiles)
+    if not isinstance(target, np.ndarray):
+        try:
+            tar = target._getCoords()
+        except AttributeError:
+            raise TypeError('target must be a numpy array or an object '
+                            'with getCoords method')
+    else:
+        tar = target
+
+    if mobs.shape[1:] != tar.shape:
+        raise ValueError('mobiles and target coordinate arrays '
+                         'must have same number of atoms')
+
+    if weights is not None:
+        if not isinstance(weights, np.ndarray):
+            raise TypeError('weights must be an ndarray instance')
+        elif weights.shape != (tar.shape[0], 1):
+            raise ValueError('weights must have shape (n_atoms, 1)')
+
+    rotations, translations = getTransformations(mobs, tar, weights)
+    matrices = np.zeros((len(mobs), 4, 4))
+    matrices[:, :3, :3] = rotations
+    matrices[:, :3, 3] = translations
+    matrices[:, 3, 3] = 1
+
+    moved = np.matmul(mobs, rotations.transpose(0, 2, 1))
+    moved += translations[:, None]
+    return matrices, getRMSD(tar, moved, weights)
+
+
+def applyTransformations(matrices, coordsets):
+    """Returns *coordsets* after applying transformation *matrices*, with
+    shape ``(n_sets, 4, 4)``, to coordinate sets in place.  If *coordsets*
+    is an array with shape ``(n_sets, n_atoms, 3)``, it is changed in place.
+    If *coordsets* is an :class:`.Atomic` instance, transformations are
+    applied to all coordinate sets of its :class:`.AtomGroup`, in a single
+    broadcasted matrix multiplication."""
+
+    matrices = np.asarray(matrices)
+    if matrices.ndim == 2:
+        matrices = matrices.reshape((1, 4, 4))
+    if matrices.ndim != 3 or matrices.shape[1:] != (4, 4):
+        raise ValueError('matrices must have shape (n_sets, 4, 4)')
+
+    ag = None
+    if isinstance(coordsets, np.ndarray):
+        coords = coordsets
+    else:
+        try:
+            ag = coordsets.getAtomGroup()
+        except AttributeError:
+            ag = coordsets
+        try:
+            coords = ag._getCoordsets()
+        except AttributeError:
+            raise TypeError('coordsets must be a numpy array or an Atomic '
+                            'instance')
+        if coords is None:
+            raise ValueError('coordsets do not have coordinate data')
+    if coords.ndim != 3 or coords.shape[-1] != 3:
+        raise ValueError('coordsets must have shape (n_sets, n_atoms, 3)')
+    if len(matrices) != len(coords):
+        raise ValueError('number of matrices and coordinate sets must match')
+
+    coords[:] = np.matmul(coords, matrices[:, :3, :3].transpose(0, 2, 1))
+    coords += matrices[:, None, :3, 3]
+    if ag is not None:
+        ag._setTimeStamp()
+    return coordsets
+
+
 def applyTransformation(transformation, atoms):
     """Returns *atoms* after applying *transformation*.  If *atoms*
     is a :class:`.Atomic` instance, it will be returned after
@@ -408,28 +565,10 @@ def calcRMSD(reference, target=None, weights=None):
 
 def getRMSD(ref, tar, weights=None):
     if weights is None:
-        divByN = 1.0 / ref.shape[0]
-        if tar.ndim == 2:
-            return np.sqrt(((ref-tar) ** 2).sum() * divByN)
-        else:
-            rmsd = np.zeros(len(tar))
-            for i, t in enumerate(tar):
-                rmsd[i] = ((ref-t) ** 2).sum()
-            return np.sqrt(rmsd * divByN)
+        return np.sqrt(((ref - tar) ** 2).sum((-2, -1)) / ref.shape[0])
     else:
-        if tar.ndim == 2:
-            return np.sqrt((((ref-tar) ** 2) * weights).sum() *
-                           (1. / weights.sum()))
-        else:
-            rmsd = np.zeros(len(tar))
-            if weights.ndim == 2:
-                for i, t in enumerate(tar):
-                    rmsd[i] = (((ref-t) ** 2) * weights).sum()
-                return np.sqrt(rmsd * (1. / weights.sum()))
-            else:
-                for i, t in enumerate(tar):
-                    rmsd[i] = (((ref-t) ** 2) * weights[i]).sum()
-                return np.sqrt(rmsd / weights.sum(1).flatten())
+        return np.sqrt((((ref - tar) ** 2) * weights).sum((-2, -1)) /
+                       weights.sum((-2, -1)))
 
 
 def printRMSD(reference, target=None, weights=None, log=True, msg=None):
@@ -473,42 +612,46 @@ def alignCoordsets(atoms, weights=None):
                            'alignment was not performed.'.format(str(atoms)))
             return
 
-    try:
-        ag = atoms.getAtomGroup()
-    except AttributeError:
-        ag = atoms
-    agacsi = ag.getACSIndex()
-
-    tar = atoms._getCoords()
-    for i in range(n_csets):
-        if i == acsi:
-            continue
-        atoms.setACSIndex(i)
-        ag.setACSIndex(i)
-        calcTransformation(atoms, tar, weights).apply(ag)
-    atoms.setACSIndex(acsi)
-    ag.setACSIndex(agacsi)
+    matrices = calcTransformations(atoms, atoms._getCoords(), weights)[0]
+    matrices[acsi] = np.eye(4)
+    applyTransformations(matrices, atoms)
     return atoms
 
 
-def wrapAtoms(frame, unitcell=None, center=np.array([0., 0., 0.])):
+def wrapAtoms(frame, unitcell=None, center=np.array([0., 0., 0.]), **kwargs):
     """Wrap atoms into an image of the system simulated under periodic boundary
     conditions. When *frame* is a :class:`.Frame`, unitcell information will be
-    retrieved automatically.
+    retrieved automatically.  Coordinates are modified in place, and
+    multiple coordinate sets in an array with shape ``(n_csets, n_atoms, 3)``
+    are wrapped at once.
 
     .. note::
-       This function will wrap all atoms into the specified periodic image, so
-       covalent bonds will be broken.
+       Unless *fragments* are given, this function will wrap all atoms into
+       the specified periodic image, so covalent bonds will be broken.
 
     :arg frame: a frame instance or a coordinate set
     :type frame: :class:`.Frame`, :class:`.AtomGroup`, :class:`numpy.ndarray`
 
-    :arg unitcell: orthorhombic unitcell array with shape (3,)
+    :arg unitcell: orthorhombic unitcell dimensions with shape ``(3,)``,
+        dimensions and angles with shape ``(6,)``, or box vectors with shape
+        ``(3, 3)``, or one of these for each coordinate set, e.g. with shape
+        ``(n_csets, 6)``
     :type unitcell: :class:`numpy.ndarray`
 
     :arg center: coordinates of the center of the wrapping cell, default is
         the origin of the Cartesian coordinate system
-    :type center: :class:`numpy.ndarray`"""
+    :type center: :class:`numpy.ndarray`
+
+    :arg fragments: fragment indices of atoms, or **True** to use those of
+        the atoms of *frame*, see :meth:`.AtomGroup.getFragindices`.  Atoms of
+        a fragment are kept together by moving them to the image closest to
+        the first atom of the fragment, and fragments are wrapped based on
+        their centers.  Fragments must be shorter than half of the box.
+    :type fragments: :class:`numpy.ndarray`, bool
+
+    :arg centering: indices of atoms, or a selection from the same atom group,
+        whose center is moved to *center* before wrapping
+    :type centering: :class:`numpy.ndarray`, :class:`.Selection`"""
 
     try:
         coords = frame._getCoords()
@@ -525,21 +668,155 @@ def wrapAtoms(frame, unitcell=None, center=np.array([0., 0., 0.])):
 
     if unitcell is None:
         try:
-            unitcell = frame.getUnitcell()[:3]
+            unitcell = frame.getUnitcell()
         except AttributeError:
+            unitcell = None
+        if unitcell is None:
             raise TypeError('unitcell information must be provided')
 
-    half = unitcell / 2
-    ucmin = center - half
-    ucmax = center + half
-    for axis in range(3):
-        xyz = coords[:, axis]
-        which = (xyz < ucmin[axis]).nonzero()[0]
-        while len(which):
-            coords[which, axis] += unitcell[axis]
-            which = which[coords[which, axis] < ucmin[axis]]
-        which = (xyz > ucmax[axis]).nonzero()[0]
-        while len(which):
-            coords[which, axis] -= unitcell[axis]
-            which = which[coords[which, axis] > ucmax[axis]]
+    fragments = kwargs.get('fragments')
+    if fragments is True:
+        try:
+            atoms = frame.getAtoms()
+        except AttributeError:
+            atoms = frame
+        try:
+            fragments = atoms.getFragindices()
+        except AttributeError:
+            raise TypeError('fragments must be given as an array')
+
+    _wrapCoordsets(coords, unitcell, center, fragments,
+                   kwargs.get('centering'))
+    if isinstance(frame, Atomic):
+        frame._setTimeStamp(frame.getACSIndex())
     return frame
+
+
+def _getCellVectors(unitcell, n_csets):
+    """Returns box vectors with shape ``(1, 3, 3)`` or ``(n_csets, 3, 3)``."""
+
+    unitcell = np.asarray(unitcell, float)
+    if unitcell.ndim == 1 or unitcell.shape == (3, 3):
+        return getCellVectors(unitcell)[np.newaxis]
+    if len(unitcell) != n_csets:
+        raise ValueError('number of unitcells must match number of '
+                         'coordinate sets')
+    return np.array([getCellVectors(uc) for uc in unitcell])
+
+
+def _wrapCoordsets(coords, unitcell, center, fragments=None, centering=None):
+    """Wrap *coords* with shape ``([n_csets,] n_atoms, 3)`` in place."""
+
+    if not isinstance(coords, np.ndarray):
+        raise TypeError('coords must be a Numpy array')
+    if coords.ndim not in (2, 3) or coords.shape[-1] != 3:
+        raise ValueError('coords must have shape ([n_csets,]n_atoms,3)')
+    xyz = coords if coords.ndim == 3 else coords[np.newaxis]
+    n_atoms = xyz.shape[1]
+    boxes = _getCellVectors(unitcell, len(xyz))
+    inverse = np.linalg.inv(boxes)
+    center = np.asarray(center, float)
+
+    if fragments is not None:
+        fragments = np.asarray(fragments)
+        if fragments.shape != (n_atoms,):
+            raise ValueError('fragments must have shape (n_atoms,)')
+        labels, which = np.unique(fragments, return_inverse=True)
+        order = which.argsort(kind='mergesort')
+        counts = np.bincount(which)
+        starts = np.zeros(len(labels), int)
+        starts[1:] = np.cumsum(counts)[:-1]
+
+        # make fragments whole around their first atoms
+        reference = xyz[:, order[starts]][:, which]
+        delta = xyz - reference
+        delta -= np.matmul(np.floor(np.matmul(delta, inverse) + 0.5), boxes)
+        xyz[:] = reference + delta
+
+    if centering is not None:
+        if isinstance(centering, Atomic):
+            centering = centering._getIndices()
+        xyz -= (xyz[:, centering].mean(1) - center)[:, np.newaxis]
+
+    if fragments is None:
+        shift = np.floor(np.matmul(xyz - center, inverse) + 0.5)
+        xyz -= np.matmul(shift, boxes)
+    else:
+        # move fragments whose centers are out of the box
+        centers = np.add.reduceat(xyz[:, order], starts, axis=1)
+        centers /= counts[:, np.newaxis]
+        shift = np.floor(np.matmul(centers - center, inverse) + 0.5)
+        xyz -= np.matmul(shift, boxes)[:, which]
+    return coords
+
+
+def iterWrapped(trajectory, unitcell=None, center=np.array([0., 0., 0.]),
+                chunk=1000, **kwargs):
+    """Yield blocks of wrapped coordinate sets and their unitcells for
+    frames of *trajectory*, which are read *chunk* frames at a time and wrapped
+    at once using :func:`wrapAtoms`.  When *trajectory* contains unitcell
+    information, each frame is wrapped into its own unitcell, unless
+    *unitcell* is given.  Blocks can be passed to analysis functions or
+    written to a new file, e.g.::
+
+      for coords, unitcells in iterWrapped(dcd, fragments=True):
+          for xyz, uc in zip(coords, unitcells):
+              out.write(xyz, uc)
+
+    :arg trajectory: a trajectory, an ensemble, or a coordinate array
+    :type trajectory: :class:`.Trajectory`, :class:`.DCDFile`,
+        :class:`.Ensemble`, :class:`numpy.ndarray`
+
+    :arg chunk: number of frames read at a time, default is 1000
+    :type chunk: int
+
+    *unitcell*, *center*, *fragments*, and *centering* arguments are
+    described in :func:`wrapAtoms`.  When *fragments* is **True**, those of
+    the atoms set for *trajectory* will be used."""
+
+    fragments = kwargs.get('fragments')
+    if fragments is True:
+        try:
+            fragments = trajectory.getAtoms().getFragindices()
+        except AttributeError:
+            raise TypeError('atoms with bonds must be set for trajectory '
+                            'to wrap fragments')
+    centering = kwargs.get('centering')
+
+    if unitcell is None and hasattr(trajectory, 'nextCoordsets'):
+        if not isinstance(chunk, int):
+            raise TypeError('chunk must be an integer')
+        elif chunk < 1:
+            raise ValueError('chunk must be a positive integer')
+        nfi = trajectory.nextIndex()
+        trajectory.reset()
+        try:
+            while True:
+                block = trajectory.nextCoordsets(chunk, unitcell=True)
+                if block is None:
+                    break
+                coords, unitcells = block
+                if unitcells is None:
+                    raise ValueError('unitcell information must be provided')
+                _wrapCoordsets(coords, unitcells, center, fragments,
+                               centering)
+                yield coords, unitcells
+        finally:
+            trajectory.goto(nfi)
+        return
+
+    if unitcell is None:
+        raise TypeError('unitcell information must be provided')
+    unitcell = np.asarray(unitcell, float)
+    fixed = unitcell.ndim == 1 or unitcell.shape == (3, 3)
+    first = 0
+    for coords in _iterCoordsets(trajectory, chunk):
+        coords = np.array(coords)
+        n_csets = len(coords) if coords.ndim == 3 else 1
+        if fixed:
+            unitcells = np.array([unitcell] * n_csets)
+        else:
+            unitcells = unitcell[first:first + n_csets]
+        first += n_csets
+        _wrapCoordsets(coords, unitcells, center, fragments, centering)
+        yield coords, unitcells
@@ -68,6 +68,7 @@ Following ProDy functions are for parsing :file:`.cif` files:
 
   * :func:`.parseCIF` - parse :file:`.cif` formated file
   * :func:`.parseCIFStream` - parse :file:`.cif` formated stream
+  * :func:`.parseCIFLoop` - parse items of a category from :file:`.cif` file
 
 .. seealso::
 
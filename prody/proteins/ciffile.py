@@ -6,6 +6,7 @@
 
 from collections import defaultdict
 import os.path
+import re
 
 
 import numpy as np
@@ -13,13 +14,14 @@ import numpy as np
 from prody.atomic import AtomGroup
 from prody.atomic import flags
 from prody.atomic import ATOMIC_FIELDS
+from prody.atomic.functions import _getCachePath, _loadCached, _saveCached
 from prody.utilities import openFile
 from prody import LOGGER, SETTINGS
 
 from .header import getHeaderDict, buildBiomolecules, assignSecstr
 from .localpdb import fetchPDB
 
-__all__ = ['parseCIFStream', 'parseCIF',]
+__all__ = ['parseCIFStream', 'parseCIF', 'parseCIFLoop']
 
 class CIFParseError(Exception):
     pass
@@ -46,7 +48,8 @@ _parseCIFdoc = """
          only indicated alternate locations will be parsed as the single
          coordinate set of the AtomGroup, if *altloc* is set **True** all
          alternate locations will be parsed and each will be appended as a
-         distinct coordinate set, default is ``"A"``
+         distinct coordinate set, alternate locations are read from the first
+         parsed model, default is ``"A"``
     :type altloc: str
     """
 
@@ -93,9 +96,14 @@ def parseCIF(pdb, **kwargs):
         if len(title) == 7 and title.startswith('pdb'):
             title = title[3:]
         kwargs['title'] = title
+    cache = _getCachePath(pdb, 'cif', kwargs)
+    result = _loadCached(cache)
+    if result is not None:
+        return result
     cif = openFile(pdb, 'rt')
     result = parseCIFStream(cif, **kwargs)
     cif.close()
+    _saveCached(cache, result)
     return result
 
 def parseCIFStream(stream, **kwargs):
@@ -181,50 +189,28 @@ def _parseCIFLines(atomgroup, lines, model, chain, subset,
             subset = flags.BACKBONE
         protein_resnames = flags.AMINOACIDS
 
-    asize = 0
-    i = 0
-    models = []
-    nModels = 0
-    fields = {}
-    fieldCounter = -1
-    foundModelNumFieldID = False
-    foundAtomBlock = False
-    doneAtomBlock = False
-    while not doneAtomBlock:
-        line = lines[i]
-        if line[:11] == '_atom_site.':
-            fieldCounter += 1
-            fields[line.split('.')[1].strip()] = fieldCounter
-
-        if line.startswith('ATOM') or line.startswith('HETATM'):
-            if not foundAtomBlock:
-                foundAtomBlock = True
-                start = i
-            models.append(line.split()[fields['pdbx_PDB_model_num']])
-            if models[asize] != models[asize-1]:
-                nModels += 1
-            asize += 1
-        else:
-            if foundAtomBlock:
-                doneAtomBlock = True
-        i += 1
-    stop = i-1
-    if nModels == 0: nModels = 1
-
-    if model is not None and model != 1:
-        for i in range(start, stop):
-            if str(models[i]) != model and str(models[i+1]) == model:
-                start = i+1
-            if str(models[i]) == model and str(models[i+1]) != model:
-                stop = i+1
-                break
-        if not str(model) in models:
-            raise CIFParseError('model {0} is not found'.format(model))
+    columns = dict((label, []) for label, dtype in _CIFAtomSite)
+    for items in _iterCIFLoop(lines, 'atom_site'):
+        for label, dtype in _CIFAtomSite:
+            try:
+                values = items[label]
+            except KeyError:
+                raise CIFParseError('_atom_site.{0} is not found'
+                                    .format(label))
+            if dtype is None:
+                values = np.array(values) == 'HETATM'
+            elif isinstance(dtype, str):
+                values = np.array(values, dtype=ATOMIC_FIELDS[dtype].dtype)
+            else:
+                values = _getCIFNumbers(values, label, dtype)
+            columns[label].append(values)
+    if not columns['id']:
+        return atomgroup
+    for label, values in columns.items():
+        columns[label] = values[0] if len(values) == 1 else \
+            np.concatenate(values)
+    n_rows = len(columns['id'])
 
-    addcoords = False
-    if atomgroup.numCoordsets() > 0:
-        addcoords = True
- 
     if isinstance(altloc_torf, str):
         if altloc_torf.strip() != 'A':
             LOGGER.info('Parsing alternate locations {0}.'
@@ -237,98 +223,368 @@ def _parseCIFLines(atomgroup, lines, model, chain, subset,
         which_altlocs = '.A'
         altloc_torf = True
 
-    coordinates = np.zeros((asize, 3), dtype=float)
-    atomnames = np.zeros(asize, dtype=ATOMIC_FIELDS['name'].dtype)
-    resnames = np.zeros(asize, dtype=ATOMIC_FIELDS['resname'].dtype)
-    resnums = np.zeros(asize, dtype=ATOMIC_FIELDS['resnum'].dtype)
-    chainids = np.zeros(asize, dtype=ATOMIC_FIELDS['chain'].dtype)
-    hetero = np.zeros(asize, dtype=bool)
-    termini = np.zeros(asize, dtype=bool)
-    altlocs = np.zeros(asize, dtype=ATOMIC_FIELDS['altloc'].dtype)
-    icodes = np.zeros(asize, dtype=ATOMIC_FIELDS['icode'].dtype)
-    serials = np.zeros(asize, dtype=ATOMIC_FIELDS['serial'].dtype)
-    elements = np.zeros(asize, dtype=ATOMIC_FIELDS['element'].dtype)
-    bfactors = np.zeros(asize, dtype=ATOMIC_FIELDS['beta'].dtype)
-    occupancies = np.zeros(asize, dtype=ATOMIC_FIELDS['occupancy'].dtype)
-
-    n_atoms = atomgroup.numAtoms()
-    if n_atoms > 0:
-        asize = n_atoms
-
-    acount = 0
-    for line in lines[start:stop]:
-        startswith = line.split()[fields['group_PDB']]
-
-        atomname = line.split()[fields['auth_atom_id']]
-        resname = line.split()[fields['auth_comp_id']]
-
-        if subset is not None:
-            if not (atomname in subset and resname in protein_resnames):
-                continue
-
-        chID = line.split()[fields['auth_asym_id']]
-        if chain is not None:
-            if not chID in chain:
-                continue
-
-        alt = line.split()[fields['label_alt_id']]
-        if alt not in which_altlocs:
-            continue
+    atomnames = columns['auth_atom_id']
+    resnames = columns['auth_comp_id']
+    chainids = columns['auth_asym_id']
+    altlocs = columns['label_alt_id']
 
-        if model is not None:
-            if int(models[acount]) < model:
-                continue
-            elif int(models[acount]) > model:
-                break
-
-        coordinates[acount] = [line.split()[fields['Cartn_x']], \
-                              line.split()[fields['Cartn_y']], \
-                              line.split()[fields['Cartn_z']]]
-        atomnames[acount] = atomname
-        resnames[acount] = resname
-        resnums[acount] = line.split()[fields['auth_seq_id']]
-        chainids[acount] = chID
-        hetero[acount] = startswith == 'HETATM' # True or False
-        if chainids[acount] != chainids[acount-1]: termini[acount] = True
-        altlocs[acount] = alt
-        icodes[acount] = line.split()[fields['pdbx_PDB_ins_code']]
-        if icodes[acount] == '?': icodes[acount] = ''
-        serials[acount] = line.split()[fields['id']]
-        elements[acount] = line.split()[fields['type_symbol']]
-        bfactors[acount] = line.split()[fields['B_iso_or_equiv']]
-        occupancies[acount] = line.split()[fields['occupancy']]
-        
-        acount += 1
+    which = np.ones(n_rows, bool)
+    if subset is not None:
+        which &= _evalCIFColumn(atomnames, lambda name: name in subset)
+        which &= _evalCIFColumn(resnames,
+                                lambda name: name in protein_resnames)
+    if chain is not None:
+        which &= _evalCIFColumn(chainids, lambda chid: chid in chain)
+    alternate = _evalCIFColumn(altlocs, lambda alt: alt not in which_altlocs)
+    alternate &= which
+    which &= ~alternate
+
+    # rank models in the order they appear in the file
+    labels, first, indices = np.unique(columns['pdbx_PDB_model_num'],
+                                       return_index=True,
+                                       return_inverse=True)
+    rank = np.empty(len(labels), int)
+    rank[first.argsort()] = np.arange(len(labels))
+    indices = rank[indices]
+    n_models = len(labels)
 
     if model is not None:
-        nModels = 1
-
-    modelSize = acount//nModels
+        if model > n_models:
+            raise CIFParseError('model {0} is not found'.format(model))
+        n_models = 1
+        which &= indices == model - 1
+        alternate &= indices == model - 1
+        indices = np.zeros(n_rows, int)
+
+    alternate = (alternate & (indices == 0)).nonzero()[0]
+    which = which.nonzero()[0]
+    indices = indices[which]
+    counts = np.bincount(indices, minlength=n_models)
+    n_atoms = counts[0]
+    if not n_atoms:
+        return atomgroup
+    atoms = which[indices == 0]
+
+    coordinates = np.zeros((len(which), 3), dtype=float)
+    for i, label in enumerate(['Cartn_x', 'Cartn_y', 'Cartn_z']):
+        coordinates[:, i] = columns[label][which]
+    # order coordinates by model, keeping the order of atoms in each model
+    coordinates = coordinates[indices.argsort(kind='mergesort')]
+    if n_models > 1:
+        accept = counts == n_atoms
+        for i in (~accept).nonzero()[0]:
+            if counts[i] < n_atoms:
+                LOGGER.warn('Discarding model {0}, which contains {1} fewer '
+                            'atoms than the first model does.'
+                            .format(i + 1, n_atoms - counts[i]))
+            else:
+                LOGGER.warn('Discarding model {0}, which contains more '
+                            'atoms than first model does.'.format(i + 1))
+        coordinates = coordinates[np.repeat(accept, counts)]
+    coordinates = coordinates.reshape((-1, n_atoms, 3))
 
-    if addcoords:
-        atomgroup.addCoordset(coordinates[:modelSize])
+    if atomgroup.numCoordsets() > 0:
+        atomgroup.addCoordset(coordinates)
     else:
-        atomgroup._setCoords(coordinates[:modelSize])
-
-    atomgroup.setNames(atomnames[:modelSize])
-    atomgroup.setResnames(resnames[:modelSize])
-    atomgroup.setResnums(resnums[:modelSize])
-    atomgroup.setChids(chainids[:modelSize])
-    atomgroup.setFlags('hetatm', hetero[:modelSize])
-    atomgroup.setFlags('pdbter', termini[:modelSize])
-    atomgroup.setAltlocs(altlocs[:modelSize])
-    atomgroup.setIcodes(icodes[:modelSize])
-    atomgroup.setSerials(serials[:modelSize])
-
-    atomgroup.setElements(elements[:modelSize])
+        atomgroup._setCoords(coordinates)
+    if altloc_torf and len(alternate):
+        _evalCIFAltlocs(atomgroup, columns, atoms, alternate, coordinates[0])
+
+    chainids = chainids[atoms]
+    termini = np.zeros(n_atoms, dtype=bool)
+    termini[0] = True
+    termini[1:] = chainids[1:] != chainids[:-1]
+    icodes = columns['pdbx_PDB_ins_code'][atoms]
+    icodes[icodes == '?'] = ''
+    elements = columns['type_symbol'][atoms]
+
+    atomgroup.setNames(atomnames[atoms])
+    atomgroup.setResnames(resnames[atoms])
+    atomgroup.setResnums(columns['auth_seq_id'][atoms])
+    atomgroup.setChids(chainids)
+    atomgroup.setFlags('hetatm', columns['group_PDB'][atoms])
+    atomgroup.setFlags('pdbter', termini)
+    atomgroup.setAltlocs(altlocs[atoms])
+    atomgroup.setIcodes(icodes)
+    atomgroup.setSerials(columns['id'][atoms])
+
+    atomgroup.setElements(elements)
     from prody.utilities.misctools import getMasses
-    atomgroup.setMasses(getMasses(elements[:modelSize]))
-    atomgroup.setBetas(bfactors[:modelSize])
-    atomgroup.setOccupancies(occupancies[:modelSize])
-
-    for n in range(1,nModels):
-        atomgroup.addCoordset(coordinates[n*modelSize:(n+1)*modelSize])
+    labels, indices = np.unique(elements, return_inverse=True)
+    atomgroup.setMasses(getMasses(labels)[indices])
+    atomgroup.setBetas(columns['B_iso_or_equiv'][atoms])
+    atomgroup.setOccupancies(columns['occupancy'][atoms])
 
     return atomgroup
 
 
+def _evalCIFAltlocs(atomgroup, columns, atoms, rows, coords):
+    """Append alternate locations in *rows* of *columns* to *atomgroup* as
+    distinct coordinate sets.  Alternate locations replace *coords* of
+    *atoms* with the same chain identifier, residue number, and name."""
+
+    chids = columns['auth_asym_id']
+    resnums = columns['auth_seq_id']
+    resnames = columns['auth_comp_id']
+    names = columns['auth_atom_id']
+    index = dict((key, i) for i, key in
+                 enumerate(zip(chids[atoms], resnums[atoms], names[atoms])))
+    altlocs = columns['label_alt_id'][rows]
+    for key in np.unique(altlocs):
+        xyz = coords.copy()
+        success = 0
+        for row in rows[altlocs == key]:
+            i = index.get((chids[row], resnums[row], names[row]))
+            if i is None or resnames[atoms[i]] != resnames[row]:
+                LOGGER.warn('failed to parse altloc {0} of atom {1}, atom '
+                            'is not present for altloc {2}'
+                            .format(repr(key), columns['id'][row], "'A'"))
+                continue
+            xyz[i] = [columns['Cartn_x'][row], columns['Cartn_y'][row],
+                      columns['Cartn_z'][row]]
+            success += 1
+        LOGGER.info('{0} out of {1} altloc {2} atoms were parsed.'
+                    .format(success, (altlocs == key).sum(), repr(key)))
+        if success:
+            LOGGER.info('Altloc {0} is appended as a coordinate set to '
+                        'atomgroup {1}.'.format(repr(key),
+                                                atomgroup.getTitle()))
+            atomgroup.addCoordset(xyz, label='altloc ' + key)
+
+
+# items of atom_site loop and atomic fields or types they are parsed into
+_CIFAtomSite = [
+    ('group_PDB', None),
+    ('id', ATOMIC_FIELDS['serial'].dtype),
+    ('type_symbol', 'element'),
+    ('label_alt_id', 'altloc'),
+    ('pdbx_PDB_ins_code', 'icode'),
+    ('Cartn_x', float),
+    ('Cartn_y', float),
+    ('Cartn_z', float),
+    ('occupancy', ATOMIC_FIELDS['occupancy'].dtype),
+    ('B_iso_or_equiv', ATOMIC_FIELDS['beta'].dtype),
+    ('auth_seq_id', ATOMIC_FIELDS['resnum'].dtype),
+    ('auth_comp_id', 'resname'),
+    ('auth_asym_id', 'chain'),
+    ('auth_atom_id', 'name'),
+    ('pdbx_PDB_model_num', int),
+]
+
+
+def _getCIFNumbers(values, label, dtype):
+    """Returns an array of numbers parsed from *values* of item *label*.
+    Unknown (``?``) and inapplicable (``.``) values are returned as zeros."""
+
+    numbers = np.fromstring(' '.join(values), dtype, sep=' ')
+    if len(numbers) != len(values):
+        values = np.array(values)
+        values[(values == '?') | (values == '.')] = '0'
+        try:
+            numbers = values.astype(dtype)
+        except ValueError as err:
+            raise CIFParseError('_atom_site.{0} could not be parsed: {1}'
+                                .format(label, err))
+    return numbers
+
+
+def _evalCIFColumn(values, func):
+    """Returns a boolean array obtained by evaluating *func* for each of
+    unique *values*."""
+
+    labels, indices = np.unique(values, return_inverse=True)
+    return np.array([func(label) for label in labels], bool)[indices]
+
+
+_CIFToken = re.compile(r''''[^\n]*?'(?=\s|$)|"[^\n]*?"(?=\s|$)|\S+''')
+
+_CIFMarks = ('\n#', '\n_', '\nloop_', '\ndata_', '\n;')
+
+CIF_BLOCK = 1 << 22
+
+
+def _splitCIF(text):
+    """Returns a list of whitespace separated values in *text* with quotes
+    around values removed."""
+
+    if "'" not in text and '"' not in text:
+        return text.split()
+    return [token[1:-1] if token[0] in '\'"' and len(token) > 1 and
+            token[-1] == token[0] else token
+            for token in _CIFToken.findall(text)]
+
+
+def _getCIFTokens(text):
+    """Returns a list of values in *text*, which are values of a loop or data
+    item names and their values.  Multi-line text fields between semicolons
+    are returned as single values."""
+
+    tokens = []
+    pos = 0
+    while True:
+        first = text.find('\n;', pos)
+        if first < 0:
+            break
+        last = text.find('\n;', first + 2)
+        if last < 0:
+            last = len(text)
+        tokens.extend(_splitCIF(text[pos:first]))
+        tokens.append(text[first + 2:last].strip())
+        pos = last + 2
+    tokens.extend(_splitCIF(text[pos:]))
+    return tokens
+
+
+def _unquoteCIF(values):
+    """Returns *values* with quotes around them removed, or **None** if a
+    quoted value was split at whitespace."""
+
+    if [value for value in values if value[0] in '\'"' and
+            (len(value) < 2 or value[-1] != value[0])]:
+        return None
+    return [value[1:-1] if value[0] in '\'"' else value for value in values]
+
+
+def _getCIFColumns(text, n_items):
+    """Returns values in *text* split into *n_items* columns, or **None** if
+    the number of values is not a multiple of *n_items*."""
+
+    columns = None
+    if '\n;' not in text:
+        tokens = text.split()
+        if not len(tokens) % n_items:
+            columns = [tokens[i::n_items] for i in range(n_items)]
+        if columns and ("'" in text or '"' in text):
+            for i, values in enumerate(columns):
+                joined = ''.join(values)
+                if "'" in joined or '"' in joined:
+                    columns[i] = values = _unquoteCIF(values)
+                    if values is None:
+                        columns = None
+                        break
+    if columns is None:
+        tokens = _getCIFTokens(text)
+        if len(tokens) % n_items:
+            return None
+        columns = [tokens[i::n_items] for i in range(n_items)]
+    return columns
+
+
+def _iterCIFLoop(lines, category):
+    """Yield dictionaries of lists of values for items in *category* found in
+    *lines*, for blocks of rows.  Values of a loop are split at once for a
+    block of lines, so rows may span more than one line.  Categories with a
+    single row, written as item and value pairs, are parsed too."""
+
+    if lines and lines[0][-1:] == '\n':
+        text = '\n' + ''.join(lines)
+    else:
+        text = '\n' + '\n'.join(lines)
+    n_chars = len(text)
+    prefix = '\n_' + category.lstrip('_') + '.'
+
+    pos = text.find(prefix)
+    if pos < 0:
+        return
+    end = pos
+    while end and text[end - 1].isspace():
+        end -= 1
+    loop = text[text.rfind('\n', 0, end) + 1:end].strip() == 'loop_'
+
+    labels = []
+    if loop:
+        while text.startswith(prefix, pos):
+            end = text.find('\n', pos + 1)
+            if end < 0:
+                end = n_chars
+            labels.append(text[pos + len(prefix):end].split()[0])
+            pos = end
+
+    # find the end of data, skipping over multi-line text fields
+    marks = [-1] * len(_CIFMarks)
+    end = pos
+    texts = False
+    while True:
+        for i, mark in enumerate(_CIFMarks):
+            if marks[i] < end:
+                found = text.find(mark, end)
+                marks[i] = n_chars if found < 0 else found
+        end = min(marks)
+        if end == n_chars:
+            break
+        if text.startswith('\n;', end):
+            found = text.find('\n;', end + 2)
+            end = n_chars if found < 0 else found + 2
+            texts = True
+        elif not loop and text.startswith(prefix, end):
+            end += 1
+        else:
+            break
+
+    if not loop:
+        tokens = _getCIFTokens(text[pos:end])
+        items = {}
+        for label, value in zip(tokens[::2], tokens[1::2]):
+            items[label[len(prefix) - 1:]] = [value]
+        yield items
+        return
+
+    n_items = len(labels)
+    while pos < end:
+        stop = end if texts else text.find('\n', pos + CIF_BLOCK, end)
+        if stop < 0:
+            stop = end
+        columns = _getCIFColumns(text[pos:stop], n_items)
+        if columns is None and stop < end:
+            # a row continues in the next block, so parse the rest at once
+            stop = end
+            columns = _getCIFColumns(text[pos:stop], n_items)
+        if columns is None:
+            raise CIFParseError('number of values in {0} loop is not a '
+                                'multiple of number of items'
+                                .format(prefix[1:-1]))
+        if columns[0]:
+            yield dict(zip(labels, columns))
+        pos = stop
+
+
+def _getCIFLoop(lines, category):
+    """Returns a dictionary of lists of values for items in *category*, or
+    **None** if *category* is not found in *lines*."""
+
+    items = None
+    for block in _iterCIFLoop(lines, category):
+        if items is None:
+            items = block
+        else:
+            for label, values in block.items():
+                items[label].extend(values)
+    return items
+
+
+def parseCIFLoop(cif, category):
+    """Returns a dictionary that maps item names of *category* to arrays of
+    values parsed from an mmCIF file or stream, e.g. ``'struct_conf'`` for
+    helices or ``'pdbx_struct_oper_list'`` for biomolecular transformations.
+    Values are returned as strings.  **None** is returned if *category* is
+    not found.
+
+    :arg cif: an mmCIF filename or a stream that implements the method
+        ``readlines``
+    :type cif: str
+
+    :arg category: category name, e.g. ``'struct_conf'``
+    :type category: str"""
+
+    if not isinstance(category, str):
+        raise TypeError('category must be a string')
+    if isinstance(cif, str):
+        cif = openFile(cif, 'rt')
+        lines = cif.readlines()
+        cif.close()
+    else:
+        lines = cif.readlines()
+    items = _getCIFLoop(lines, category)
+    if items is None:
+        return None
+    return dict((label, np.array(values)) for label, values in items.items())
@@ -9,7 +9,7 @@ import numpy as np
 from prody import LOGGER
 from prody.atomic import ATOMIC_FIELDS
 from prody.atomic import Atomic, AtomGroup
-from prody.atomic import getSequence
+from prody.atomic import getSequence, joinAtoms
 from prody.measure import Transformation
 from prody.utilities import openFile
 
@@ -1094,11 +1094,8 @@ def buildBiomolecules(header, atoms, biomol=None):
             ags.append(newag)
 
         if ags:
-            newag = ags.pop(0)
-            while ags:
-                newag += ags.pop(0)
-            newag.setTitle('{0} biomolecule {1}'
-                           .format(atoms.getTitle(), i))
+            newag = joinAtoms(ags, '{0} biomolecule {1}'
+                                   .format(atoms.getTitle(), i))
             biomols.append(newag)
             
     if biomols:
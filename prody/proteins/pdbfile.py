@@ -13,6 +13,8 @@ import numpy as np
 from prody.atomic import AtomGroup
 from prody.atomic import flags
 from prody.atomic import ATOMIC_FIELDS
+from prody.atomic.functions import _getAtomArrays, _buildAtomGroup
+from prody.atomic.functions import _getCachePath, _loadCached, _saveCached
 from prody.utilities import openFile, isListLike
 from prody import LOGGER, SETTINGS
 
@@ -80,6 +82,8 @@ _parsePDBdoc = _parsePQRdoc + """
 
 _PDBSubsets = {'ca': 'ca', 'calpha': 'ca', 'bb': 'bb', 'backbone': 'bb'}
 
+PDB_BLOCK = 1 << 18
+
 def parsePDB(*pdb, **kwargs):
     """Returns an :class:`.AtomGroup` and/or dictionary containing header data
     parsed from a PDB file.
@@ -90,10 +94,21 @@ def parsePDB(*pdb, **kwargs):
 
     :arg pdb: one PDB identifier or filename, or a list of them.
         If needed, PDB files are downloaded using :func:`.fetchPDB()` function.
+
+    :arg n_cpu: number of processes used for parsing a list of files, default
+        is 1.  Results are returned in the order of *pdb*, and **None** is
+        returned for files that could not be parsed after logging the error.
+    :type n_cpu: int
     
     You can also provide arguments that you would like passed on to fetchPDB().
     """
 
+    n_cpu = kwargs.pop('n_cpu', 1)
+    if not isinstance(n_cpu, int):
+        raise TypeError('n_cpu must be an integer')
+    elif n_cpu < 1:
+        raise ValueError('n_cpu must be equal to or greater than 1')
+
     n_pdb = len(pdb)
     if n_pdb == 1:
         if isListLike(pdb[0]):
@@ -110,26 +125,47 @@ def parsePDB(*pdb, **kwargs):
             if np.isscalar(argval):
                 argval = [argval]*n_pdb
             lstkwargs[key] = argval
+        tasks = [(p, dict((key, lstkwargs[key][i]) for key in lstkwargs))
+                 for i, p in enumerate(pdb)]
 
         start = time.time()
         LOGGER.progress('Retrieving {0} PDB structures...'
                     .format(n_pdb), n_pdb, '_prody_parsePDB')
-        for i, p in enumerate(pdb):
-            kwargs = {}
-            for key in lstkwargs:
-                kwargs[key] = lstkwargs[key][i]
-            LOGGER.update(i, 'Retrieving {0}...'.format(p), 
-                          label='_prody_parsePDB')
-            result = _parsePDB(p, **kwargs)
+        if n_cpu > 1 and 'ag' not in kwargs:
+            import multiprocessing
+            n_cpu = min(multiprocessing.cpu_count(), n_cpu)
+            pool = multiprocessing.Pool(n_cpu)
+            try:
+                outputs = pool.imap(_parsePDBTask, tasks,
+                                    max(1, min(8, n_pdb // n_cpu // 4)))
+                for i, (result, error) in enumerate(outputs):
+                    LOGGER.update(i, 'Retrieving {0}...'.format(pdb[i]),
+                                  label='_prody_parsePDB')
+                    results.append((_unpackAtoms(result), error))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for i, task in enumerate(tasks):
+                LOGGER.update(i, 'Retrieving {0}...'.format(pdb[i]), 
+                              label='_prody_parsePDB')
+                results.append(_parsePDBTask(task, pack=False))
+        LOGGER.finish()
+
+        n_failed = 0
+        for i, (result, error) in enumerate(results):
+            if error is not None:
+                n_failed += 1
+                LOGGER.warn('{0} could not be parsed: {1}'
+                            .format(pdb[i], error))
             if not isinstance(result, tuple):
                 if isinstance(result, dict):
                     result = (None, result)
                 else:
                     result = (result, None)
-            results.append(result)
+            results[i] = result
 
         results = list(zip(*results))
-        LOGGER.finish()
        
         for i in reversed(range(len(results))):
             if all(j is None for j in results[i]):
@@ -139,10 +175,53 @@ def parsePDB(*pdb, **kwargs):
         results = list(results)
 
         LOGGER.info('{0} PDBs were parsed in {1:.2f}s.'
-                     .format(len(results), time.time()-start))
+                     .format(n_pdb - n_failed, time.time()-start))
 
         return results
 
+
+class _AtomArrays(dict):
+
+    """Arrays of an atom group in the layout used by :func:`.saveAtoms`,
+    which are sent from worker processes instead of the atom group."""
+
+
+def _packAtoms(result):
+    """Returns *result* after replacing atom groups with their arrays."""
+
+    if isinstance(result, AtomGroup):
+        return _AtomArrays(_getAtomArrays(result))
+    elif isinstance(result, (tuple, list)):
+        return type(result)(_packAtoms(item) for item in result)
+    return result
+
+
+def _unpackAtoms(result):
+    """Returns *result* after building atom groups from their arrays."""
+
+    if isinstance(result, _AtomArrays):
+        return _buildAtomGroup(result)
+    elif isinstance(result, (tuple, list)):
+        return type(result)(_unpackAtoms(item) for item in result)
+    return result
+
+
+def _parsePDBTask(task, pack=True):
+    """Returns the result of parsing a (*pdb*, *kwargs*) *task* and **None**,
+    or **None** and the error message if parsing fails.  Atom groups are
+    packed into arrays when *pack* is **True**, for sending them from a
+    worker process."""
+
+    pdb, kwargs = task
+    try:
+        result = _parsePDB(pdb, **kwargs)
+    except Exception as err:
+        return None, '{0}: {1}'.format(type(err).__name__, err)
+    if pack:
+        result = _packAtoms(result)
+    return result, None
+
+
 def _getPDBid(pdb):
     l = len(pdb)
     if l == 4:
@@ -182,11 +261,16 @@ def _parsePDB(pdb, **kwargs):
         if len(title) == 7 and title.startswith('pdb'):
             title = title[3:]
         kwargs['title'] = title
-    pdb = openFile(pdb, 'rt')
     if chain != '':
         kwargs['chain'] = chain
+    cache = _getCachePath(pdb, 'pdb', kwargs)
+    result = _loadCached(cache)
+    if result is not None:
+        return result
+    pdb = openFile(pdb, 'rt')
     result = parsePDBStream(pdb, **kwargs)
     pdb.close()
+    _saveCached(cache, result)
     return result
 
 parsePDB.__doc__ += _parsePDBdoc
@@ -360,6 +444,315 @@ def parsePQR(filename, **kwargs):
 
 parsePQR.__doc__ += _parsePQRdoc
 
+def _getColumns(records, first, last):
+    """Returns an array of byte strings in fixed-width columns from *first*
+    to *last* of *records*, a 2D array of characters."""
+
+    return np.ascontiguousarray(records[:, first:last]).view(
+        'S{0}'.format(last - first)).ravel()
+
+
+def _getLabels(records, first, last, dtype, strip=True):
+    """Returns unique labels in columns from *first* to *last* of *records*
+    and indices of labels of records.  Labels are converted to *dtype* and
+    stripped only once."""
+
+    columns = np.ascontiguousarray(records[:, first:last])
+    width = last - first
+    if width in (1, 2, 4):
+        # compare labels as integers
+        codes = columns.view('u{0}'.format(width)).ravel()
+        codes, indices = np.unique(codes, return_inverse=True)
+        labels = codes.view('S{0}'.format(width))
+    else:
+        labels, indices = np.unique(columns.view('S{0}'.format(width)).ravel(),
+                                    return_inverse=True)
+    labels = labels.astype(dtype)
+    if strip:
+        labels = np.char.strip(labels)
+    return labels, indices
+
+
+def _getNumbers(records, first, last, dtype=float):
+    """Returns numbers in columns from *first* to *last* of *records* and a
+    boolean array marking those that could not be parsed, which are zero.
+    Plain decimal numbers are parsed at once using digit positions, and
+    others are converted one at a time."""
+
+    # columns are rows of the transposed array, so that reductions over
+    # columns are fast
+    chars = np.ascontiguousarray(records[:, first:last].T)
+    digits = chars - 48
+    isdigit = digits < 10
+    issign = (chars == 43) | (chars == 45)
+    isdot = chars == 46
+    nonspace = chars != 32
+    width = last - first
+    head = nonspace.argmax(0)
+    tail = width - 1 - nonspace[::-1].argmax(0)
+    rows = np.arange(len(head))
+    valid = (isdigit.any(0) & (nonspace.sum(0) == tail - head + 1) &
+             ((isdigit | issign | isdot) == nonspace).all(0) &
+             (issign.sum(0) <= 1) & (issign[head, rows] | ~issign.any(0)) &
+             (isdot.sum(0) <= (dtype is float)))
+
+    mantissa = np.zeros(len(head), np.int64)
+    decimals = np.zeros(len(head), int)
+    fraction = np.zeros(len(head), bool)
+    for i in range(width):
+        mantissa = np.where(isdigit[i], mantissa * 10 + digits[i], mantissa)
+        fraction |= isdot[i]
+        decimals += isdigit[i] & fraction
+    if dtype is float:
+        numbers = mantissa / 10. ** decimals
+    else:
+        numbers = mantissa.astype(dtype)
+    numbers[(chars == 45).any(0)] *= -1
+
+    failed = ~valid
+    numbers[failed] = 0
+    for i in failed.nonzero()[0]:
+        try:
+            numbers[i] = dtype(_getColumns(records[i:i+1], first, last)[0])
+        except ValueError:
+            pass
+        else:
+            failed[i] = False
+    return numbers, failed
+
+
+def _getValues(records, first, last, dtype, lines, message):
+    """Returns numbers in columns from *first* to *last* of *records*, after
+    logging a warning using *message* and line numbers in *lines* for those
+    that cannot be parsed."""
+
+    numbers, failed = _getNumbers(records, first, last, dtype)
+    for i in failed.nonzero()[0]:
+        LOGGER.warn(message.format(lines[i]))
+    return numbers
+
+
+def _getRecords(lines, width=80):
+    """Returns a character array with shape ``(n_lines, width)`` for
+    *lines*, in which line ends and padding are blank columns."""
+
+    records = np.array(lines, dtype='S{0}'.format(width))
+    records = records.view(np.uint8).reshape((len(lines), width))
+    records[records < 32] = 32
+    return records
+
+
+def _parsePDBColumns(atomgroup, lines, split, model, chain, subset,
+                     altloc_torf, format='PDB'):
+    """Returns an AtomGroup. Lines are stored in character arrays in blocks
+    and fields of atom records are converted from fixed-width columns at
+    once.  Topology is parsed from the first model, and only coordinate
+    columns of atom records are read for the following models.  **None** is
+    returned without changing *atomgroup* for the files that need to be
+    handled line by line by :func:`_parsePDBLines`, e.g. when alternate
+    locations are appended as coordinate sets or when there are invalid
+    values."""
+
+    isPDB = format.upper() == 'PDB'
+    stop = len(lines)
+    if isPDB and model is not None and model != 1:
+        nmodel = 0
+        for i in range(split, stop):
+            if lines[i][:5] == 'MODEL':
+                nmodel += 1
+                if model == nmodel:
+                    split = i + 1
+                    break
+        if nmodel != model:
+            raise PDBParseError('model {0} is not found'.format(model))
+
+    if subset == 'ca':
+        subset = ['CA']
+    elif subset:
+        subset = list(flags.BACKBONE)
+    if chain is not None:
+        chain = np.frombuffer(chain.encode(), np.uint8)
+    if isinstance(altloc_torf, str):
+        which_altlocs = ' ' + ''.join(altloc_torf.split())
+    else:
+        which_altlocs = ' A'
+    which_altlocs = np.frombuffer(which_altlocs.encode(), np.uint8)
+
+    # columns up to coordinates are read for all lines
+    positions, coords, ends, others = [], [], [], []
+    for first in range(split, stop, PDB_BLOCK):
+        try:
+            records = _getRecords(lines[first:first + PDB_BLOCK], 54)
+        except UnicodeError:
+            return None
+        rectypes = _getColumns(records, 0, 6)
+        atoms = ((rectypes == b'ATOM  ') |
+                 (rectypes == b'HETATM')).nonzero()[0]
+        if subset:
+            torf = np.in1d(np.char.strip(_getColumns(records[atoms], 12, 16)
+                                         .astype(str)), subset)
+            torf &= np.in1d(np.char.strip(_getColumns(records[atoms], 17, 21)
+                                          .astype(str)),
+                            list(flags.AMINOACIDS))
+            atoms = atoms[torf]
+        if chain is not None:
+            atoms = atoms[np.in1d(records[atoms, 21], chain)]
+        torf = np.in1d(records[atoms, 16], which_altlocs)
+        if not isinstance(altloc_torf, str) and not torf.all():
+            return None
+        atoms = atoms[torf]
+
+        xyz = np.zeros((len(atoms), 3))
+        for i in range(3):
+            xyz[:, i], failed = _getNumbers(records[atoms], 30 + i * 8,
+                                            38 + i * 8)
+            if failed.any():
+                return None
+        positions.append(atoms + first)
+        coords.append(xyz)
+        # atoms of a model are between lines starting with END, e.g. ENDMDL
+        ends.append((_getColumns(records, 0, 3) == b'END').nonzero()[0] +
+                    first)
+        torf = rectypes == b'TER   '
+        if isPDB:
+            torf |= (rectypes == b'ANISOU') | (rectypes == b'SIGUIJ')
+        others.append(torf.nonzero()[0] + first)
+        if (model is not None and len(positions[0]) and len(ends[-1]) and
+                ends[-1][-1] > positions[0][0]):
+            break
+
+    positions = np.concatenate(positions)
+    if not len(positions):
+        return None
+    coords = np.concatenate(coords)
+    ends = np.concatenate(ends)
+    others = np.concatenate(others)
+
+    segments = ends.searchsorted(positions)
+    counts = np.unique(segments, return_counts=True)[1]
+    n_atoms = counts[0]
+    first = positions[:n_atoms]
+    if 0 < atomgroup.numAtoms() != n_atoms:
+        return None
+    if segments[0] < len(ends):
+        last = ends[segments[0]]
+        if model is not None or stop - last - 1 < n_atoms:
+            counts = counts[:1]
+    else:
+        last = stop
+    if len(counts) > 1:
+        accept = counts == n_atoms
+        for i in (~accept).nonzero()[0]:
+            if counts[i] < n_atoms:
+                LOGGER.warn('Discarding model {0}, which contains {1} fewer '
+                            'atoms than the first model does.'
+                            .format(i + 1, n_atoms - counts[i]))
+            else:
+                LOGGER.warn('Discarding model {0}, which contains more '
+                            'atoms than first model does.'.format(i + 1))
+        coords = coords[np.repeat(accept, counts)]
+        coords = coords.reshape((accept.sum(), n_atoms, 3))
+    else:
+        coords = coords[:n_atoms]
+
+    # TER and ANISOU records are assigned to the atom preceding them
+    termini = np.zeros(n_atoms, bool)
+    anisous = {}
+    others = others[others < last]
+    if len(others):
+        records = _getRecords([lines[i] for i in others])
+        rectypes = _getColumns(records, 0, 6)
+    for rectype in ('TER   ', 'ANISOU', 'SIGUIJ'):
+        if not len(others):
+            break
+        which = (rectypes == rectype.encode()).nonzero()[0]
+        if not len(which):
+            continue
+        index = first.searchsorted(others[which]) - 1
+        if not atomgroup.numAtoms():
+            # records preceding atoms are assigned to the last atom when
+            # arrays are allocated for the atoms of the given atom group
+            which, index = which[index >= 0], index[index >= 0]
+        if rectype == 'TER   ':
+            termini[index] = True
+            continue
+        anisou = np.zeros((n_atoms, 6), ATOMIC_FIELDS['anisou'].dtype)
+        for i, (j, k) in enumerate(((28, 35), (35, 42), (43, 49), (49, 56),
+                                    (56, 63), (63, 70))):
+            values, failed = _getNumbers(records[which], j, k)
+            if failed.any():
+                return None
+            anisou[index, i] = values
+        anisous[rectype] = anisou
+
+    records = _getRecords([lines[i] for i in first])
+    lines = first
+    resnums, failed = _getNumbers(records, 22, 26,
+                                  ATOMIC_FIELDS['resnum'].dtype)
+    if failed.any():
+        return None
+    serials, failed = _getNumbers(records, 6, 11,
+                                  ATOMIC_FIELDS['serial'].dtype)
+    for i in failed.nonzero()[0]:
+        # serial numbers of large structures may be hexadecimal
+        try:
+            serials[i] = int(_getColumns(records[i:i+1], 6, 11)[0], 16)
+        except ValueError:
+            LOGGER.warn('failed to parse serial number in line {0}'
+                        .format(lines[i]))
+            serials[i] = serials[i-1] + 1
+    if isPDB:
+        occupancies = _getValues(records, 54, 60,
+                                 ATOMIC_FIELDS['occupancy'].dtype, lines,
+                                 'failed to parse occupancy at line {0}')
+        bfactors = _getValues(records, 60, 66, ATOMIC_FIELDS['beta'].dtype,
+                              lines, 'failed to parse beta-factor at line {0}')
+    else:
+        charges = _getValues(records, 54, 62, ATOMIC_FIELDS['charge'].dtype,
+                             lines, 'failed to parse charge at line {0}')
+        radii = _getValues(records, 62, 69, ATOMIC_FIELDS['radius'].dtype,
+                           lines, 'failed to parse radius at line {0}')
+
+    if isinstance(altloc_torf, str) and altloc_torf.strip() != 'A':
+        LOGGER.info('Parsing alternate locations {0}.'.format(altloc_torf))
+    if atomgroup.numCoordsets() > 0:
+        atomgroup.addCoordset(coords)
+    else:
+        atomgroup._setCoords(coords)
+    for label, first, last, strip in (('name', 12, 16, True),
+                                      ('resname', 17, 21, True),
+                                      ('chain', 21, 22, False),
+                                      ('altloc', 16, 17, False),
+                                      ('icode', 26, 27, True),
+                                      ('segment', 72, 76, True)):
+        if label == 'segment' and not isPDB:
+            continue
+        labels, indices = _getLabels(records, first, last,
+                                     ATOMIC_FIELDS[label].dtype, strip)
+        getattr(atomgroup, 'set' + ATOMIC_FIELDS[label].meth_pl)(
+            labels[indices])
+    atomgroup.setResnums(resnums)
+    atomgroup.setFlags('hetatm', isPDB & (records[:, 0] == ord('H')))
+    atomgroup.setFlags('pdbter', termini)
+    atomgroup.setSerials(serials)
+    if isPDB:
+        atomgroup.setBetas(bfactors)
+        atomgroup.setOccupancies(occupancies)
+        elements, indices = _getLabels(records, 76, 78,
+                                       ATOMIC_FIELDS['element'].dtype)
+        atomgroup.setElements(elements[indices])
+        from prody.utilities.misctools import getMasses
+        atomgroup.setMasses(getMasses(elements)[indices])
+        if 'ANISOU' in anisous:
+            atomgroup.setAnisous(anisous['ANISOU'] / 10000)
+        if 'SIGUIJ' in anisous:
+            atomgroup.setAnistds(anisous['SIGUIJ'] / 10000)
+    else:
+        atomgroup.setCharges(charges)
+        atomgroup.setRadii(radii)
+    return atomgroup
+
+
 def _parsePDBLines(atomgroup, lines, split, model, chain, subset,
                    altloc_torf, format='PDB'):
     """Returns an AtomGroup. See also :func:`.parsePDBStream()`.
@@ -367,6 +760,10 @@ def _parsePDBLines(atomgroup, lines, split, model, chain, subset,
     :arg lines: PDB/PQR lines
     :arg split: starting index for coordinate data lines"""
 
+    if _parsePDBColumns(atomgroup, lines, split, model, chain, subset,
+                        altloc_torf, format) is not None:
+        return atomgroup
+
     format = format.upper()
     if format == 'PDB':
         isPDB = True
@@ -416,6 +813,7 @@ def _parsePDBLines(atomgroup, lines, split, model, chain, subset,
         siguij = None
         charges = np.zeros(asize, dtype=ATOMIC_FIELDS['charge'].dtype)
     else:
+        charges = np.zeros(asize, dtype=ATOMIC_FIELDS['charge'].dtype)
         radii = np.zeros(asize, dtype=ATOMIC_FIELDS['radius'].dtype)
 
     asize = 2000 # increase array length by this much when needed
@@ -566,6 +964,8 @@ def _parsePDBLines(atomgroup, lines, split, model, chain, subset,
                     np.zeros(asize, ATOMIC_FIELDS['icode'].dtype)))
                 serials = np.concatenate((serials,
                     np.zeros(asize, ATOMIC_FIELDS['serial'].dtype)))
+                charges = np.concatenate((charges,
+                    np.zeros(asize, ATOMIC_FIELDS['charge'].dtype)))
                 if isPDB:
                     bfactors = np.concatenate((bfactors,
                         np.zeros(asize, ATOMIC_FIELDS['beta'].dtype)))
@@ -582,8 +982,6 @@ def _parsePDBLines(atomgroup, lines, split, model, chain, subset,
                         siguij = np.concatenate((siguij, np.zeros((asize, 6),
                             ATOMIC_FIELDS['siguij'].dtype)))
                 else:
-                    charges = np.concatenate((charges,
-                        np.zeros(asize, ATOMIC_FIELDS['charge'].dtype)))
                     radii = np.concatenate((radii,
                         np.zeros(asize, ATOMIC_FIELDS['radius'].dtype)))
         #elif startswith == 'END   ' or startswith == 'CONECT':
@@ -3,10 +3,11 @@
 import os.path
 import pickle
 
+import numpy as np
 from numpy.testing import *
 
 from prody import *
-from prody import LOGGER
+from prody import LOGGER, SETTINGS
 from prody.atomic.fields import READONLY
 from prody.tests import unittest, TEMPDIR
 from prody.tests.datafiles import *
@@ -78,6 +79,94 @@ class TestSaveLoad(unittest.TestCase):
             assert_equal(atoms.getData(label), ATOMS.getData(label),
                          'failed to load ' + label)
 
+    def testSaveLoadMemmap(self):
+
+        filename = saveAtoms(ATOMS, os.path.join(TEMPDIR, 'atoms'),
+                             format='npy')
+        self.assertTrue(os.path.isdir(filename))
+        atoms = loadAtoms(filename, mmap_mode='r')
+        assert_equal(atoms.getCoordsets(), ATOMS.getCoordsets())
+        for label in ATOMS.getDataLabels():
+            assert_equal(atoms.getData(label), ATOMS.getData(label),
+                         'failed to load ' + label)
+        for label in ATOMS.getFlagLabels('user'):
+            assert_equal(atoms.getFlags(label), ATOMS.getFlags(label),
+                         'failed to load ' + label)
+
+    def testSaveLoadCategorical(self):
+
+        atoms = ATOMS.copy()
+        atoms.setCategorical('name')
+        atoms.setCategorical('resname')
+        for format, mmap_mode in [('npz', None), ('npy', None), ('npy', 'r')]:
+            filename = saveAtoms(atoms, os.path.join(TEMPDIR, 'atoms'),
+                                 format=format)
+            loaded = loadAtoms(filename, mmap_mode=mmap_mode)
+            self.assertTrue(loaded.isCategorical('name'))
+            self.assertTrue(loaded.isCategorical('resname'))
+            self.assertFalse(loaded.isCategorical('chain'))
+            assert_equal(loaded._getCategories('name')[0],
+                         atoms._getCategories('name')[0])
+            assert_equal(loaded.getNames(), ATOMS.getNames())
+            assert_equal(loaded.getResnames(), ATOMS.getResnames())
+            self.assertEqual(loaded.select('name CA').numAtoms(),
+                             ATOMS.select('name CA').numAtoms())
+
+        selection = atoms.select('name CA')
+        loaded = loadAtoms(saveAtoms(selection,
+                                     os.path.join(TEMPDIR, 'atoms')))
+        self.assertTrue(loaded.isCategorical('name'))
+        assert_equal(loaded.getNames(), selection.getNames())
+
+
+class TestAtomsCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.current = SETTINGS.get('atoms_cache_folder')
+        self.size = SETTINGS.get('atoms_cache_size')
+        self.folder = os.path.join(TEMPDIR, 'atoms_cache')
+        if not os.path.isdir(self.folder):
+            os.mkdir(self.folder)
+        for fn in os.listdir(self.folder):
+            os.remove(os.path.join(self.folder, fn))
+        pathAtomsCache(self.folder)
+        self.pdb = pathDatafile('pdb2k39_truncated.pdb')
+
+    def testCaching(self):
+
+        parsed = parsePDB(self.pdb, subset='ca')
+        self.assertEqual(len(os.listdir(self.folder)), 1)
+        cached = parsePDB(self.pdb, subset='ca')
+        self.assertEqual(len(os.listdir(self.folder)), 1)
+        self.assertEqual(cached.getTitle(), parsed.getTitle())
+        assert_equal(cached.getCoordsets(), parsed.getCoordsets())
+        for label in parsed.getDataLabels():
+            assert_equal(cached.getData(label), parsed.getData(label),
+                         'failed to cache ' + label)
+
+    def testArguments(self):
+
+        parsePDB(self.pdb)
+        parsePDB(self.pdb, model=2)
+        self.assertEqual(len(os.listdir(self.folder)), 2)
+        ag, header = parsePDB(self.pdb, header=True)
+        self.assertEqual(len(os.listdir(self.folder)), 2)
+
+    def testEviction(self):
+
+        parsePDB(self.pdb)
+        SETTINGS['atoms_cache_size'] = 1e-6
+        parsePDB(self.pdb, model=2)
+        self.assertEqual(len(os.listdir(self.folder)), 0)
+
+    def tearDown(self):
+
+        if self.current:
+            pathAtomsCache(self.current, self.size)
+        else:
+            pathAtomsCache('')
+
 
 class TestPickling(unittest.TestCase):
 
@@ -102,6 +191,184 @@ class TestPickling(unittest.TestCase):
         self.assertEqual(atom, pickle.loads(pickle.dumps(atom)))
 
 
+class TestCategorical(unittest.TestCase):
+
+    def setUp(self):
+
+        self.atoms = ATOMS.copy()
+        self.atoms.setCategorical('name')
+        self.atoms.setCategorical('resname')
+
+    def testGetData(self):
+
+        self.assertTrue(self.atoms.isCategorical('name'))
+        assert_equal(self.atoms.getNames(), ATOMS.getNames())
+        assert_equal(self.atoms.getResnames(), ATOMS.getResnames())
+        assert_equal(self.atoms['A', 10].getResnames(),
+                     ATOMS['A', 10].getResnames())
+        self.assertEqual(self.atoms, ATOMS)
+
+    def testSelect(self):
+
+        for selstr in ['resname ALA GLY', 'resname "G.*"', 'name CA',
+                       'not resname ALA', 'resname XYZ']:
+            sel1 = self.atoms.select(selstr)
+            sel2 = ATOMS.select(selstr)
+            if sel2 is None:
+                self.assertIsNone(sel1)
+            else:
+                assert_equal(sel1.getIndices(), sel2.getIndices())
+
+    def testSetData(self):
+
+        atoms = self.atoms
+        atoms[0].setResname('XYZ')
+        atoms['A', 10].setResnames('ABC')
+        self.assertTrue(atoms.isCategorical('resname'))
+        self.assertEqual(atoms.select('resname XYZ').numAtoms(), 1)
+        self.assertEqual(atoms.select('resname ABC').numAtoms(),
+                         ATOMS['A', 10].numAtoms())
+        atoms.setCategorical('resname', False)
+        self.assertFalse(atoms.isCategorical('resname'))
+        self.assertEqual(atoms.getResnames()[0], 'XYZ')
+
+    def testSetSingleValue(self):
+
+        atoms = self.atoms
+        codes, vocab = atoms._getCategories('resname')
+        atoms[5].setResname(vocab[-1])
+        self.assertIs(atoms._getCategories('resname')[0], codes)
+        self.assertIs(atoms._getCategories('resname')[1], vocab)
+        self.assertEqual(atoms[5].getResname(), vocab[-1])
+
+        atoms[6].setResname('XYZ')
+        codes, vocab = atoms._getCategories('resname')
+        self.assertEqual(len(vocab), len(set(ATOMS.getResnames())) + 1)
+        self.assertEqual(vocab[codes[6]], 'XYZ')
+        resnames = ATOMS.getResnames()
+        resnames[5], resnames[6] = vocab[-2], 'XYZ'
+        assert_equal(atoms.getResnames(), resnames)
+
+    def testWidenCodes(self):
+
+        atoms = AtomGroup()
+        atoms.setNames(['X'] * 400)
+        atoms.setCategorical('name')
+        self.assertEqual(atoms._getCategories('name')[0].dtype, np.uint8)
+        names = ['X{0}'.format(i) for i in range(300)]
+        atoms[:300].setNames(names)
+        codes, vocab = atoms._getCategories('name')
+        self.assertEqual(codes.dtype, np.uint16)
+        assert_equal(atoms.getNames(), names + ['X'] * 100)
+
+    def testUnusedValues(self):
+
+        atoms = self.atoms
+        n_values = len(set(ATOMS.getNames()))
+        for i in range(1000):
+            atoms[0].setName('X{0}'.format(i))
+        codes, vocab = atoms._getCategories('name')
+        self.assertLessEqual(len(vocab), 2 * (n_values + 1) + 256)
+        self.assertEqual(atoms[0].getName(), 'X999')
+        assert_equal(atoms.getNames()[1:], ATOMS.getNames()[1:])
+        self.assertEqual(atoms.select('name X999').getIndices().tolist(), [0])
+
+    def testCopy(self):
+
+        atoms = self.atoms.copy()
+        self.assertTrue(atoms.isCategorical('name'))
+        assert_equal(atoms.getNames(), ATOMS.getNames())
+
+
+class TestFlags(unittest.TestCase):
+
+    def setUp(self):
+
+        self.atoms = ATOMS.copy()
+
+    def testPacked(self):
+
+        atoms = self.atoms
+        flags = atoms.getFlags('protein')
+        packed = atoms._getPackedFlags('protein')
+        self.assertEqual(len(packed), (len(atoms) + 7) // 8)
+        assert_equal(atoms.getFlags('protein'), flags)
+        self.assertEqual(atoms[3].getFlag('protein'), flags[3])
+
+    def testFieldDependency(self):
+
+        atoms = self.atoms
+        water = atoms._getPackedFlags('water')
+        atoms._getPackedFlags('protein')
+        atoms['A', 10].setNames('XX')
+        self.assertIs(atoms._getPackedFlags('water'), water)
+        self.assertNotIn('protein', atoms._flags)
+        self.assertEqual(atoms.numAtoms('protein'),
+                         ATOMS.numAtoms('protein') - 1)
+
+    def testSetFlags(self):
+
+        atoms = self.atoms
+        atoms.setFlags('test', atoms.getFlags('protein'))
+        atoms['A', 10].setFlags('test', False)
+        atoms[0].setFlag('test', False)
+        self.assertEqual(atoms.numAtoms('test'),
+                         ATOMS.numAtoms('protein') - 2)
+
+    def testSetFlag(self):
+
+        atoms = self.atoms
+        flags = np.zeros(len(atoms), bool)
+        atoms.setFlags('test', flags)
+        packed = atoms._getPackedFlags('test')
+        for index in [0, 7, 8, len(atoms) - 1]:
+            atoms[index].setFlag('test', True)
+            flags[index] = True
+            self.assertIs(atoms._getPackedFlags('test'), packed)
+            assert_equal(atoms.getFlags('test'), flags)
+            assert_equal(atoms.select('test').getIndices(), flags.nonzero()[0])
+        atoms[7].setFlag('test', False)
+        flags[7] = False
+        assert_equal(atoms.getFlags('test'), flags)
+        assert_equal(atoms.select('test').getIndices(), flags.nonzero()[0])
+
+    def testSelect(self):
+
+        atoms = self.atoms
+        for selstr in ['protein and backbone', 'water or protein',
+                       'calpha and not acidic', 'noh or none']:
+            assert_equal(atoms.select(selstr).getIndices(),
+                         atoms.select(selstr + ' and all').getIndices())
+
+
+class TestJoinAtoms(unittest.TestCase):
+
+    def testJoin(self):
+
+        parts = [ATOMS['A'].copy() for i in range(3)]
+        parts[1].setFlags('test', parts[1].getFlags('protein'))
+        joined = joinAtoms(parts)
+        added = parts[0] + parts[1] + parts[2]
+        self.assertEqual(joined.numAtoms(), added.numAtoms())
+        self.assertEqual(joined.numCoordsets(), added.numCoordsets())
+        assert_equal(joined.getCoordsets(), added.getCoordsets())
+        for label in added.getDataLabels():
+            if label not in READONLY and label != 'serial':
+                assert_equal(joined.getData(label), added.getData(label))
+        serials = joined.getSerials()
+        self.assertEqual(len(set(serials)), len(serials))
+        self.assertEqual(joined.numAtoms('test'), parts[1].numAtoms())
+
+    def testBonds(self):
+
+        part = ATOMS['A'].copy()
+        part.setBonds([[0, 1], [1, 2]])
+        joined = joinAtoms([part, part])
+        n = len(part)
+        assert_equal(joined._bonds, [[0, 1], [1, 2], [n, n + 1],
+                                     [n + 1, n + 2]])
+
+
 class TestAtomIterations(unittest.TestCase):
 
     def testAtomGroup(self):
@@ -2,7 +2,11 @@
 
 from prody.tests import TestCase
 
+from numpy import zeros
+from numpy.random import RandomState
+
 from prody import *
+from prody.atomic.bond import evalFragments, _linkFragments
 from prody.tests.datafiles import pathDatafile
 
 WHOLE = fetchPDBLigand(pathDatafile('sti'))['ideal']
@@ -57,3 +61,85 @@ class TestFragment(TestCase):
     def testSplitNohCopy(self):
 
         self.assertEqual(SPLIT_NOH_COPY.numFragments(), 5)
+
+
+class TestBondGraph(TestCase):
+
+    def setUp(self):
+
+        self.ag = AtomGroup()
+        self.ag.setCoords(zeros((8, 3)))
+        self.ag.setBonds([[0, 1], [1, 2], [3, 5], [5, 4], [2, 6]])
+
+    def testFragindices(self):
+
+        self.assertEqual(list(self.ag.getFragindices()),
+                         [0, 0, 0, 1, 1, 1, 0, 2])
+
+    def testStarFragments(self):
+
+        # atoms bonded to a center with the largest index in each fragment
+        bonds = [[i, 9] for i in range(1, 9)] + [[10, 12], [11, 12]]
+        for func in (evalFragments, _linkFragments):
+            fragments = func(bonds, 14)
+            self.assertEqual(list(fragments), [0] + [1] * 9 + [2] * 3 + [3])
+            fragments = func([[9, i] for i in range(9)], 10)
+            self.assertEqual(list(fragments), [0] * 10)
+
+    def testRandomFragments(self):
+
+        random = RandomState(0)
+        bonds = random.randint(0, 1000, (700, 2))
+        self.assertEqual(list(evalFragments(bonds, 1000)),
+                         list(_linkFragments(bonds, 1000)))
+
+    def testBondGraph(self):
+
+        indptr, indices = self.ag._getBondGraph()
+        self.assertEqual(list(indptr), [0, 1, 3, 5, 6, 7, 9, 10, 10])
+        self.assertEqual(list(indices), [1, 0, 2, 1, 6, 5, 5, 3, 4, 2])
+
+    def testBondedTo(self):
+
+        sel = self.ag.select('bonded 2 to index 0')
+        self.assertEqual(list(sel.getIndices()), [0, 1, 2])
+        sel = self.ag.select('exbonded 3 to index 0')
+        self.assertEqual(list(sel.getIndices()), [1, 6])
+        sel = self.ag[1:].select('bonded to index 3')
+        self.assertEqual(list(sel.getIndices()), [3, 5])
+
+
+class TestInferBonds(TestCase):
+
+    def bondSet(self, atoms):
+
+        return set(tuple(bond) for bond in atoms._bonds)
+
+    def testElements(self):
+
+        ag = WHOLE.copy()
+        self.assertEqual(ag.inferBonds(), WHOLE.numBonds())
+        self.assertEqual(self.bondSet(ag), self.bondSet(WHOLE))
+
+    def testNames(self):
+
+        ag = WHOLE.copy()
+        ag.setElements([''] * len(ag))
+        ag.inferBonds()
+        self.assertEqual(self.bondSet(ag), self.bondSet(WHOLE))
+
+    def testResidues(self):
+
+        ag = parsePDB(pathDatafile('pdb1ubi.pdb'))
+        ag.inferBonds(residues=True)
+        protein = ag.select('protein')
+        self.assertEqual(len(set(protein.getFragindices())), 1)
+        self.assertEqual(ag.numFragments(), ag.select('water').numAtoms() + 1)
+
+    def testNoBonds(self):
+
+        ag = AtomGroup()
+        ag.setCoords([[0., 0., 0.], [10., 0., 0.]])
+        ag.setElements(['C', 'C'])
+        self.assertEqual(ag.inferBonds(), 0)
+        self.assertEqual(ag.numFragments(), 2)
@@ -45,4 +45,36 @@ class TestTerRecord(TestCase):
 
     def testSelectionResidueIndexing2(self):
 
-        self.assertEqual(len(RTER[20:].getHierView()['A', 866]), 3)
\ No newline at end of file
+        self.assertEqual(len(RTER[20:].getHierView()['A', 866]), 3)
+
+class TestNonContiguous(TestCase):
+
+    def setUp(self):
+
+        self.ag = AtomGroup()
+        self.ag.setCoords(arange(24.).reshape((8, 3)))
+        self.ag.setChids(['A', 'A', 'B', 'B', 'A', 'A', 'B', 'C'])
+        self.ag.setResnums([1, 1, 1, 1, 2, 1, 1, 1])
+
+    def testChains(self):
+
+        hv = self.ag.getHierView()
+        self.assertEqual(hv.numChains(), 3)
+        self.assertEqual(list(hv['A'].getIndices()), [0, 1, 4, 5])
+        self.assertEqual(list(self.ag.getChindices()),
+                         [0, 0, 1, 1, 0, 0, 1, 2])
+
+    def testResidues(self):
+
+        hv = self.ag.getHierView()
+        self.assertEqual(hv.numResidues(), 4)
+        self.assertEqual(list(hv['A', 1].getIndices()), [0, 1, 5])
+        self.assertEqual(list(hv['B', 1].getIndices()), [2, 3, 6])
+        self.assertEqual(list(self.ag.getResindices()),
+                         [0, 0, 1, 1, 2, 0, 1, 3])
+
+    def testSelection(self):
+
+        hv = self.ag.select('resnum 1').getHierView()
+        self.assertEqual(hv.numResidues(), 3)
+        self.assertEqual(list(hv['A', 1].getIndices()), [0, 1, 5])
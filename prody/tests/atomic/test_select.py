@@ -542,3 +542,116 @@ def testGetBoolArray():
     ca = pdb3mht.ca
     assert_equal(len(ca), len(SELECT.getBoolArray(ca, 'index 510')))
 
+
+
+class TestCompiledSelection(unittest.TestCase):
+
+    """Test compiled selections."""
+
+    def testSelect(self):
+
+        for selstr in ['protein and name CA', 'water or resnum 1 to 10',
+                       'sqrt(sq(x) + sq(y)) < 40 and not hydrogen']:
+            compiled = prody.compileSelection(selstr)
+            assert_equal(pdb3mht.select(compiled).getIndices(),
+                         pdb3mht.select(selstr).getIndices())
+            assert_equal(compiled.select(pdb3mht.protein).getIndices(),
+                         pdb3mht.protein.select(selstr).getIndices())
+
+    def testSelstr(self):
+
+        compiled = prody.compileSelection('name CA')
+        self.assertEqual(pdb3mht.select(compiled).getSelstr(), 'name CA')
+
+    def testUnicode(self):
+
+        compiled = prody.compileSelection(u'name CA')
+        assert_equal(pdb3mht.select(compiled).getIndices(),
+                     pdb3mht.select('name CA').getIndices())
+        self.assertRaises(TypeError, prody.compileSelection, 1)
+
+    def testKeywordArguments(self):
+
+        compiled = prody.compileSelection('within 5 of center')
+        center = prody.calcCenter(pdb3mht)
+        assert_equal(compiled.select(pdb3mht, center=center).getIndices(),
+                     pdb3mht.select('within 5 of center',
+                                    center=center).getIndices())
+
+    def testCacheSize(self):
+
+        for i in range(prody.atomic.select.COMPILED_MAXSIZE + 10):
+            prody.compileSelection('resnum {0}'.format(i))
+        self.assertEqual(len(prody.atomic.select.COMPILED),
+                         prody.atomic.select.COMPILED_MAXSIZE)
+
+
+class TestSelectionCache(unittest.TestCase):
+
+    """Test caching of selection results for atom groups."""
+
+    def setUp(self):
+
+        self.ag = pdb3mht.copy()
+
+    def testCachedResult(self):
+
+        indices = self.ag.select('protein and name CA').getIndices()
+        self.assertEqual(len(self.ag._selcache), 1)
+        assert_equal(self.ag.select('protein and name CA').getIndices(),
+                     indices)
+        self.assertEqual(len(self.ag._selcache), 1)
+
+    def testDataChange(self):
+
+        ag = self.ag
+        n_ca = len(ag.select('name CA and protein'))
+        ag.select('name CA')[0].setName('XX')
+        self.assertEqual(len(ag.select('name CA and protein')), n_ca - 1)
+        names = ag.getNames()
+        names[names == 'XX'] = 'CA'
+        ag.setNames(names)
+        self.assertEqual(len(ag.select('name CA and protein')), n_ca)
+
+    def testCoordinateChange(self):
+
+        ag = self.ag
+        selstr = 'protein and within 5 of center'
+        center = prody.calcCenter(ag)
+        before = ag.select(selstr, center=center).getIndices()
+        self.assertEqual(len(ag.select('x > 0 and protein')),
+                         (ag.protein.getCoords()[:, 0] > 0).sum())
+        ag.setCoords(ag.getCoords() + [100, 0, 0])
+        self.assertEqual(len(ag.select('x > 0 and protein')),
+                         (ag.protein.getCoords()[:, 0] > 0).sum())
+        assert_equal(ag.select(selstr, center=center + [100, 0, 0])
+                     .getIndices(), before)
+
+    def testImmediateCoordinateChange(self):
+
+        ag = self.ag
+        atom = ag[0]
+        x = abs(atom.getCoords()[0]) + 1
+        for sign in [1, -1] * 10:
+            stamp = ag._getTimeStamp(None)
+            atom.setCoords([sign * x, 0, 0])
+            self.assertGreater(ag._getTimeStamp(None), stamp)
+            self.assertEqual(0 in ag.select('x > 0').getIndices(), sign > 0)
+            ag.setCoords(ag.getCoords())
+            self.assertEqual(0 in ag.select('x < 0').getIndices(), sign < 0)
+
+    def testDeleteCoordset(self):
+
+        ag = AtomGroup()
+        ag.setCoords(np.array([[[1., 0., 0.], [-1., 0., 0.]],
+                               [[-1., 0., 0.], [1., 0., 0.]]]))
+        assert_equal(ag.select('x > 0').getIndices(), [0])
+        ag.delCoordset(0)
+        assert_equal(ag.select('x > 0').getIndices(), [1])
+
+    def testCacheSize(self):
+
+        for i in range(prody.atomic.select.SELCACHE_MAXSIZE + 5):
+            self.ag.select('resnum {0} and name CA'.format(i))
+        self.assertEqual(len(self.ag._selcache),
+                         prody.atomic.select.SELCACHE_MAXSIZE)
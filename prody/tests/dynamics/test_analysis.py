@@ -0,0 +1,45 @@
+"""This module contains unit tests for :mod:`prody.dynamics.analysis`
+module."""
+
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+from prody.dynamics import PCA, calcProjection
+from prody.trajectory import DCDFile
+
+from prody.tests import unittest
+from prody.tests.datafiles import parseDatafile, pathDatafile
+
+from prody import LOGGER
+
+LOGGER.verbosity = 'none'
+
+ENSEMBLE = parseDatafile('dcd', astype=float)
+PCA_MODEL = PCA()
+PCA_MODEL.buildCovariance(ENSEMBLE)
+PCA_MODEL.calcModes(3)
+
+
+class TestProjection(unittest.TestCase):
+
+    def testTrajectoryChunks(self):
+
+        dcd = DCDFile(pathDatafile('dcd'), astype=float)
+        assert_array_almost_equal(calcProjection(dcd, PCA_MODEL, chunk=2),
+                                  calcProjection(ENSEMBLE, PCA_MODEL))
+
+    def testTrajectoryOut(self):
+
+        dcd = DCDFile(pathDatafile('dcd'), astype=float)
+        out = np.zeros((len(dcd), PCA_MODEL.numModes()))
+        result = calcProjection(dcd, PCA_MODEL, norm=False, out=out)
+        self.assertTrue(result is out)
+        assert_array_almost_equal(out, calcProjection(ENSEMBLE, PCA_MODEL,
+                                                      norm=False))
+
+    def testTrajectoryArguments(self):
+
+        self.assertRaises(TypeError, calcProjection, ENSEMBLE, PCA_MODEL,
+                          chunk=2)
+        self.assertRaises(TypeError, calcProjection, ENSEMBLE, PCA_MODEL,
+                          superpose=True)
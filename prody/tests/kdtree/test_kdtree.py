@@ -1,6 +1,6 @@
 """This module contains unit tests for :mod:`~prody.KDTree` module."""
 
-from numpy import tile, array, arange, ones
+from numpy import tile, array, arange, ones, zeros
 from numpy.testing import assert_allclose
 
 from prody.tests import unittest
@@ -73,3 +73,171 @@ class TestKDTreePBC(unittest.TestCase):
         KDTREE_PBC.search(2)
         self.assertEqual(8, KDTREE_PBC.getCount())
 
+
+
+class TestSearchCenters(unittest.TestCase):
+
+    def setUp(self):
+
+        self.coords = tile(arange(10), (3,1)).T.astype(float)
+        self.kdtree = KDTree(self.coords)
+        self.centers = array([[0., 0., 0.], [4.5, 4.5, 4.5], [20., 20., 20.]])
+
+    def testCSR(self):
+
+        kdtree = self.kdtree
+        indptr, indices, radii = kdtree.searchCenters(2, self.centers)
+        self.assertEqual(len(indptr), len(self.centers) + 1)
+        for i, center in enumerate(self.centers):
+            kdtree.search(2, center)
+            found = indices[indptr[i]:indptr[i+1]]
+            expected = kdtree.getIndices()
+            if expected is None:
+                self.assertEqual(len(found), 0)
+                continue
+            self.assertEqual(sorted(found), sorted(expected))
+            assert_allclose(radii[indptr[i]:indptr[i+1]],
+                            ((self.coords[found] - center)**2).sum(1)**0.5,
+                            rtol=RTOL, atol=ATOL)
+
+    def testMask(self):
+
+        mask = self.kdtree.searchCenters(2, self.centers, mask=True)
+        self.assertEqual(mask.nonzero()[0].tolist(), [0, 1, 4, 5])
+
+    def testArraySizes(self):
+
+        ckdtree = self.kdtree._kdtree
+        self.assertRaises(ValueError, ckdtree.search_centers_radius,
+                          self.centers, 2., zeros(5, bool))
+        self.assertRaises(ValueError, ckdtree.search_centers_radius,
+                          self.centers[:, :2], 2., zeros(10, bool))
+        self.assertRaises(ValueError, ckdtree.count_centers_radius,
+                          self.centers[:, :2], 2., zeros(3, int))
+
+    def testPBC(self):
+
+        centers = array([[2., 2., 0.], [-1., -1., 0.]])
+        indptr, indices, radii = KDTREE_PBC.searchCenters(2, centers)
+        KDTREE_PBC.search(2, centers[0])
+        self.assertEqual(indptr[1], KDTREE_PBC.getCount())
+        mask = KDTREE_PBC.searchCenters(2, centers, mask=True)
+        self.assertEqual(sorted(set(indices)), mask.nonzero()[0].tolist())
+
+
+class TestNearestAndCount(unittest.TestCase):
+
+    def setUp(self):
+
+        self.coords = tile(arange(10), (3,1)).T.astype(float)
+        self.kdtree = KDTree(self.coords)
+        self.centers = array([[0., 0., 0.], [4.2, 4.2, 4.2], [20., 20., 20.]])
+
+    def testNearest(self):
+
+        indices, radii = self.kdtree.searchNearest(self.centers, 2)
+        self.assertEqual(indices.shape, (3, 2))
+        self.assertEqual(indices.tolist(), [[0, 1], [4, 5], [9, 8]])
+        dist = ((self.coords[indices] - self.centers[:, None])**2).sum(2)**0.5
+        assert_allclose(radii, dist, rtol=RTOL, atol=ATOL)
+
+    def testNearestSingle(self):
+
+        indices, radii = self.kdtree.searchNearest(array([9., 9., 9.]))
+        self.assertEqual(indices.tolist(), [9])
+        assert_allclose(radii, [0], rtol=RTOL, atol=ATOL)
+
+    def testNearestPBC(self):
+
+        indices, radii = KDTREE_PBC.searchNearest(array([2., 2., 0.]), 5)
+        self.assertEqual(sorted(indices.tolist()), list(range(5)))
+        assert_allclose(radii[1:], ones(4) * 2**0.5, rtol=RTOL, atol=ATOL)
+
+    def testCount(self):
+
+        counts = self.kdtree.countCenters(2, self.centers)
+        self.assertEqual(counts.tolist(), [2, 2, 0])
+        indptr = self.kdtree.searchCenters(2, self.centers)[0]
+        self.assertEqual(counts.tolist(), (indptr[1:] - indptr[:-1]).tolist())
+
+
+class TestCellList(unittest.TestCase):
+
+    def setUp(self):
+
+        from numpy.random import RandomState
+        self.coords = RandomState(0).rand(300, 3) * 20
+
+    def bruteForce(self, unitcell):
+
+        from numpy import dot, floor, triu_indices
+        from numpy.linalg import inv
+        from prody.kdtree.celllist import getCellVectors
+        box = getCellVectors(unitcell)
+        frac = dot(self.coords[:, None] - self.coords[None], inv(box))
+        frac -= floor(frac + 0.5)
+        dist = (dot(frac, box)**2).sum(-1)**0.5
+        return dist, triu_indices(len(self.coords), 1)
+
+    def testNoPBC(self):
+
+        kdtree = KDTree(self.coords)
+        cells = KDTree(self.coords, method='celllist')
+        kdtree.search(3.)
+        cells.search(3.)
+        self.assertEqual(kdtree.getCount(), cells.getCount())
+        pairs = kdtree.getIndices()
+        pairs.sort(1)
+        self.assertEqual(sorted(map(tuple, pairs.tolist())),
+                         list(map(tuple, cells.getIndices().tolist())))
+
+    def testOrthorhombic(self):
+
+        unitcell = array([20., 20., 20.])
+        dist, upper = self.bruteForce(unitcell)
+        cells = KDTree(self.coords, unitcell=unitcell, method='celllist')
+        cells.search(4.)
+        self.assertEqual(cells.getCount(), (dist[upper] <= 4.).sum())
+        i, j = cells.getIndices().T
+        assert_allclose(cells.getDistances(), dist[i, j],
+                        rtol=RTOL, atol=ATOL)
+
+    def testTriclinic(self):
+
+        unitcell = array([20., 20., 20., 70., 80., 100.])
+        dist, upper = self.bruteForce(unitcell)
+        cells = KDTree(self.coords, unitcell=unitcell)
+        cells.search(4.)
+        self.assertEqual(cells.getCount(), (dist[upper] <= 4.).sum())
+        indptr, indices, radii = cells.searchCenters(4., self.coords[:10])
+        for i in range(10):
+            self.assertEqual(sorted(indices[indptr[i]:indptr[i+1]]),
+                             (dist[i] <= 4.).nonzero()[0].tolist())
+
+    def testTriclinicLargeRadius(self):
+
+        # radius is longer than half of the width of the box, 21.2 A
+        from itertools import product
+        from numpy import dot, inf, minimum, triu_indices
+        from prody.kdtree.celllist import getCellVectors
+        unitcell = array([30., 30., 30., 60., 60., 90.])
+        box = getCellVectors(unitcell)
+        coords = self.coords * 1.5
+        delta = coords[:, None] - coords[None]
+        dist = inf
+        for image in dot(list(product(range(-2, 3), repeat=3)), box):
+            dist = minimum(dist, ((delta + image)**2).sum(-1)**0.5)
+        upper = triu_indices(len(coords), 1)
+        cells = KDTree(coords, unitcell=unitcell, method='celllist')
+        for radius in (11., 14.):
+            cells.search(radius)
+            self.assertEqual(cells.getCount(), (dist[upper] <= radius).sum())
+            i, j = cells.getIndices().T
+            assert_allclose(cells.getDistances(), dist[i, j],
+                            rtol=RTOL, atol=ATOL)
+
+    def testTriclinicKDTree(self):
+
+        self.assertRaises(ValueError, KDTree, self.coords,
+                          unitcell=array([20., 20., 20., 70., 80., 100.]),
+                          method='kdtree')
@@ -1,11 +1,15 @@
+import os
+
 from numpy import array, concatenate, unique
 from numpy.testing import assert_array_equal, assert_equal
 
-from prody.tests import unittest
+from prody.tests import unittest, TEMPDIR
 from prody.tests.datafiles import parseDatafile, pathDatafile
 
-from prody.measure import Contacts, findNeighbors, iterNeighbors
+from prody.measure import Contacts, ContactSeries, findNeighbors, iterNeighbors
 from prody.measure import buildDistMatrix, calcDistance
+from prody.atomic import AtomGroup
+from prody.trajectory import DCDFile
 
 
 UBI = parseDatafile('1ubi')
@@ -118,3 +122,69 @@ class TestNeighbors(unittest.TestCase):
         neighbors1.sort()
         neighbors2.sort()
         self.assertEqual(neighbors1, neighbors2)
+
+
+class TestContactSeries(unittest.TestCase):
+
+    def setUp(self):
+
+        self.atoms = parseDatafile('multi_model_truncated')
+        self.coordsets = self.atoms.getCoordsets()
+
+    def testContacts(self):
+
+        series = ContactSeries(self.atoms, 4.0, chunk=2)
+        self.assertEqual(series.numFrames(), len(self.coordsets))
+        pairs = series.getPairs()
+        for i, coords in enumerate(self.coordsets):
+            dist = buildDistMatrix(coords)
+            row, col = (dist <= 4.0).nonzero()
+            which = row < col
+            assert_array_equal(pairs[series.getContacts(i)],
+                               array([row[which], col[which]]).T)
+
+    def testFrequencies(self):
+
+        series = ContactSeries(self.atoms, 4.0, residues=True)
+        resindices = self.atoms.getResindices()
+        counts = series.getCounts()
+        for (a, b), count in zip(series.getPairs()[:20], counts):
+            dist = calcDistance(self.coordsets[:, resindices == a, None],
+                                self.coordsets[:, None, resindices == b])
+            assert_equal((dist <= 4.0).any(-1).any(-1).sum(), count)
+
+    def testLifetimes(self):
+
+        coordsets = self.coordsets[[0, 0, 1, 0, 1, 1, 1]]
+        series = ContactSeries(self.atoms, 4.0, coordsets)
+        ids, firsts, lengths = series.getEvents()
+        assert_equal(lengths.sum(), len(series.getCSR()[1]))
+        counts = series.getCounts()
+        lifetimes = series.getLifetimes()
+        assert_equal(lifetimes[counts == 7], 7)
+        self.assertTrue((lifetimes <= counts).all())
+
+    def testUnitcells(self):
+
+        # atoms are in contact across the boundary of the first unit cell only
+        atoms = AtomGroup()
+        atoms.setCoords(array([[1., 5., 5.], [9., 5., 5.]]))
+        filename = os.path.join(TEMPDIR, 'contacts.dcd')
+        dcd = DCDFile(filename, 'w')
+        dcd.write(atoms.getCoords(), array([10., 10., 10., 90., 90., 90.]))
+        dcd.write(atoms.getCoords(), array([20., 20., 20., 90., 90., 90.]))
+        dcd.close()
+        dcd = DCDFile(filename)
+        try:
+            series = ContactSeries(atoms, 3.0, dcd, chunk=1, unitcell=True)
+            assert_array_equal(series.getPairs(), [[0, 1]])
+            self.assertEqual(len(series.getContacts(0)), 1)
+            self.assertEqual(len(series.getContacts(1)), 0)
+            series = ContactSeries(atoms, 3.0, dcd,
+                                   unitcell=array([10., 10., 10.]))
+            self.assertEqual(len(series.getContacts(1)), 1)
+            series = ContactSeries(atoms, 3.0, dcd)
+            self.assertEqual(series.numPairs(), 0)
+        finally:
+            dcd.close()
+            os.remove(filename)
@@ -1,6 +1,6 @@
 """This module contains unit tests for :mod:`prody.measure.measure` module."""
 
-from numpy import array, ones, arange
+from numpy import array, ones, arange, isnan
 from numpy.testing import assert_approx_equal, assert_equal
 from numpy.testing import assert_array_almost_equal
 
@@ -9,8 +9,9 @@ from prody.tests.datafiles import parseDatafile, pathDatafile
 
 from prody.trajectory import DCDFile
 from prody.measure import calcDistance, buildDistMatrix
-from prody.measure import calcAngle, calcPsi, calcPhi
-from prody.measure import calcCenter
+from prody.measure import calcAngle, calcPsi, calcPhi, calcOmega
+from prody.measure import calcDihedral, calcTorsions, getTorsionIndices
+from prody.measure import calcCenter, calcGyradius, calcInternalCoords
 from prody.measure import calcMSF
 from prody import LOGGER
 LOGGER.verbosity = None
@@ -53,6 +54,40 @@ class TestDihedrals(unittest.TestCase):
         self.assertRaises(ValueError, calcPsi, (UBI_CTER))
 
 
+class TestTorsions(unittest.TestCase):
+
+    """Test vectorized calculation of torsion angles."""
+
+    def testBackbone(self):
+
+        angles = calcTorsions(UBI, ['phi', 'psi', 'omega'])
+        self.assertEqual(angles.shape, (76, 3))
+        assert_approx_equal(calcPhi(UBI_GLY10), angles[9, 0], 5)
+        assert_approx_equal(calcPsi(UBI_GLY10), angles[9, 1], 5)
+        assert_approx_equal(calcOmega(UBI_GLY10), angles[9, 2], 5)
+        self.assertTrue(isnan(angles[0, 0]) and isnan(angles[-1, 1:]).all())
+        self.assertEqual(isnan(angles).sum(), 3)
+
+    def testSideChain(self):
+
+        met1 = UBI_NTER
+        chi = calcTorsions(UBI, ['chi1', 'chi2'])
+        assert_approx_equal(calcDihedral(met1['N'], met1['CA'], met1['CB'],
+                                         met1['CG']), chi[0, 0], 5)
+        assert_approx_equal(calcDihedral(met1['CA'], met1['CB'], met1['CG'],
+                                         met1['SD']), chi[0, 1], 5)
+        self.assertTrue(isnan(chi[9]).all())
+
+    def testCoordsets(self):
+
+        indices = getTorsionIndices(ATOMS, 'psi')
+        angles = calcTorsions(ATOMS, 'psi', ATOMS, indices=indices)
+        self.assertEqual(angles.shape[0], ATOMS.numCoordsets())
+        for i, coords in enumerate(ATOMS.getCoordsets()):
+            assert_array_almost_equal(angles[i],
+                                      calcTorsions(ATOMS, 'psi', coords))
+
+
 SYM_ONE = ones((5,3)) * arange(5).reshape((5,1))
 SYM_TWO = ones((5,3)) * arange(5).reshape((5,1)) * 3
 SYM_UC = ones(3) * 5
@@ -76,6 +111,48 @@ class TestDistances(unittest.TestCase):
         assert_equal(PBC_DIST, calcDistance(PBC_ONE, PBC_TWO, unitcell=PBC_UC))
         assert_equal(PBC_DIST, calcDistance(PBC_TWO, PBC_ONE, unitcell=PBC_UC))
 
+
+UBI_XYZ = UBI._getCoords()
+UBI_DIST = calcDistance(UBI_XYZ[:, None], UBI_XYZ)
+
+class TestDistMatrix(unittest.TestCase):
+
+    def testMatrix(self):
+
+        assert_array_almost_equal(buildDistMatrix(UBI_XYZ), UBI_DIST)
+        assert_array_almost_equal(buildDistMatrix(UBI_XYZ, n_cpu=2), UBI_DIST)
+        assert_array_almost_equal(buildDistMatrix(UBI_XYZ[:10], UBI_XYZ),
+                                  UBI_DIST[:10])
+
+    def testFloat32(self):
+
+        dist = buildDistMatrix(UBI_XYZ, dtype='float32')
+        self.assertEqual(dist.dtype, 'float32')
+        assert_array_almost_equal(dist, UBI_DIST, 4)
+
+    def testRCD(self):
+
+        row, col, dist = buildDistMatrix(UBI_XYZ, format='rcd')
+        self.assertTrue((row < col).all())
+        assert_array_almost_equal(dist, UBI_DIST[row, col])
+        assert_equal(buildDistMatrix(UBI_XYZ, format='arr', n_cpu=2), dist)
+
+    def testPBC(self):
+
+        dist = buildDistMatrix(SYM_ONE, SYM_TWO, unitcell=SYM_UC)
+        assert_equal(dist, calcDistance(SYM_ONE[:, None], SYM_TWO,
+                                        unitcell=SYM_UC))
+
+    def testSparse(self):
+
+        try:
+            import scipy.sparse
+        except ImportError:
+            raise unittest.SkipTest('scipy.sparse is not available')
+        dist = buildDistMatrix(UBI_XYZ, cutoff=7., sparse=True)
+        dense = UBI_DIST * (UBI_DIST <= 7.)
+        assert_array_almost_equal(dist.toarray(), dense)
+
 ATOMS = parseDatafile('multi_model_truncated')
 CENTERS = ATOMS.getCoordsets().mean(-2)
 
@@ -99,6 +176,62 @@ class TestCenter(unittest.TestCase):
         assert_equal(calcCenter(ATOMS.getCoordsets(),
                                 weights=ones(len(ATOMS))), CENTERS)
 
+    def testTrajectory(self):
+
+        dcd = DCDFile(pathDatafile('dcd'))
+        ens = parseDatafile('dcd')
+        assert_array_almost_equal(calcCenter(dcd, chunk=3, frames=True),
+                                  ens.getCoordsets().mean(-2), 4)
+
+    def testEnsemble(self):
+
+        ens = parseDatafile('dcd')
+        self.assertEqual(calcCenter(ens).shape, (3,))
+        assert_array_almost_equal(calcCenter(ens), ens.getCoords().mean(0))
+        assert_array_almost_equal(calcCenter(ens, frames=True),
+                                  ens.getCoordsets().mean(-2))
+        dcd = DCDFile(pathDatafile('dcd'))
+        dcd.setCoords(ens.getCoords())
+        self.assertEqual(calcCenter(dcd).shape, (3,))
+        assert_array_almost_equal(calcCenter(dcd), ens.getCoords().mean(0))
+
+
+class TestBatches(unittest.TestCase):
+
+    """Test calculations for multiple coordinate sets at once."""
+
+    def testGyradius(self):
+
+        coordsets = ATOMS.getCoordsets()
+        assert_array_almost_equal(calcGyradius(coordsets),
+                                  [calcGyradius(xyz) for xyz in coordsets])
+
+    def testGyradiusWithWeights(self):
+
+        coords = ATOMS.getCoords()
+        weights = arange(len(ATOMS)) + 1.
+        center = calcCenter(coords, weights)
+        rgyr = (((coords - center) ** 2).sum(1) * weights).sum()
+        assert_approx_equal(calcGyradius(coords, weights),
+                            (rgyr / weights.sum()) ** 0.5)
+
+    def testInternalCoords(self):
+
+        coordsets = ATOMS.getCoordsets()
+        indices = [[0, 1, 2, 3], [3, 2, 1, 0], [1, 4, 5, 6]]
+        values = calcInternalCoords(coordsets, indices)
+        self.assertEqual(values.shape, (len(coordsets), 3))
+        for i, (a, b, c, d) in enumerate(indices):
+            assert_array_almost_equal(values[:, i], calcDihedral(
+                coordsets[:, a], coordsets[:, b], coordsets[:, c],
+                coordsets[:, d]))
+        values = calcInternalCoords(ATOMS, [[0, 1, 2]])
+        assert_approx_equal(values[0], calcAngle(ATOMS[0], ATOMS[1],
+                                                 ATOMS[2]))
+        values = calcInternalCoords(ATOMS, [[0, 1], [1, 2]])
+        assert_array_almost_equal(values, [calcDistance(ATOMS[0], ATOMS[1]),
+                                           calcDistance(ATOMS[1], ATOMS[2])])
+
 class TestMSF(unittest.TestCase):
 
     def testMSF(self):
@@ -114,3 +247,21 @@ class TestMSF(unittest.TestCase):
         ens = parseDatafile('dcd', astype=float)
         ens.superpose()
         assert_array_almost_equal(calcMSF(dcd), calcMSF(ens), 10)
+
+    def testMSFchunk(self):
+
+        dcd = DCDFile(pathDatafile('dcd'), astype=float)
+        ens = parseDatafile('dcd', astype=float)
+        ens.superpose()
+        assert_array_almost_equal(calcMSF(dcd, chunk=2), calcMSF(ens), 10)
+
+    def testMSFwindow(self):
+
+        dcd = DCDFile(pathDatafile('dcd'), astype=float)
+        ens = parseDatafile('dcd', astype=float)
+        ens.superpose()
+        msf, windows = calcMSF(dcd, window=2)
+        assert_array_almost_equal(msf, calcMSF(ens), 10)
+        assert_equal(windows.shape, (2, len(msf)))
+        assert_array_almost_equal(windows[0],
+                                  calcMSF(ens.getCoordsets()[:2]), 10)
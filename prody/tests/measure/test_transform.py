@@ -1,13 +1,20 @@
 """This module contains unit tests for :mod:`prody.measure.transform` module.
 """
 
-from numpy import zeros, ones, eye, all
-from numpy.testing import assert_equal
+from numpy import zeros, ones, eye, all, array, dot, floor, repeat, arange
+from numpy import concatenate
+from numpy.linalg import qr, inv
+from numpy.random import RandomState
+from numpy.testing import assert_equal, assert_array_almost_equal
 
 from prody.tests import unittest
 from prody.tests.datafiles import parseDatafile
 
-from prody.measure import moveAtoms, wrapAtoms
+from prody.measure import moveAtoms, wrapAtoms, calcRMSD, alignCoordsets
+from prody.measure import calcTransformation, calcTransformations
+from prody.measure import applyTransformations, iterWrapped
+from prody.kdtree.celllist import getCellVectors
+from prody.atomic import AtomGroup
 
 UBI = parseDatafile('1ubi')
 
@@ -40,6 +47,45 @@ class TestMoveAtoms(unittest.TestCase):
         assert_equal(UBI._getCoords(), coords)
 
 
+class TestTransformations(unittest.TestCase):
+
+    def setUp(self):
+
+        random = RandomState(0)
+        self.target = UBI.ca.getCoords()
+        self.mobiles = array([dot(self.target, qr(random.randn(3, 3))[0]) +
+                              random.randn(3) for i in range(10)])
+        self.mobiles += random.randn(*self.mobiles.shape) * 0.1
+
+    def testMatrices(self):
+
+        matrices, rmsds = calcTransformations(self.mobiles, self.target)
+        self.assertEqual(matrices.shape, (10, 4, 4))
+        for i, mobile in enumerate(self.mobiles):
+            assert_array_almost_equal(matrices[i], calcTransformation(
+                mobile, self.target).getMatrix())
+
+    def testApply(self):
+
+        weights = ones((len(self.target), 1))
+        matrices, rmsds = calcTransformations(list(self.mobiles),
+                                              self.target, weights)
+        applyTransformations(matrices, self.mobiles)
+        assert_array_almost_equal(calcRMSD(self.target, self.mobiles), rmsds)
+        self.assertTrue((rmsds < 0.5).all())
+
+    def testAlignCoordsets(self):
+
+        atoms = UBI.ca.copy()
+        atoms.setCoords(self.mobiles)
+        atoms.setACSIndex(3)
+        alignCoordsets(atoms)
+        self.assertEqual(atoms.getACSIndex(), 3)
+        assert_equal(atoms.getCoordsets(3), self.mobiles[3])
+        rmsds = calcRMSD(self.mobiles[3], atoms.getCoordsets())
+        self.assertTrue((rmsds < 0.5).all())
+
+
 class TestWrapAtoms(unittest.TestCase):
 
     def testWrap(self):
@@ -52,3 +98,50 @@ class TestWrapAtoms(unittest.TestCase):
         diff = xyz - UBI.getCoords()
         self.assertTrue(all(diff == unitcell))
 
+    def testWrapSelect(self):
+
+        atoms = AtomGroup()
+        atoms.setCoords(array([[6., 0., 0.], [1., 0., 0.]]))
+        assert_equal(atoms.select('x > 2').getIndices(), [0])
+        wrapAtoms(atoms, array([10., 10., 10.]))
+        self.assertIsNone(atoms.select('x > 2'))
+        assert_equal(atoms.select('x < 0').getIndices(), [0])
+
+
+    def testTriclinic(self):
+
+        unitcell = array([40., 45., 50., 70., 80., 100.])
+        box = getCellVectors(unitcell)
+        coords = RandomState(0).uniform(-100, 100, (5, 100, 3))
+        wrapped = wrapAtoms(coords.copy(), unitcell)
+        frac = dot(wrapped, inv(box))
+        self.assertTrue((frac >= -0.5).all() and (frac < 0.5).all())
+        shift = dot(coords - wrapped, inv(box))
+        assert_array_almost_equal(shift, floor(shift + 0.5))
+
+    def testFragments(self):
+
+        random = RandomState(1)
+        unitcell = array([30., 30., 30.])
+        fragments = repeat(arange(20), 5)
+        coords = (repeat(random.uniform(-10, 10, (20, 3)), 5, 0) +
+                  random.normal(0, 1, (100, 3)))
+        broken = coords + random.randint(-2, 3, (100, 3)) * unitcell
+        wrapped = wrapAtoms(broken.copy(), unitcell, fragments=fragments,
+                            centering=arange(5))
+        same = fragments[1:] == fragments[:-1]
+        assert_array_almost_equal((wrapped[1:] - wrapped[:-1])[same],
+                                  (coords[1:] - coords[:-1])[same])
+        assert_array_almost_equal(wrapped[:5].mean(0), zeros(3))
+        centers = wrapped.reshape((20, 5, 3)).mean(1)
+        self.assertTrue((abs(centers) <= unitcell / 2).all())
+
+    def testIterWrapped(self):
+
+        unitcell = array([30., 35., 40.])
+        coords = RandomState(2).uniform(-50, 50, (7, 10, 3))
+        wrapped = wrapAtoms(coords.copy(), unitcell)
+        blocks = list(iterWrapped(coords, unitcell))
+        assert_array_almost_equal(concatenate([b[0] for b in blocks]),
+                                  wrapped)
+        self.assertEqual(blocks[0][1].shape, (7, 3))
@@ -0,0 +1,161 @@
+"""This module contains unit tests for :mod:`~prody.proteins.ciffile`."""
+
+from io import StringIO
+
+import numpy as np
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER
+from prody.proteins import ciffile
+from prody.tests import unittest
+from prody.tests.datafiles import *
+
+LOGGER.verbosity = 'none'
+
+ATOM_SITE = ['group_PDB', 'id', 'type_symbol', 'label_atom_id',
+             'label_alt_id', 'label_comp_id', 'label_asym_id', 'label_seq_id',
+             'pdbx_PDB_ins_code', 'Cartn_x', 'Cartn_y', 'Cartn_z',
+             'occupancy', 'B_iso_or_equiv', 'auth_seq_id', 'auth_comp_id',
+             'auth_asym_id', 'auth_atom_id', 'pdbx_PDB_model_num']
+
+STRUCT = """#
+loop_
+_struct_conf.conf_type_id
+_struct_conf.id
+_struct_conf.beg_auth_comp_id
+_struct_conf.pdbx_PDB_helix_length
+HELX_P HELX_P1 ILE 12
+HELX_P HELX_P2 'LEU A' 5
+#
+_pdbx_struct_oper_list.id 1
+_pdbx_struct_oper_list.type 'identity operation'
+_pdbx_struct_oper_list.name
+1_555
+_pdbx_struct_oper_list.details
+;a multi-line
+text field
+;
+#
+"""
+
+
+def getCIFLines(ag):
+    """Returns mmCIF lines for atoms and models in *ag*."""
+
+    lines = ['data_TEST\n', '#\n', 'loop_\n']
+    lines.extend('_atom_site.{0}\n'.format(item) for item in ATOM_SITE)
+    for i, coords in enumerate(ag.getCoordsets()):
+        for atom, (x, y, z) in zip(ag, coords):
+            name = atom.getName()
+            resnum = str(atom.getResnum())
+            lines.append(' '.join([
+                'HETATM' if atom.getFlag('hetatm') else 'ATOM',
+                str(atom.getSerial()), atom.getElement(), name, '.',
+                atom.getResname(), atom.getChid(), resnum, '?',
+                '{0:.3f} {1:.3f} {2:.3f}'.format(x, y, z),
+                '{0:.2f}'.format(atom.getOccupancy()),
+                '{0:.2f}'.format(atom.getBeta()), resnum, atom.getResname(),
+                atom.getChid(), name, str(i + 1)]) + '\n')
+    return lines
+
+
+class TestParseCIFStream(unittest.TestCase):
+
+    def setUp(self):
+
+        self.ag = parsePDB(pathDatafile('pdb2k39_truncated.pdb'))
+        self.lines = getCIFLines(self.ag) + [STRUCT]
+
+    def testModels(self):
+
+        ag = parseCIFStream(StringIO(''.join(self.lines)))
+        self.assertEqual(ag.numCoordsets(), self.ag.numCoordsets())
+        assert_equal(ag.getCoordsets(), self.ag.getCoordsets())
+        assert_equal(ag.getNames(), self.ag.getNames())
+        assert_equal(ag.getResnums(), self.ag.getResnums())
+        assert_equal(ag.getSerials(), self.ag.getSerials())
+        assert_equal(ag.getBetas(), self.ag.getBetas())
+
+    def testModelArgument(self):
+
+        ag = parseCIFStream(StringIO(''.join(self.lines)), model=2)
+        self.assertEqual(ag.numCoordsets(), 1)
+        assert_equal(ag.getCoords(), self.ag.getCoordsets(1))
+        self.assertRaises(ciffile.CIFParseError, parseCIFStream,
+                          StringIO(''.join(self.lines)), model=5)
+
+    def testSubsetArgument(self):
+
+        ag = parseCIFStream(StringIO(''.join(self.lines)), subset='ca')
+        ca = self.ag.select('name CA')
+        self.assertEqual(ag.numCoordsets(), self.ag.numCoordsets())
+        assert_equal(ag.getCoordsets(), ca.getCoordsets())
+
+    def testAltlocArgument(self):
+
+        lines = list(self.lines)
+        i = [line.startswith('ATOM') for line in lines].index(True)
+        items = lines[i].split()
+        items[4] = 'A'
+        lines[i] = ' '.join(items) + '\n'
+        items[1], items[4], items[9] = '0', 'B', '100.000'
+        lines.insert(i + 1, ' '.join(items) + '\n')
+
+        ag = parseCIFStream(StringIO(''.join(lines)))
+        self.assertEqual(ag.numAtoms(), self.ag.numAtoms())
+        assert_equal(ag.getCoordsets(), self.ag.getCoordsets())
+
+        ag = parseCIFStream(StringIO(''.join(lines)), altloc='B')
+        self.assertEqual(ag.numAtoms(), self.ag.numAtoms())
+        self.assertEqual(ag.getCoordsets()[0, 0, 0], 100)
+
+        ag = parseCIFStream(StringIO(''.join(lines)), altloc=True)
+        n_csets = self.ag.numCoordsets()
+        self.assertEqual(ag.numAtoms(), self.ag.numAtoms())
+        self.assertEqual(ag.numCoordsets(), n_csets + 1)
+        assert_equal(ag.getCoordsets()[:n_csets], self.ag.getCoordsets())
+        coords = self.ag.getCoordsets(0)
+        coords[0, 0] = 100
+        assert_equal(ag.getCoordsets(n_csets), coords)
+        self.assertEqual(ag.getCSLabels()[-1], 'altloc B')
+
+    def testQuotedAndWrappedValues(self):
+
+        lines = []
+        for line in self.lines:
+            if line.startswith('ATOM'):
+                items = line.split()
+                items[3] = items[17] = '"{0}\'"'.format(items[3])
+                line = ' '.join(items[:9]) + '\n' + ' '.join(items[9:]) + '\n'
+            lines.append(line)
+        ag = parseCIFStream(StringIO(''.join(lines)))
+        assert_equal(ag.getCoordsets(), self.ag.getCoordsets())
+        assert_equal(ag.getNames(), [name + "'" for name in
+                                     self.ag.getNames()])
+
+    def testBlocks(self):
+
+        block = ciffile.CIF_BLOCK
+        ciffile.CIF_BLOCK = 100
+        try:
+            ag = parseCIFStream(StringIO(''.join(self.lines)))
+        finally:
+            ciffile.CIF_BLOCK = block
+        assert_equal(ag.getCoordsets(), self.ag.getCoordsets())
+        assert_equal(ag.getNames(), self.ag.getNames())
+
+    def testParseCIFLoop(self):
+
+        items = parseCIFLoop(StringIO(''.join(self.lines)), 'struct_conf')
+        assert_equal(items['beg_auth_comp_id'], ['ILE', 'LEU A'])
+        assert_equal(items['pdbx_PDB_helix_length'], ['12', '5'])
+
+        items = parseCIFLoop(StringIO(''.join(self.lines)),
+                             'pdbx_struct_oper_list')
+        assert_equal(items['type'], ['identity operation'])
+        assert_equal(items['name'], ['1_555'])
+        assert_equal(items['details'], ['a multi-line\ntext field'])
+
+        self.assertIsNone(parseCIFLoop(StringIO(''.join(self.lines)),
+                                       'struct_sheet_range'))
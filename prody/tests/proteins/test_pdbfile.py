@@ -1,6 +1,7 @@
 """This module contains unit tests for :mod:`~prody.proteins`."""
 
 import os
+from io import StringIO
 
 import numpy as np
 from numpy.testing import *
@@ -221,6 +222,48 @@ class TestParsePDBHeaderAndAllModels(unittest.TestCase):
         self.atomgroup = None
 
 
+class TestParsePDBList(unittest.TestCase):
+
+    def setUp(self):
+
+        self.paths = [pathDatafile('pdb2k39_truncated.pdb'),
+                      pathDatafile('pdb1ubi.pdb'),
+                      pathDatafile('pdb1ejg.pdb')]
+
+    def testParallel(self):
+
+        serial = parsePDB(self.paths)
+        parallel = parsePDB(self.paths, n_cpu=2)
+        self.assertEqual(len(parallel), len(serial))
+        for ag, ref in zip(parallel, serial):
+            self.assertIsInstance(ag, prody.AtomGroup)
+            self.assertEqual(ag.getTitle(), ref.getTitle())
+            self.assertEqual(ag.numCoordsets(), ref.numCoordsets())
+            assert_equal(ag._getCoordsets(), ref._getCoordsets())
+            assert_equal(ag.getNames(), ref.getNames())
+            assert_equal(ag.getResnums(), ref.getResnums())
+            assert_equal(ag.getBetas(), ref.getBetas())
+
+    def testHeader(self):
+
+        ags, headers = parsePDB(self.paths, header=True, n_cpu=2)
+        self.assertEqual(len(ags), 3)
+        self.assertTrue(all(isinstance(hd, dict) for hd in headers))
+
+    def testFailure(self):
+
+        for n_cpu in (1, 2):
+            ags = parsePDB(self.paths, model=[1, 5, 1], n_cpu=n_cpu)
+            self.assertIsInstance(ags[0], prody.AtomGroup)
+            self.assertIsNone(ags[1])
+            self.assertIsInstance(ags[2], prody.AtomGroup)
+
+    def testNCPUArgument(self):
+
+        self.assertRaises(TypeError, parsePDB, self.paths, n_cpu=2.)
+        self.assertRaises(ValueError, parsePDB, self.paths, n_cpu=0)
+
+
 class TestParsePDBAltloc(unittest.TestCase):
 
     def setUp(self):
@@ -246,3 +289,72 @@ class TestParsePDBAltloc(unittest.TestCase):
 
         self.assertEqual(len(parsePDB(self.pdbfile, altloc='C')), 496,
             'failed to parse alternate locations C correctly')
+
+
+class TestParsePDBColumns(unittest.TestCase):
+
+    def setUp(self):
+
+        with open(pathDatafile('pdb1ubi.pdb')) as inp:
+            self.lines = [line for line in inp
+                          if line.startswith(('ATOM  ', 'HETATM'))]
+        self.ag = parsePDB(pathDatafile('pdb1ubi.pdb'))
+
+    def testHexadecimalSerials(self):
+
+        lines = [line[:6] + '{0:5x}'.format(0xa0000 + i) + line[11:]
+                 for i, line in enumerate(self.lines)]
+        ag = parsePDBStream(StringIO(''.join(lines)))
+        assert_equal(ag.getSerials(), np.arange(len(lines)) + 0xa0000)
+        assert_equal(ag.getCoords(), self.ag.getCoords())
+
+    def testMissingColumns(self):
+
+        lines = [line[:54] + '\n' for line in self.lines]
+        ag = parsePDBStream(StringIO(''.join(lines)))
+        assert_equal(ag.getCoords(), self.ag.getCoords())
+        assert_equal(ag.getNames(), self.ag.getNames())
+        assert_equal(ag.getBetas(), 0)
+        assert_equal(ag.getElements(), '')
+
+    def testModels(self):
+
+        lines = []
+        for i in range(3):
+            lines.append('MODEL     {0:4d}\n'.format(i + 1))
+            lines.extend(self.lines)
+            lines.append('ENDMDL\n')
+        lines.append('END\n')
+        ag = parsePDBStream(StringIO(''.join(lines)))
+        self.assertEqual(ag.numCoordsets(), 3)
+        assert_equal(ag.getResnums(), self.ag.getResnums())
+        assert_equal(ag.getCoordsets(2), self.ag.getCoords())
+
+    def testUnequalModels(self):
+
+        lines = ['MODEL        1\n'] + self.lines + ['ENDMDL\n',
+                 'MODEL        2\n'] + self.lines[:-1] + ['ENDMDL\n',
+                 'MODEL        3\n'] + self.lines + ['ENDMDL\n', 'END\n']
+        ag = parsePDBStream(StringIO(''.join(lines)))
+        self.assertEqual(ag.numCoordsets(), 2)
+
+    def testLargerModel(self):
+
+        lines = ['MODEL        1\n'] + self.lines + ['ENDMDL\n',
+                 'MODEL        2\n'] + self.lines * 2 + ['ENDMDL\n',
+                 'MODEL        3\n'] + self.lines + ['ENDMDL\n', 'END\n']
+        ag = parsePDBStream(StringIO(''.join(lines)))
+        self.assertEqual(ag.numCoordsets(), 2)
+        assert_equal(ag.getCoordsets(1), self.ag.getCoords())
+
+    def testModelArgument(self):
+
+        lines = []
+        for i in range(3):
+            lines.append('MODEL     {0:4d}\n'.format(i + 1))
+            lines.extend(line[:30] + '{0:8.3f}'.format(i) + line[38:]
+                         for line in self.lines)
+            lines.append('ENDMDL\n')
+        ag = parsePDBStream(StringIO(''.join(lines)), model=2)
+        self.assertEqual(ag.numCoordsets(), 1)
+        assert_equal(ag.getCoords()[:, 0], 1)
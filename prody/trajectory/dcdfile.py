@@ -35,6 +35,21 @@ PISQUARE = np.pi ** 2
 RECSCALE32BIT = 1
 RECSCALE64BIT = 2
 
+def _getUnitcells(unitcells):
+    """Returns unit cell dimensions and angles with shape ``(..., 6)`` for
+    raw unit cell records read from a DCD file."""
+
+    unitcells = unitcells[..., [0, 2, 5, 1, 3, 4]]
+    angles = unitcells[..., 3:]
+    if np.all(abs(angles) <= 1):
+        # This file was generated by CHARMM, or by NAMD > 2.5, with the angle
+        # cosines of the periodic cell angles written to the DCD file.
+        # This formulation improves rounding behavior for orthogonal cells
+        # so that the angles end up at precisely 90 degrees, unlike acos().
+        unitcells[..., 3:] = 90. - np.arcsin(angles) * 90 / PISQUARE
+    return unitcells
+
+
 class DCDFile(TrajFile):
 
     """A class for reading and writing DCD files. DCD header and first frame
@@ -287,20 +302,52 @@ class DCDFile(TrajFile):
 
     nextCoordset.__doc__ = TrajBase.nextCoordset.__doc__
 
+    def nextCoordsets(self, n, unitcell=False):
+
+        if self._closed:
+            raise ValueError('I/O operation on closed file')
+        n = min(n, self._n_csets - self._nfi)
+        if n <= 0:
+            return None
+        n_items = self._bytes_per_frame // self._itemsize
+        block = self._file.read(self._bytes_per_frame * n)
+        data = fromstring(block, self._dtype)
+        if len(data) < n * n_items:
+            LOGGER.warning('DCD is corrupt, {0} out of {1} frames '
+                           'were parsed.'.format(len(data) // n_items, n))
+            n = len(data) // n_items
+            if n == 0:
+                return None
+        n_atoms = self._n_atoms
+        data = data[:n * n_items].reshape((n, n_items))[:, -self._n_floats:]
+        data = data.reshape((n, 3, n_atoms + 2))[:, :, 1:-1]
+        data = data.transpose(0, 2, 1)
+        self._nfi += n
+        if self._ag is not None:
+            self._ag._setCoords(data[-1].copy(), self._title + ' frame ' +
+                                str(self._nfi - 1), overwrite=True)
+        if self._indices is not None:
+            data = data[:, self._indices]
+        data = np.array(data, self._astype or self._dtype)
+        if not unitcell:
+            return data
+        if not self._unitcell:
+            return data, None
+        # unit cell record follows the 4 byte record marker of each frame
+        block = fromstring(block[:n * self._bytes_per_frame], np.uint8)
+        block = block.reshape((n, self._bytes_per_frame))[:, 4:52]
+        unitcells = np.ascontiguousarray(block).view(np.float64)
+        return data, _getUnitcells(unitcells)
+
+    nextCoordsets.__doc__ = TrajBase.nextCoordsets.__doc__
+
     def _nextUnitcell(self):
 
         if self._unitcell:
             self._file.read(4)
             unitcell = fromstring(self._file.read(48), dtype=np.float64)
-            unitcell = unitcell[[0,2,5,1,3,4]]
-            if np.all(abs(unitcell[3:]) <= 1):
-                # This file was generated by CHARMM, or by NAMD > 2.5, with the angle */
-                # cosines of the periodic cell angles written to the DCD file.        */
-                # This formulation improves rounding behavior for orthogonal cells    */
-                # so that the angles end up at precisely 90 degrees, unlike acos().   */
-                unitcell[3:] = 90. - np.arcsin(unitcell[3:]) * 90 / PISQUARE
             self._file.read(4)
-            return unitcell
+            return _getUnitcells(unitcell)
 
     def getCoordsets(self, indices=None):
         """Returnss coordinate sets at given *indices*. *indices* may be an
@@ -12,6 +12,7 @@ from numpy import fromstring, zeros, ones, array, add
 
 from prody import PY2K
 from prody.atomic import ATOMIC_FIELDS, AtomGroup
+from prody.atomic.functions import _getCachePath, _loadCached, _saveCached
 from prody.utilities import openFile
 
 if PY2K:
@@ -34,6 +35,11 @@ def parsePSF(filename, title=None, ag=None):
         if not isinstance(ag, AtomGroup):
             raise TypeError('ag must be an AtomGroup instance')
 
+    cache = _getCachePath(filename, 'psf', {'title': title, 'ag': ag})
+    result = _loadCached(cache)
+    if result is not None:
+        return result
+
     psf = openFile(filename, 'rb')
     line = psf.readline()
     i_line = 1
@@ -134,6 +140,7 @@ def parsePSF(filename, title=None, ag=None):
 
     array = add(array, -1, array)
     ag.setBonds(array.reshape((n_bonds, 2)))
+    _saveCached(cache, ag)
 
     return ag
 
@@ -2,7 +2,7 @@
 """This module defines base class for trajectory handling."""
 
 from numbers import Integral
-from numpy import ndarray, unique
+from numpy import ndarray, unique, array
 
 from prody.ensemble import Ensemble
 from prody.utilities import checkCoords, checkWeights
@@ -306,6 +306,40 @@ class TrajBase(object):
         while self._nfi < self._n_csets:
             yield self.nextCoordset()
 
+    def nextCoordsets(self, n, unitcell=False):
+        """Returns next *n* coordinate sets for (selected) atoms in an array
+        with shape ``(n, n_atoms, 3)``.  Fewer coordinate sets are returned
+        when the end of the trajectory is reached, and **None** is returned
+        when there are no frames left.  Derived classes may override this
+        method to read a block of frames at once.
+
+        When *unitcell* is **True**, a tuple of coordinate sets and unit cell
+        dimensions and angles with shape ``(n, 6)`` is returned, where unit
+        cells are **None** if the trajectory does not contain them."""
+
+        if self._closed:
+            raise ValueError('I/O operation on closed file')
+        coords = []
+        unitcells = []
+        for i in range(n):
+            if unitcell:
+                frame = next(self, None)
+                if frame is None:
+                    break
+                xyz = frame.getCoords()
+                unitcells.append(frame.getUnitcell())
+            else:
+                xyz = self.nextCoordset()
+            if xyz is None:
+                break
+            coords.append(xyz)
+        if coords:
+            if not unitcell:
+                return array(coords)
+            if unitcells[0] is None:
+                return array(coords), None
+            return array(coords), array(unitcells)
+
     def getCoordsets(self, indices=None):
         """Returns coordinate sets at given *indices*. *indices* may be an
         integer, a list of ordered integers or **None**. **None** returns all
@@ -215,6 +215,44 @@ class Trajectory(TrajBase):
 
     nextCoordset.__doc__ = TrajBase.nextCoordset.__doc__
 
+    def nextCoordsets(self, n, unitcell=False):
+
+        if self._closed:
+            raise ValueError('I/O operation on closed file')
+        n = min(n, self._n_csets - self._nfi)
+        if n <= 0:
+            return None
+        coords = []
+        unitcells = []
+        while n > 0:
+            traj = self._trajectory
+            while traj._nfi == traj._n_csets:
+                self._nextFile()
+                traj = self._trajectory
+            xyz = traj.nextCoordsets(n, unitcell)
+            if xyz is None:
+                break
+            if unitcell:
+                xyz, uc = xyz
+                unitcells.append(uc)
+            coords.append(xyz)
+            self._nfi += len(xyz)
+            n -= len(xyz)
+        if self._ag is not None:
+            self._ag.setACSLabel(self._title + ' frame ' + str(self._nfi - 1))
+        if coords:
+            if len(coords) == 1:
+                coords = coords[0]
+            else:
+                coords = np.concatenate(coords)
+            if not unitcell:
+                return coords
+            if any(uc is None for uc in unitcells):
+                return coords, None
+            return coords, np.concatenate(unitcells)
+
+    nextCoordsets.__doc__ = TrajBase.nextCoordsets.__doc__
+
     def goto(self, n):
 
         if self._closed: